@@ -11,43 +11,60 @@ from agent.agent import make_serializable
 
 from tools import (
     GetUserMemoriesTool,
+    SearchUserMemoriesTool,
     CreateUserMemoryTool,
     UpdateUserMemoryTool,
     DeleteUserMemoryTool,
+    ConsolidateUserMemoriesTool,
     GetChatHistoryMetadataTool,
     GetChatHistoryEntryTool,
     DeleteChatHistoryEntriesTool,
     GetChatHistoryStatsTool,
+    ReadToolOutputArtifactTool,
     GetTodosTool,
     CreateTodoTool,
     UpdateTodoTool,
     DeleteTodoTool,
     ReadFolderContentTool,
+    ReadFolderTreeTool,
     ReadFileContentTool,
+    ReadFilesTool,
     WriteFileContentTool,
     CreateFolderTool,
     RemovePathsTool,
     InsertTextInFileTool,
     ReplaceTextInFileTool,
+    ApplyEditsTool,
+    ApplyPatchTool,
     SearchInFileTool,
     CopyPathsTool,
     RenamePathTool,
     MovePathsTool,
     PathStatTool,
     CreateWordDocumentTool,
+    BuildWordDocumentTool,
     RunTerminalCommandsTool,
+    StartJobTool,
+    PollJobTool,
+    ReadJobOutputTool,
+    CancelJobTool,
+    RunInShellSessionTool,
+    CloseShellSessionTool,
     MultiXYPlotTool,
+    PlotDataFilesTool,
     WebSearchTool,
     ImageGenerationTool,
 )
 
-from chat_history import ChatHistoryManager
+from chat_history import ChatHistoryManager, HistorySummarizer, LocalSummarizer, OpenAISummarizer
+from memory import MemoryPromptProvider, MemoryConsolidator
 from tools.todo_tools import TodoManager
 
 import base64
-from PIL import Image
 import io
 import json
+import queue
+import threading
 import argparse
 import config
 
@@ -59,21 +76,84 @@ def color_text(text, color_code):
 
 # Initialize global variables
 chat_history_manager = None
+history_summarizer = None
 todo_manager = None
 agent = None
 agent_name = config.AGENT_NAME
 user_id = config.USER_ID
 project_root = None
+# Latest partial image bytes per in-flight image generation item; evicted when the item completes
 partial_images = {}
 
 
+def image_extension(image_bytes):
+    """File extension for encoded image bytes (the API streams PNG unless another output format was requested)."""
+    if image_bytes.startswith(b"\xff\xd8"):
+        return "jpg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp"
+    return "png"
+
+
+class ImageWriter:
+    """Writes already-encoded image bytes to disk on a background thread, so event handling never waits on disk I/O."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, path, image_bytes, on_written=None):
+        self._queue.put((path, image_bytes, on_written))
+
+    def flush(self):
+        """Block until every submitted image is on disk."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, image_bytes, on_written = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(image_bytes)
+                # Readers (e.g. the widget) never see a half-written file
+                os.replace(tmp_path, path)
+                if on_written:
+                    on_written(path, image_bytes)
+            except Exception as e:
+                print(color_text(f"Failed to save image {path}: {e}", '31'), flush=True)
+            finally:
+                self._queue.task_done()
+
+
+image_writer = ImageWriter()
+
+
+def show_image(path, image_bytes):
+    """Open an image in the system viewer (interactive mode only; Pillow is needed just for this)."""
+    try:
+        from PIL import Image
+        Image.open(io.BytesIO(image_bytes)).show(title=os.path.basename(path))
+    except Exception:
+        pass
+
+
 def initialize_agent(load_history=True):
     """Initialize the agent and managers."""
-    global chat_history_manager, todo_manager, agent, project_root, partial_images
+    global chat_history_manager, history_summarizer, todo_manager, agent, project_root, partial_images
     
     chat_history_manager = ChatHistoryManager()
+    if config.SUMMARIZE_HISTORY:
+        history_summarizer = HistorySummarizer(
+            summarize=OpenAISummarizer(config.SUMMARY_MODEL) if config.SUMMARY_MODEL else LocalSummarizer(),
+            chunk_size=config.SUMMARY_CHUNK_SIZE,
+            keep_recent=config.SUMMARY_KEEP_RECENT,
+        )
     todo_manager = TodoManager()
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    tool_outputs_dir = os.path.join(project_root, "tool_outputs")
     partial_images = {}
     
     # Load or clear history
@@ -84,34 +164,55 @@ def initialize_agent(load_history=True):
         chat_history_manager.clear_history()
         chat_history_manager.clear_generated_images()
         todo_manager.clear_todos()
+
+    # Look for duplicate memories in the background (merged only with MEMORY_AUTO_CONSOLIDATE)
+    consolidator = MemoryConsolidator.shared()
+    consolidator.auto_apply = config.MEMORY_AUTO_CONSOLIDATE
+    consolidator.char_budget = config.MEMORY_CHAR_BUDGET
+    consolidator.schedule()
     
     # Initialize tools
     selected_tools = [
         GetUserMemoriesTool(),
+        SearchUserMemoriesTool(),
         CreateUserMemoryTool(),
         UpdateUserMemoryTool(),
         DeleteUserMemoryTool(),
+        ConsolidateUserMemoriesTool(),
         # Chat History Management Tools (optional - uncomment to enable)
         GetChatHistoryMetadataTool(),
         GetChatHistoryEntryTool(),
         DeleteChatHistoryEntriesTool(),
         GetChatHistoryStatsTool(),
+        ReadToolOutputArtifactTool(artifacts_dir=tool_outputs_dir),
         GetTodosTool(),
         CreateTodoTool(),
         UpdateTodoTool(),
         DeleteTodoTool(),
         ReadFolderContentTool(root_path=project_root),
+        ReadFolderTreeTool(root_path=project_root),
         ReadFileContentTool(root_path=project_root),
+        ReadFilesTool(root_path=project_root),
         WriteFileContentTool(root_path=project_root, permission_required=False),
         CreateFolderTool(root_path=project_root, permission_required=False),
         RemovePathsTool(root_path=project_root, permission_required=False),
         InsertTextInFileTool(root_path=project_root, permission_required=False),
         ReplaceTextInFileTool(root_path=project_root, permission_required=False),
+        ApplyEditsTool(root_path=project_root, permission_required=False),
+        ApplyPatchTool(root_path=project_root, permission_required=False),
         SearchInFileTool(root_path=project_root),
         CopyPathsTool(root_path=project_root),
         RenamePathTool(root_path=project_root),
         MovePathsTool(root_path=project_root),
         PathStatTool(root_path=project_root),
+        # Terminal & background job tools (opt-in - uncomment to let the agent run commands)
+        # RunTerminalCommandsTool(root_path=project_root, permission_required=False),
+        # StartJobTool(root_path=project_root, permission_required=False),
+        # PollJobTool(),
+        # ReadJobOutputTool(),
+        # CancelJobTool(),
+        # RunInShellSessionTool(root_path=project_root, permission_required=False),
+        # CloseShellSessionTool(),
         WebSearchTool(),
     ]
     
@@ -125,6 +226,15 @@ def initialize_agent(load_history=True):
         stream=True,
         tool_choice="auto",
         include=["reasoning.encrypted_content"],
+        inject_memories=config.INJECT_MEMORIES,
+        memory_token_budget=config.MEMORY_TOKEN_BUDGET,
+        tool_output_max_chars=config.TOOL_OUTPUT_MAX_CHARS,
+        tool_output_budgets=config.TOOL_OUTPUT_BUDGETS,
+        tool_output_dir=tool_outputs_dir,
+        memoize_tools=config.MEMOIZE_TOOLS,
+        request_max_attempts=config.REQUEST_MAX_ATTEMPTS,
+        request_timeout=config.REQUEST_TIMEOUT,
+        request_deadline=config.REQUEST_DEADLINE,
     )
     
     agent = Agent(
@@ -132,6 +242,7 @@ def initialize_agent(load_history=True):
         tools=selected_tools,
         user_id=user_id,
         config=agent_config,
+        memory_provider=MemoryPromptProvider(),
     )
 
 
@@ -142,10 +253,16 @@ def process_message(user_input_text, screenshots_b64=None, max_turns=None):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     formatted_input = f"> **Timestamp:** `{timestamp}`\nUser's input: {user_input_text}"
     
+    # Older turns go in as cached summaries when summarization is on
+    if history_summarizer is not None:
+        input_messages = history_summarizer.build_input(chat_history_manager)
+    else:
+        input_messages = chat_history_manager.get_history()
+    
     # Start the agent run with text and optional screenshots
     stream = agent.run(
         message=formatted_input,
-        input_messages=chat_history_manager.get_history(),
+        input_messages=input_messages,
         max_turns=max_turns,
         screenshots_b64=screenshots_b64,  # Pass list of screenshots to agent
     )
@@ -157,41 +274,39 @@ def handle_event(event, interactive_mode=True):
     """Handle an event - print to console if interactive, return for service mode."""
     global partial_images
     
-    # Handle image saving for both modes
+    # Handle image saving for both modes. The streamed bytes are already an encoded image,
+    # so they are written as-is by the background writer; only the latest partial per item is kept.
     if event["type"] == "response.image_generation_call.partial_image":
-        b64_data = event['data'].partial_image_b64
         item_id = event['data'].item_id
         sequence_number = event['data'].sequence_number
-        image_bytes = base64.b64decode(b64_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        if item_id not in partial_images:
-            partial_images[item_id] = {}
-        partial_images[item_id][sequence_number] = image
+        image_bytes = base64.b64decode(event['data'].partial_image_b64)
+        partial_images[item_id] = image_bytes
         
         images_folder = os.path.join(project_root, "images")
-        os.makedirs(images_folder, exist_ok=True)
-        image_path = os.path.join(images_folder, f"{item_id}_partial_{sequence_number}.png")
-        image.save(image_path, format="PNG")
+        image_path = os.path.join(images_folder, f"{item_id}_partial_{sequence_number}.{image_extension(image_bytes)}")
+        image_writer.submit(image_path, image_bytes, show_image if interactive_mode else None)
         
         if interactive_mode:
-            image.show(title=f"Partial Image {item_id}-{sequence_number}")
             print(color_text(f"Partial image saved to {image_path}", '32'), flush=True)
     
     elif event["type"] == "response.image_generation_call.completed":
         item_id = event['data'].item_id
         sequence_number = event['data'].sequence_number
+        image_bytes = partial_images.pop(item_id, None)
         
-        if item_id in partial_images and sequence_number in partial_images[item_id]:
+        if image_bytes is not None:
             images_folder = os.path.join(project_root, "images")
-            os.makedirs(images_folder, exist_ok=True)
-            image_path = os.path.join(images_folder, f"{item_id}_completed_{sequence_number}.png")
-            partial_images[item_id][sequence_number].save(image_path, format="PNG")
+            image_path = os.path.join(images_folder, f"{item_id}_completed_{sequence_number}.{image_extension(image_bytes)}")
+            image_writer.submit(image_path, image_bytes)
             
             if interactive_mode:
                 print(color_text(f"Completed image saved to {image_path}", '32'), flush=True)
     
     elif event["type"] == "response.agent.done":
+        # Drop partials of generations that never completed and make sure every image is on disk
+        partial_images.clear()
+        image_writer.flush()
+        
         # Reload history from file to respect any deletions/changes made during the run
         chat_history_manager.history = chat_history_manager.load_history()
         
@@ -201,6 +316,10 @@ def handle_event(event, interactive_mode=True):
         chat_history_manager.add_generated_images(event["generated_images"])
         chat_history_manager.save_generated_images()
         
+        # Summarize newly completed spans in the background, ready for the next message
+        if history_summarizer is not None:
+            history_summarizer.schedule(chat_history_manager)
+        
         if interactive_mode:
             print(color_text("\n[Agent Done]", '32'), event.get("message", ""), 
                   f" (duration: {event.get('duration_seconds', 0)} seconds)", flush=True)
@@ -224,6 +343,16 @@ def handle_event(event, interactive_mode=True):
                 print(color_text(f"\n[Function Call] {event['item'].name} with arguments: {event['item'].arguments}", '35'), flush=True)
             elif event["item"].type == "custom_tool_call":
                 print(color_text(f"\n[Custom Tool Call] {event['item'].name} with arguments: {event['item'].input}", '35'), flush=True)
+        elif event["type"] == "response.agent.warning":
+            print(color_text(f"\n[Warning] {event['message']}", '31'), flush=True)
+        elif event["type"] == "response.retry":
+            print(color_text(f"\n[Retry] attempt {event['attempt']}/{event['max_attempts']} in {event['delay_seconds']}s after: {event['error']}", '31'), flush=True)
+            if event.get("discard_partial"):
+                # A terminal cannot take text back; mark where the regenerated reply starts
+                print(color_text("[Retry] The partial reply since the last complete message is discarded and generated again below.", '31'), flush=True)
+        elif event["type"] == "response.tool_call.progress":
+            progress = event.get("progress", {})
+            print(color_text(f"[Progress] {event['name']}: {progress}", '90'), flush=True)
         elif event["type"] == "response.image_generation_call.generating":
             print(color_text(f"\n[Image Generation]...", '34'), flush=True)
         elif event["type"] == "response.image_generation_call.partial_image":
@@ -289,9 +418,9 @@ def run_service(port=None):
         return {"status": "ok", "service": config.SERVICE_NAME}
     
     @app.get("/chat/history")
-    def get_chat_history():
-        """Get the current chat history."""
-        return {"history": chat_history_manager.get_history()}
+    def get_chat_history(limit: int = 0):
+        """Get the current chat history (only the last `limit` entries when limit > 0)."""
+        return {"history": chat_history_manager.get_history(limit or None)}
     
     @app.delete("/chat/history")
     def clear_chat_history():
@@ -300,6 +429,7 @@ def run_service(port=None):
             chat_history_manager.clear_history()
             chat_history_manager.clear_generated_images()
             todo_manager.clear_todos()
+            agent.new_conversation()
             return {"status": "ok", "message": "Chat history cleared"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
@@ -15,3 +15,29 @@ REASONING_EFFORT = "low"
 REASONING_SUMMARY = "auto"
 TEXT_VERBOSITY = "medium"
 MAX_TURNS = 32
+
+# Memory injection: preload the most relevant memories into the instructions
+INJECT_MEMORIES = True
+MEMORY_TOKEN_BUDGET = 1000
+
+# Memory consolidation: merge near-duplicate memories automatically, and the size to keep memories under
+MEMORY_AUTO_CONSOLIDATE = False
+MEMORY_CHAR_BUDGET = 6000
+
+# History summarization: send summaries of older turns plus the most recent entries verbatim
+SUMMARIZE_HISTORY = False  # older turns are then sent as lossy summaries instead of verbatim
+SUMMARY_MODEL = None  # None = local extractive summaries (no API calls); e.g. "gpt-5-mini" for model summaries
+SUMMARY_KEEP_RECENT = 60
+SUMMARY_CHUNK_SIZE = 40
+
+# Tool outputs longer than this many characters are saved to tool_outputs/ and returned as a preview
+TOOL_OUTPUT_MAX_CHARS = 20000
+TOOL_OUTPUT_BUDGETS = {}  # per-tool overrides on top of AgentConfig's defaults (read_files: 80000); None = never spill
+
+# Identical calls of read-only tools within one run reuse the first result until a write touches the same resource
+MEMOIZE_TOOLS = True
+
+# Model requests: transient failures (timeouts, dropped streams, 429/5xx) are retried with jittered backoff
+REQUEST_MAX_ATTEMPTS = 4
+REQUEST_TIMEOUT = 120.0  # seconds per request; None = SDK default
+REQUEST_DEADLINE = 300.0  # no new attempt after this many seconds in one turn
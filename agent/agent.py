@@ -1,12 +1,23 @@
 import os
 import json
+import time
 from datetime import datetime
 from typing import Optional
 from openai import OpenAI
+from storage.artifacts import ArtifactStore
 from .config import AgentConfig
+from .tool_registry import ToolRegistry
+from .memo import ToolMemo
+from .resilience import RetryPolicy, CircuitBreaker, StreamError, is_retryable
+
+TOOL_OUTPUTS_DIR = os.path.join(os.path.dirname(__file__), 'tool_outputs')
+# The artifact reader pages by itself; spilling its pages would loop
+_UNSPILLED_TOOLS = {"read_tool_output_artifact"}
+_PREVIEW_HEAD_CHARS = 1500
+_PREVIEW_TAIL_CHARS = 500
 
 class Agent:
-    def __init__(self, name, tools, user_id=None, config: Optional[AgentConfig] = None):
+    def __init__(self, name, tools, user_id=None, config: Optional[AgentConfig] = None, memory_provider=None):
         """AI Agent wrapper.
 
         Parameters:
@@ -14,15 +25,37 @@ class Agent:
             tools: Iterable of tool objects exposing a 'schema' attribute and 'run' method.
             user_id: Required unique user identifier (used for caching, etc.).
             config: Optional AgentConfig instance. If omitted, a default AgentConfig() is created.
+            memory_provider: Optional object with build_block(query, token_budget) and version(); used
+                when config.inject_memories is set to preload memories into the instructions.
+                The block is chosen per conversation; call new_conversation() when the history is cleared.
         """
         self.name = name
         self.tools = tools
         self.user_id = user_id
         self.config = config or AgentConfig()
+        self.memory_provider = memory_provider
+        self._memory_block = None
+        self._memory_version = None
+        self._memory_query = None
         self.client = OpenAI()
+        self.tool_outputs = ArtifactStore(self.config.tool_output_dir or TOOL_OUTPUTS_DIR)
         # Use config's system prompt (supports custom template modifications)
         self.instructions = self.config.get_system_prompt(self.name)
-        self.tool_schemas = [tool.schema for tool in self.tools]
+        self._preloaded_instructions = self.config.get_system_prompt(self.name, memories_preloaded=True)
+        self.registry = ToolRegistry(self.tools)
+        self.tool_schemas = self.registry.schemas
+        self.memo = ToolMemo()
+        self.retry_policy = RetryPolicy(
+            max_attempts=self.config.request_max_attempts,
+            base_delay=self.config.retry_base_delay,
+            max_delay=self.config.retry_max_delay,
+            request_timeout=self.config.request_timeout,
+            deadline=self.config.request_deadline,
+        )
+        self.breaker = CircuitBreaker.shared(
+            self.config.model_name, self.config.breaker_failure_threshold, self.config.breaker_reset_seconds
+        )
+        self._resumed_output = []  # output items carried over from a failed attempt of the current turn
         self.token_usage = {
             "turn": 1,
             "input_tokens": 0,
@@ -49,12 +82,248 @@ class Agent:
         """Request to stop the current agent run."""
         self._stop_requested = True
 
+    def new_conversation(self):
+        """Forget per-conversation state (the preloaded memory block); the next run starts a new conversation."""
+        self._memory_block = None
+        self._memory_version = None
+        self._memory_query = None
+
+    def _run_instructions(self, message, input_messages):
+        """Return (instructions, warning) for this run, with the preloaded memory block when enabled.
+
+        The block is ranked against the first message of the conversation (a run without earlier
+        input starts a new one) and reused for the rest of it - rebuilt for the same message only
+        when the memories change - so the instructions prefix stays identical across runs and turns
+        and keeps hitting the prompt cache.
+        """
+        if not (self.config.inject_memories and self.memory_provider):
+            return self.instructions, None
+        if not input_messages:
+            self.new_conversation()
+        if self._memory_query is None:
+            self._memory_query = message or ""
+        try:
+            version = self.memory_provider.version()
+            if self._memory_block is None or version != self._memory_version:
+                self._memory_block = self.memory_provider.build_block(self._memory_query, self.config.memory_token_budget)
+                self._memory_version = version
+        except Exception as e:
+            return self.instructions, f"Memory injection failed: {e}"
+        if not self._memory_block:
+            return self._preloaded_instructions, None
+        return f"{self._preloaded_instructions}\n{self._memory_block}", None
+
+    def _fit_tool_output(self, name, output):
+        """
+        Return (output, warning): the serialized tool output, or a preview plus artifact handle if it
+        exceeds the tool's budget. If the artifact cannot be saved, only the preview is kept and
+        warning says why.
+        """
+        budget = self.config.tool_output_budgets.get(name, self.config.tool_output_max_chars)
+        if budget is None or len(output) <= budget or name in _UNSPILLED_TOOLS:
+            return output, None
+        try:
+            artifact_id = self.tool_outputs.put(output, prefix=name)
+            warning = None
+            message = (
+                f"The {name} result was {len(output)} characters (limit {budget}) and was saved as an artifact. "
+                "Only its head and tail are shown; call read_tool_output_artifact with this artifact_id to read more."
+            )
+        except Exception as e:
+            artifact_id = None
+            warning = f"Could not save tool output artifact: {e}"
+            message = (
+                f"The {name} result was {len(output)} characters (limit {budget}) and could not be saved. "
+                "Only its head and tail are shown; narrow the call (e.g. a smaller range or filter) to see the rest."
+            )
+        return json.dumps({
+            "status": "truncated",
+            "artifact_id": artifact_id,
+            "total_chars": len(output),
+            "head": output[:_PREVIEW_HEAD_CHARS],
+            "tail": output[-_PREVIEW_TAIL_CHARS:],
+            "message": message,
+        }), warning
+
+    def tool_stats(self, scope="run"):
+        """Per-tool call counts and timings for the current run ("run") or the agent's lifetime ("total")."""
+        return self.registry.stats(scope)
+
+    def memo_stats(self):
+        """Hits, misses and invalidations of the tool result cache in the current run."""
+        return self.memo.stats()
+
+    def _call_tool(self, name, call_id, raw_arguments):
+        """Validate the arguments and run the named tool (generator: yields progress, returns the result)."""
+        tool = self.registry.get(name)
+        if tool is None:
+            self.registry.record(name, 0.0, "error")
+            return {"status": "error", "error": "unknown_tool", "message": f"No tool named {name}."}
+        arguments, error = self.registry.parse_arguments(name, raw_arguments)
+        if error is not None:
+            self.registry.record(name, 0.0, "invalid_arguments")
+            return error
+
+        memo_key, memo_paths = self.memo.key(tool, name, arguments) if self.config.memoize_tools else (None, None)
+        if memo_key is not None:
+            hit, cached = self.memo.get(memo_key)
+            if hit:
+                self.registry.record(name, 0.0, "cache_hit")
+                return cached
+
+        start = time.perf_counter()
+        try:
+            if hasattr(tool, "run_streaming"):
+                # Long-running tools report progress while they work
+                result = yield from self._run_tool_streaming(tool, name, call_id, arguments)
+            else:
+                result = tool.run(**arguments)
+        except BaseException:
+            self.registry.record(name, time.perf_counter() - start, "error")
+            raise
+        finally:
+            if memo_key is None:
+                # Even a failed write may have changed something
+                self.memo.invalidate(tool, arguments)
+        outcome = self.registry.outcome(result)
+        self.registry.record(name, time.perf_counter() - start, outcome)
+        if memo_key is not None and outcome == "ok":
+            self.memo.put(memo_key, tool, memo_paths, result)
+        return result
+
+    def _run_tool_streaming(self, tool, name, call_id, arguments):
+        """Drive a tool's run_streaming() generator, re-yielding its progress as agent events.
+
+        Returns the tool's final result. A stop request closes the tool's generator so it can
+        cancel outstanding work.
+        """
+        stream = tool.run_streaming(**arguments)
+        while True:
+            if self._stop_requested:
+                stream.close()
+                return {"status": "error", "message": f"Function {name} stopped by user request."}
+            try:
+                progress = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            yield {"type": "response.tool_call.progress", "name": name, "call_id": call_id, "progress": progress}
+
+    @staticmethod
+    def _reusable_prefix(items):
+        """The completed output items a retry can send back as input: the leading reasoning and message
+        items, up to the last message (a reasoning item must not be sent without what followed it)."""
+        prefix = []
+        for item in items:
+            if item.type not in ("reasoning", "message"):
+                break
+            prefix.append(item)
+        while prefix and prefix[-1].type != "message":
+            prefix.pop()
+        return prefix
+
+    @staticmethod
+    def _as_input(item):
+        data = make_serializable(item)
+        if item.type == "reasoning":
+            data.pop("status", None)
+        return data
+
+    def _stream_events(self, request):
+        """
+        Stream the events of one model request, retrying transient failures (generator).
+
+        Timeouts, dropped connections, rate limits and 5xx errors - raised by the client or reported
+        inside the stream - are retried up to request_max_attempts times with jittered exponential
+        backoff while request_deadline has not passed; a `response.retry` notice (a dict) is yielded
+        before each wait. Completed reasoning and message items of a failed attempt are sent back as
+        input, so the retry continues after them instead of starting over; on `response.completed`
+        they are available in self._resumed_output. Every request first passes the circuit breaker.
+
+        A `response.checkpoint` notice is yielded when the request starts and after every message a
+        retry would reuse. Everything streamed after the last checkpoint is generated again by the
+        retry, so consumers drop what they showed since then when `response.retry` arrives.
+        """
+        policy = self.retry_policy
+        # Retries happen here, so the SDK's own retries are turned off
+        options = {"max_retries": 0}
+        if policy.request_timeout is not None:
+            options["timeout"] = policy.request_timeout
+        client = self.client.with_options(**options)
+        base_input = request["input"]
+        started = time.monotonic()
+        self._resumed_output = []
+        attempt = 0
+        yield {"type": "response.checkpoint"}
+        while True:
+            attempt += 1
+            self.breaker.check()
+            received = []
+            reusable = True  # every item received so far is reasoning or a message
+            completed = False
+            events = None
+            try:
+                events = client.responses.create(**{**request, "input": base_input + [self._as_input(i) for i in self._resumed_output]})
+                for event in events:
+                    if event.type == "error" and getattr(event, "code", None) in StreamError.RETRYABLE_CODES:
+                        raise StreamError(event.code, event.message)
+                    if event.type == "response.failed":
+                        error = getattr(event.response, "error", None)
+                        raise StreamError(getattr(error, "code", None), getattr(error, "message", "Response failed."))
+                    checkpoint = False
+                    if event.type == "response.output_item.done":
+                        received.append(event.item)
+                        reusable = reusable and event.item.type in ("reasoning", "message")
+                        checkpoint = reusable and event.item.type == "message"
+                    elif event.type == "response.completed":
+                        completed = True
+                        self.breaker.record_success()
+                    yield event
+                    if checkpoint:
+                        yield {"type": "response.checkpoint"}
+                return
+            except Exception as e:
+                if completed or not is_retryable(e):
+                    if completed:
+                        # The turn's result already arrived; a late connection error does not matter
+                        return
+                    raise
+                self.breaker.record_failure()
+                delay = policy.delay(attempt, e)
+                if attempt >= policy.max_attempts or (policy.deadline is not None and time.monotonic() - started + delay > policy.deadline):
+                    raise
+                self._resumed_output = self._resumed_output + self._reusable_prefix(received)
+                yield {
+                    "type": "response.retry",
+                    "attempt": attempt + 1,
+                    "max_attempts": policy.max_attempts,
+                    "delay_seconds": round(delay, 2),
+                    "error": str(e),
+                    "reused_items": len(self._resumed_output),
+                    # Output streamed since the last response.checkpoint will be generated again
+                    "discard_partial": True,
+                }
+            finally:
+                close = getattr(events, "close", None)
+                if close is not None:
+                    close()
+            # Wait in short steps so a stop request is not held up by the backoff
+            wake = time.monotonic() + delay
+            while time.monotonic() < wake:
+                if self._stop_requested:
+                    return
+                time.sleep(min(0.1, wake - time.monotonic()))
+
     def run(self, message=None, input_messages=None, max_turns=16, screenshots_b64=None):
         self.chat_history_during_run = []
         self.function_call_detected = False
         self.turn = 1
         self._run_start_time = datetime.now()
         self._stop_requested = False  # Reset stop flag at the start of each run
+        instructions, warning = self._run_instructions(message, input_messages)
+        self.registry.begin_run()
+        self.memo.begin_run()
+        if warning:
+            yield {"type": "response.agent.warning", "message": warning}
 
         # if messages or message None or is not string or is empty, return None
         if input_messages is None or (message is None and screenshots_b64 is None) or (message is not None and not isinstance(message, str)):
@@ -63,7 +332,9 @@ class Agent:
                 "message": "No user input provided or input is invalid.",
                 "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                 "chat_history": self.chat_history_during_run,
-                "generated_images": self.generated_images
+                "generated_images": self.generated_images,
+                "tool_stats": self.registry.stats(),
+                "memo_stats": self.memo.stats(),
             }
             return
 
@@ -77,6 +348,8 @@ class Agent:
                     "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                     "chat_history": self.chat_history_during_run,
                     "generated_images": self.generated_images,
+                    "tool_stats": self.registry.stats(),
+                    "memo_stats": self.memo.stats(),
                     "stopped": True
                 }
                 return
@@ -88,7 +361,9 @@ class Agent:
                     "message": f"Max turns exceeded (max_turns={max_turns}).",
                     "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                     "chat_history": self.chat_history_during_run,
-                    "generated_images": self.generated_images
+                    "generated_images": self.generated_images,
+                    "tool_stats": self.registry.stats(),
+                    "memo_stats": self.memo.stats(),
                 }
                 return
             # if this is not the first turn and no function call was detected, break the agent loop
@@ -98,7 +373,9 @@ class Agent:
                     "message": "Agent run completed without further user input or function calls.",
                     "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                     "chat_history": self.chat_history_during_run,
-                    "generated_images": self.generated_images
+                    "generated_images": self.generated_images,
+                    "tool_stats": self.registry.stats(),
+                    "memo_stats": self.memo.stats(),
                 }
                 return
             elif self.turn == 1:
@@ -142,9 +419,9 @@ class Agent:
                     text = None
                     include = []
                 
-                events = self.client.responses.create(
+                events = self._stream_events(dict(
                     model=model,
-                    instructions=self.instructions,
+                    instructions=instructions,
                     input=input_messages + self.chat_history_during_run,
                     prompt_cache_key=prompt_cache_key,
                     store=store,
@@ -156,7 +433,7 @@ class Agent:
                     tools=self.tool_schemas,
                     include=include,
                     # service_tier="priority"
-                )
+                ))
                 for event in events:
                     # Check for stop request before processing each event
                     if self._stop_requested:
@@ -166,11 +443,16 @@ class Agent:
                             "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                             "chat_history": self.chat_history_during_run,
                             "generated_images": self.generated_images,
+                            "tool_stats": self.registry.stats(),
+                            "memo_stats": self.memo.stats(),
                             "stopped": True
                         }
                         return
                     
-                    if event.type == "response.reasoning_summary_part.added":
+                    if isinstance(event, dict):
+                        # Notices from the retry layer (response.retry) go to the caller as they are
+                        yield event
+                    elif event.type == "response.reasoning_summary_part.added":
                         yield {"type": "response.reasoning_summary_part.added"}
                     elif event.type == "response.reasoning_summary_text.delta":
                         yield {"type": "response.reasoning_summary_text.delta", "delta": event.delta}
@@ -208,7 +490,8 @@ class Agent:
                         self.token_usage_history[self.turn] = self.token_usage
 
                         # Append the AI agent output items to the chat history
-                        for output_item in event.response.output:
+                        # Items completed by a failed attempt of this turn come first
+                        for output_item in self._resumed_output + list(event.response.output):
                             # Check if the output item is a function call
                             if output_item.type == "function_call":
                                 # Check if a function call was detected
@@ -217,25 +500,24 @@ class Agent:
                                 # Get the function call details
                                 function_call = output_item
                                 function_call_id = function_call.call_id
-                                function_call_arguments = json.loads(function_call.arguments)
                                 function_call_name = function_call.name
                                 function_call_result = None
 
                                 try:
-                                    # Find and run the correct tool
-                                    for tool in self.tools:
-                                        if tool.schema["name"] == function_call_name:
-                                            function_call_result = tool.run(**function_call_arguments)
-                                            break
+                                    # Look up, validate and run the tool
+                                    function_call_result = yield from self._call_tool(function_call_name, function_call_id, function_call.arguments)
                                 except Exception as e:
                                     function_call_result = {"type": "error", "message": f"Error occurred while calling function {function_call_name}: {e}"}
 
                                 # Append the function call and its result to the chat history
+                                function_call_output, warning = self._fit_tool_output(function_call_name, json.dumps(function_call_result))
+                                if warning:
+                                    yield {"type": "response.agent.warning", "message": warning}
                                 self.chat_history_during_run.append(make_serializable(function_call))
                                 self.chat_history_during_run.append({
                                     "type": "function_call_output",
                                     "call_id": function_call_id,
-                                    "output": json.dumps(function_call_result),
+                                    "output": function_call_output,
                                 })
 
                             elif output_item.type == "custom_tool_call":
@@ -296,7 +578,9 @@ class Agent:
                     "message": f"An error occurred during agent run: {str(e)}",
                     "duration_seconds": (datetime.now() - self._run_start_time).total_seconds(),
                     "chat_history": self.chat_history_during_run,
-                    "generated_images": self.generated_images
+                    "generated_images": self.generated_images,
+                    "tool_stats": self.registry.stats(),
+                    "memo_stats": self.memo.stats(),
                 }
                 return 
 
@@ -6,6 +6,14 @@ used to guide the agent's behavior.
 
 from typing import Dict, List, Optional, Any
 
+# With preloaded memories the prompt's first-message instruction is swapped, so the model does not
+# spend its first turn fetching memories it already has
+_FETCH_MEMORIES_LINE = "First message: Silently call `get_user_memories` before replying (pass the user's message as `query` to get only relevant memories).\n"
+_PRELOADED_MEMORIES_LINE = "First message: The most relevant memories are preloaded at the end of these instructions (USER MEMORIES); reply without calling `get_user_memories` first.\n"
+
+# Per-tool output budgets used unless overridden: read_files already clips its content to
+# max_chars (60000 by default), so a default batch must fit instead of being spilled
+_DEFAULT_TOOL_OUTPUT_BUDGETS = {"read_files": 80000}
 
 _SYSTEM_PROMPT = """
 You are {agent_name} - a sharp, witty friend with world-class capabilities.
@@ -54,7 +62,7 @@ Execution Philosophy:
 
 # MEMORY
 
-First message: Silently call `get_user_memories` before replying.
+First message: Silently call `get_user_memories` before replying (pass the user's message as `query` to get only relevant memories).
 Ongoing: Use when context unclear or needs refresh.
 Store only durable facts:
 - Preferences, goals, constraints, ongoing projects, explicit "remember this"
@@ -66,10 +74,10 @@ Store only durable facts:
 
 Use tools like a pro uses their toolkit - intentionally, efficiently.
 Core Principles:
-1. Parallelize ALL independent reads at start
+1. Parallelize ALL independent reads at start - batch files with `read_files`
 2. Search semantically first, then targeted reads
 3. Read large chunks once, not small sections repeatedly
-4. Surgical edits (`replace_text_in_file`) - full rewrites only for new files
+4. Surgical edits (`replace_text_in_file`, many at once with `apply_edits`, larger changes as a diff via `apply_patch`) - full rewrites only for new files
 5. Re-fetch state only when you changed it
 Communication: Announce grouped actions with witty one-liner before execution. Users want outcomes, not logs.
 Error Handling: Transient errors retry once silently. Persistent errors find workarounds or ask one targeted question. Stay cool.
@@ -153,7 +161,20 @@ class AgentConfig:
     stream: bool = True,
     tool_choice: str = "auto",
     include: Optional[List[str]] = None,
-    system_prompt_template: str = _SYSTEM_PROMPT):
+    system_prompt_template: str = _SYSTEM_PROMPT,
+    inject_memories: bool = False,
+    memory_token_budget: int = 1000,
+    tool_output_max_chars: Optional[int] = 20000,
+    tool_output_budgets: Optional[Dict[str, Optional[int]]] = None,
+    tool_output_dir: Optional[str] = None,
+    memoize_tools: bool = True,
+    request_max_attempts: int = 4,
+    retry_base_delay: float = 0.5,
+    retry_max_delay: float = 8.0,
+    request_timeout: Optional[float] = 120.0,
+    request_deadline: Optional[float] = 300.0,
+    breaker_failure_threshold: int = 5,
+    breaker_reset_seconds: float = 30.0):
 
     self.model_name: str = model_name
     self.temperature: float = temperature
@@ -164,9 +185,32 @@ class AgentConfig:
     self.tool_choice: str = tool_choice
     self.include: List[str] = include if include is not None else ["reasoning.encrypted_content"]
     self.system_prompt_template: str = system_prompt_template
-
-  def get_system_prompt(self, agent_name: str) -> str:
+    # Append a relevance-ranked memory block (from the Agent's memory_provider) to the instructions
+    self.inject_memories: bool = inject_memories
+    self.memory_token_budget: int = memory_token_budget
+    # Tool results longer than this (per-tool overrides by name, on top of the defaults; None = unlimited)
+    # are saved as an artifact in tool_output_dir and replaced by a preview the model can page through
+    self.tool_output_max_chars: Optional[int] = tool_output_max_chars
+    self.tool_output_budgets: Dict[str, Optional[int]] = {**_DEFAULT_TOOL_OUTPUT_BUDGETS, **(tool_output_budgets or {})}
+    self.tool_output_dir: Optional[str] = tool_output_dir
+    # Reuse results of read-only tools (memoizable = True) for identical calls within one run
+    self.memoize_tools: bool = memoize_tools
+    # Model requests: attempts per turn with jittered exponential backoff between them, the
+    # per-request network timeout, no new attempt after request_deadline seconds, and a circuit
+    # breaker (shared per model) that fails fast after repeated failures
+    self.request_max_attempts: int = request_max_attempts
+    self.retry_base_delay: float = retry_base_delay
+    self.retry_max_delay: float = retry_max_delay
+    self.request_timeout: Optional[float] = request_timeout
+    self.request_deadline: Optional[float] = request_deadline
+    self.breaker_failure_threshold: int = breaker_failure_threshold
+    self.breaker_reset_seconds: float = breaker_reset_seconds
+
+  def get_system_prompt(self, agent_name: str, memories_preloaded: bool = False) -> str:
+    template = self.system_prompt_template
+    if memories_preloaded:
+      template = template.replace(_FETCH_MEMORIES_LINE, _PRELOADED_MEMORIES_LINE)
     try:
-      return self.system_prompt_template.format(agent_name=agent_name)
+      return template.format(agent_name=agent_name)
     except Exception:
-      return self.system_prompt_template
+      return template
@@ -0,0 +1,99 @@
+import os
+import json
+
+
+def _overlaps(a, b):
+    """True if two absolute paths are the same or one contains the other."""
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+class ToolMemo:
+    """
+    Per-run cache of results of read-only tools.
+
+    Tools opt in with class attributes:
+      memoizable = True           the tool only reads; identical calls may share a result
+      resource_tags = ("todos",)  what the tool reads (memoizable) or writes (any other tool)
+      memo_paths(**arguments)     optional; the files or folders a call reads or writes
+
+    A result is keyed by (tool name, canonical JSON of the arguments, (mtime_ns, size) of each
+    memo path), so a file changed by anything outside the agent also misses. A non-memoizable tool
+    with resource_tags drops the cached results of the same tags: only those whose paths overlap
+    its own when both declare paths, otherwise all of them. A tool without resource_tags invalidates
+    nothing, so every tool that writes into the project tree must declare ("fs",).
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (tags, paths, result)
+        self.begin_run()
+
+    def begin_run(self):
+        self._entries.clear()
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    @staticmethod
+    def _paths(tool, arguments):
+        if not hasattr(tool, "memo_paths"):
+            return None
+        return [os.path.normcase(os.path.abspath(p)) for p in tool.memo_paths(**arguments)]
+
+    @staticmethod
+    def _signature(paths):
+        signature = []
+        for path in paths or ():
+            try:
+                st = os.stat(path)
+                signature.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def key(self, tool, name, arguments):
+        """(key, paths) for a memoizable call, else (None, None). Compute it before running the tool."""
+        if not getattr(tool, "memoizable", False):
+            return None, None
+        try:
+            paths = self._paths(tool, arguments)
+            key = (name, json.dumps(arguments, sort_keys=True, separators=(",", ":")), self._signature(paths))
+        except Exception:
+            return None, None
+        return key, paths
+
+    def get(self, key):
+        """(True, result) on a hit, (False, None) on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return False, None
+        self._stats["hits"] += 1
+        return True, entry[2]
+
+    def put(self, key, tool, paths, result):
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (frozenset(getattr(tool, "resource_tags", ())), paths, result)
+
+    def invalidate(self, tool, arguments):
+        """Drop cached results a call of this (writing) tool may have made stale."""
+        tags = set(getattr(tool, "resource_tags", ()))
+        if not tags or not self._entries:
+            return
+        try:
+            paths = self._paths(tool, arguments)
+        except Exception:
+            paths = None
+        stale = []
+        for key, (entry_tags, entry_paths, _) in self._entries.items():
+            if not tags & entry_tags:
+                continue
+            if paths is None or entry_paths is None or any(_overlaps(a, b) for a in paths for b in entry_paths):
+                stale.append(key)
+        for key in stale:
+            del self._entries[key]
+        self._stats["invalidated"] += len(stale)
+
+    def stats(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {**self._stats, "entries": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0}
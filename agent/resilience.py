@@ -0,0 +1,143 @@
+import time
+import random
+import threading
+
+# Exception class names (anywhere in the MRO) that mean "try again": OpenAI SDK errors and the
+# httpx errors a dropped stream surfaces as while iterating events
+_RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "RemoteProtocolError", "ReadError", "ReadTimeout", "WriteError", "WriteTimeout",
+    "ConnectError", "ConnectTimeout", "PoolTimeout", "ChunkedEncodingError",
+}
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Codes of in-stream "error" / "response.failed" events that are transient
+_RETRYABLE_STREAM_CODES = {"server_error", "internal_error", "rate_limit_exceeded", "server_overloaded", "timeout"}
+
+
+class StreamError(Exception):
+    """An error reported inside the event stream rather than raised by the client."""
+
+    RETRYABLE_CODES = _RETRYABLE_STREAM_CODES
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}" if code else message)
+        self.code = code
+        self.retryable = code in self.RETRYABLE_CODES
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+def is_retryable(exc):
+    """True for timeouts, dropped connections, rate limits and 5xx responses."""
+    if isinstance(exc, StreamError):
+        return exc.retryable
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _RETRYABLE_ERRORS for cls in type(exc).__mro__):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status in _RETRYABLE_STATUS or status >= 500)
+
+
+def _retry_after(exc):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    How often and how long to retry one model request.
+
+    Delays use full jitter: a random value in [0, min(max_delay, base_delay * 2**(attempt-1))],
+    so clients that failed together do not retry together. A Retry-After header from the server
+    takes precedence, even beyond max_delay; a retry that would start after the deadline is not
+    made. deadline bounds the whole request including retries.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, request_timeout=120.0, deadline=300.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+
+    def delay(self, attempt, exc=None):
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        retry_after = _retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            # Retrying before the server allows it only burns attempts (and trips the breaker)
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after failure_threshold consecutive retryable failures.
+
+    While open, check() raises CircuitOpenError at once instead of letting every run wait through
+    its own retries. After reset_seconds one trial request is let through (half-open); its success
+    closes the breaker, its failure opens it again.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    @classmethod
+    def shared(cls, key, failure_threshold=5, reset_seconds=30.0):
+        """One breaker per key (e.g. model name), shared by all agents in the process."""
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(failure_threshold, reset_seconds)
+            return cls._instances[key]
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def check(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.reset_seconds - (now - self._opened_at)
+            # A trial that never reported back (stopped run, non-retryable error) expires too
+            if remaining <= 0 and (self._trial_at is None or now - self._trial_at >= self.reset_seconds):
+                self._trial_at = now
+                return
+            raise CircuitOpenError(
+                f"Model requests are paused after {self._failures} consecutive failures; "
+                f"retry in {max(1, round(remaining))} seconds."
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_at = None
@@ -0,0 +1,206 @@
+import json
+import time
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def _join(path, key):
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def compile_validator(schema):
+    """
+    Compile a JSON schema into a function validate(value, path="") -> [(path, message)].
+
+    All schema lookups happen here, once, so validating a call only runs the checks the schema
+    actually uses. Covers the subset tool schemas use: type (or a list of types), properties,
+    required, additionalProperties, items, enum, minimum/maximum, minLength/maxLength,
+    minItems/maxItems and anyOf. Other keywords are ignored.
+    """
+    if not isinstance(schema, dict):
+        return lambda value, path="": []
+    checks = []
+
+    types = schema.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[t] for t in names if t in _TYPE_CHECKS]
+        expected = " or ".join(names)
+
+        def check_type(value, path, errors):
+            if not any(check(value) for check in type_checks):
+                errors.append((path, f"expected {expected}, got {type(value).__name__}"))
+                return False
+            return True
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((path, f"must be one of {allowed}"))
+            return True
+        checks.append(check_enum)
+
+    bounds = [(k, schema[k]) for k in ("minimum", "maximum", "minLength", "maxLength", "minItems", "maxItems") if k in schema]
+    if bounds:
+        def check_bounds(value, path, errors):
+            for keyword, limit in bounds:
+                if keyword in ("minimum", "maximum"):
+                    if not _TYPE_CHECKS["number"](value):
+                        continue
+                    size = value
+                elif keyword in ("minLength", "maxLength"):
+                    if not isinstance(value, str):
+                        continue
+                    size = len(value)
+                else:
+                    if not isinstance(value, list):
+                        continue
+                    size = len(value)
+                if keyword.startswith("min") and size < limit or keyword.startswith("max") and size > limit:
+                    errors.append((path, f"violates {keyword}={limit}"))
+            return True
+        checks.append(check_bounds)
+
+    if "properties" in schema or "required" in schema or schema.get("additionalProperties") is False:
+        properties = {name: compile_validator(sub) for name, sub in (schema.get("properties") or {}).items()}
+        required = list(schema.get("required") or [])
+        closed = schema.get("additionalProperties") is False
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return True
+            for name in required:
+                if name not in value:
+                    errors.append((_join(path, name), "is required"))
+            for name, item in value.items():
+                validator = properties.get(name)
+                if validator is not None:
+                    errors.extend(validator(item, _join(path, name)))
+                elif closed:
+                    errors.append((_join(path, name), "is not an allowed property"))
+            return True
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_validator = compile_validator(schema["items"])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    errors.extend(item_validator(item, _join(path, i)))
+            return True
+        checks.append(check_items)
+
+    if "anyOf" in schema:
+        options = [compile_validator(sub) for sub in schema["anyOf"]]
+
+        def check_any_of(value, path, errors):
+            if all(option(value, path) for option in options):
+                errors.append((path, "does not match any allowed schema"))
+            return True
+        checks.append(check_any_of)
+
+    def validate(value, path=""):
+        errors = []
+        for check in checks:
+            # A failed type check makes the remaining checks meaningless
+            if not check(value, path, errors):
+                break
+        return errors
+
+    return validate
+
+
+class ToolRegistry:
+    """
+    Name -> tool lookup for the agent, built once from the tool list.
+
+    Each tool's parameter schema is compiled into a validator up front, so a call with malformed
+    or invalid arguments is answered with a structured error before the tool runs. Call counts,
+    errors and timings are kept per tool, for the current run and in total.
+    """
+
+    def __init__(self, tools):
+        self.tools = {}
+        self._validators = {}
+        for tool in tools:
+            # Hosted tools (web search, image generation) have no name and run on the API side
+            name = tool.schema.get("name")
+            if name is None:
+                continue
+            if name in self.tools:
+                raise ValueError(f"Duplicate tool name: {name}")
+            self.tools[name] = tool
+            self._validators[name] = compile_validator(tool.schema.get("parameters"))
+        self.schemas = [tool.schema for tool in tools]
+        self._run_stats = {}
+        self._total_stats = {}
+
+    def get(self, name):
+        return self.tools.get(name)
+
+    def parse_arguments(self, name, raw_arguments):
+        """Return (arguments, None) for valid JSON arguments, else (None, error result for the model)."""
+        try:
+            arguments = json.loads(raw_arguments) if raw_arguments else {}
+        except ValueError as e:
+            return None, {"status": "error", "error": "invalid_arguments", "message": f"Arguments for {name} are not valid JSON: {e}"}
+        validator = self._validators.get(name)
+        errors = validator(arguments) if validator is not None else []
+        if errors:
+            return None, {
+                "status": "error",
+                "error": "invalid_arguments",
+                "message": f"Arguments for {name} do not match its schema; fix them and call again.",
+                "errors": [{"path": path or "(arguments)", "message": message} for path, message in errors[:20]],
+            }
+        return arguments, None
+
+    def begin_run(self):
+        self._run_stats = {}
+
+    def record(self, name, seconds, outcome):
+        """Count one call; outcome is 'ok', 'error', 'invalid_arguments' or 'cache_hit' (answered from the memo)."""
+        for stats in (self._run_stats, self._total_stats):
+            entry = stats.setdefault(name, {"calls": 0, "errors": 0, "invalid_arguments": 0, "cache_hits": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["calls"] += 1
+            if outcome == "error":
+                entry["errors"] += 1
+            elif outcome == "invalid_arguments":
+                entry["invalid_arguments"] += 1
+            elif outcome == "cache_hit":
+                entry["cache_hits"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    @staticmethod
+    def outcome(result):
+        """'error' for an error result dict, else 'ok'."""
+        failed = isinstance(result, dict) and (result.get("status") == "error" or result.get("type") == "error")
+        return "error" if failed else "ok"
+
+    def stats(self, scope="run"):
+        """Per-tool {calls, errors, invalid_arguments, cache_hits, total_seconds, avg_seconds, max_seconds} for the current run or in total."""
+        stats = self._run_stats if scope == "run" else self._total_stats
+        return {
+            name: {
+                **entry,
+                "total_seconds": round(entry["total_seconds"], 4),
+                "avg_seconds": round(entry["total_seconds"] / entry["calls"], 4) if entry["calls"] else 0.0,
+                "max_seconds": round(entry["max_seconds"], 4),
+            }
+            for name, entry in stats.items()
+        }
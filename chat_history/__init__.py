@@ -4,7 +4,13 @@ Convenient import path: `from chat_history import ChatHistoryManager`.
 """
 
 from .chat_history import ChatHistoryManager
+from .blob_store import BlobStore
+from .summarizer import HistorySummarizer, LocalSummarizer, OpenAISummarizer
 
 __all__ = [
 	"ChatHistoryManager",
+	"BlobStore",
+	"HistorySummarizer",
+	"LocalSummarizer",
+	"OpenAISummarizer",
 ]
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import base64
+import hashlib
+import tempfile
+
+BLOBS_DIR = os.path.join(os.path.dirname(__file__), 'blobs')
+
+# Inline data URLs shorter than this stay in the JSON; the reference would not be much smaller
+MIN_BLOB_SIZE = 1024
+
+_DATA_URL_RE = re.compile(r'^data:([\w.+-]+/[\w.+-]+);base64,', re.ASCII)
+_BLOB_REF_RE = re.compile(r'^blob:([\w.+-]+/[\w.+-]+);sha256,([0-9a-f]{64})$', re.ASCII)
+_BLOB_REF_TEXT_RE = re.compile(r'blob:[\w.+-]+/[\w.+-]+;sha256,([0-9a-f]{64})', re.ASCII)
+
+
+class BlobStore:
+    """
+    Content-addressed store for binary payloads (generated images, screenshots).
+
+    Blobs are saved once under their SHA-256 digest (blobs/ab/abcdef...). JSON files hold a short
+    reference 'blob:<mime>;sha256,<digest>' in place of a 'data:<mime>;base64,...' URL, and
+    references are turned back into data URLs only when the content is needed.
+    """
+
+    def __init__(self, root=BLOBS_DIR):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data, mime='application/octet-stream'):
+        """Store bytes (no-op if already present) and return their reference."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return f"blob:{mime};sha256,{digest}"
+
+    def get(self, ref):
+        """Return the bytes behind a reference."""
+        match = _BLOB_REF_RE.match(ref)
+        if not match:
+            raise ValueError(f"Not a blob reference: {ref[:80]}")
+        with open(self._path(match.group(2)), 'rb') as f:
+            return f.read()
+
+    def to_data_url(self, ref):
+        mime = _BLOB_REF_RE.match(ref).group(1)
+        return f"data:{mime};base64,{base64.b64encode(self.get(ref)).decode('ascii')}"
+
+    @staticmethod
+    def is_ref(value):
+        return isinstance(value, str) and value.startswith('blob:') and _BLOB_REF_RE.match(value) is not None
+
+    def externalize(self, obj):
+        """
+        Return obj with every large base64 data URL string replaced by a blob reference.
+        Unchanged sub-structures are returned as-is (not copied).
+        """
+        if isinstance(obj, str):
+            if len(obj) >= MIN_BLOB_SIZE and obj.startswith('data:'):
+                match = _DATA_URL_RE.match(obj)
+                if match:
+                    try:
+                        data = base64.b64decode(obj[match.end():], validate=True)
+                    except ValueError:
+                        return obj
+                    return self.put(data, match.group(1))
+            return obj
+        if isinstance(obj, dict):
+            changed = {k: self.externalize(v) for k, v in obj.items()}
+            return changed if any(changed[k] is not obj[k] for k in obj) else obj
+        if isinstance(obj, list):
+            changed = [self.externalize(v) for v in obj]
+            return changed if any(a is not b for a, b in zip(changed, obj)) else obj
+        return obj
+
+    def resolve(self, obj):
+        """Inverse of externalize(): blob references become data URLs again. A missing blob is left as its reference."""
+        if isinstance(obj, str):
+            if self.is_ref(obj):
+                try:
+                    return self.to_data_url(obj)
+                except OSError:
+                    return obj
+            return obj
+        if isinstance(obj, dict):
+            changed = {k: self.resolve(v) for k, v in obj.items()}
+            return changed if any(changed[k] is not obj[k] for k in obj) else obj
+        if isinstance(obj, list):
+            changed = [self.resolve(v) for v in obj]
+            return changed if any(a is not b for a, b in zip(changed, obj)) else obj
+        return obj
+
+    @staticmethod
+    def refs_in(obj, found=None):
+        """Collect the digests of all blob references inside obj."""
+        if found is None:
+            found = set()
+        if isinstance(obj, str):
+            if obj.startswith('blob:'):
+                match = _BLOB_REF_RE.match(obj)
+                if match:
+                    found.add(match.group(2))
+        elif isinstance(obj, dict):
+            for v in obj.values():
+                BlobStore.refs_in(v, found)
+        elif isinstance(obj, list):
+            for v in obj:
+                BlobStore.refs_in(v, found)
+        return found
+
+    @staticmethod
+    def refs_in_text(text):
+        """Digests of all blob references in serialized JSON text."""
+        return set(_BLOB_REF_TEXT_RE.findall(text))
+
+    def collect_garbage(self, live_digests, grace_seconds=600):
+        """
+        Delete blobs not in live_digests. Blobs younger than grace_seconds are kept, since another
+        process may have stored them and not yet saved the JSON that references them.
+        """
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        cutoff = time.time() - grace_seconds
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name not in live_digests and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
@@ -1,20 +1,133 @@
 import os
 import json
 import uuid
+import tempfile
 from datetime import datetime
 
+from .blob_store import BlobStore
+
 CHAT_HISTORY_FILE = os.path.join(os.path.dirname(__file__), 'chat_history.json')
 IMAGES_FILE = os.path.join(os.path.dirname(__file__), 'generated_images.json')
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+
+class _HistorySource:
+    """A history file as it was when its index was read; lazy entries read their content from it."""
+
+    def __init__(self, path, size, mtime_ns):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._by_id = None
+
+    def unchanged(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def read(self, offset, length, handle=None):
+        if handle is not None:
+            handle.seek(offset)
+            return handle.read(length)
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def find(self, entry_id):
+        """Fallback when the file was rewritten by someone else: parse it once and look the entry up by id."""
+        if self._by_id is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._by_id = {e.get('id'): e for e in json.load(f) if isinstance(e, dict)}
+            except (OSError, ValueError):
+                self._by_id = {}
+        return self._by_id.get(entry_id)
+
+
+class LazyEntry(dict):
+    """
+    A wrapped history entry holding only {id, ts, type, size} until 'content' is first accessed,
+    at which point the entry is read from its byte range in the history file.
+    """
+
+    __slots__ = ('_source', '_offset', '_length')
+
+    def __init__(self, meta, source, offset, length):
+        super().__init__(id=meta['id'], ts=meta['ts'], type=meta['type'], size=meta['size'])
+        self._source = source
+        self._offset = offset
+        self._length = length
+
+    @property
+    def hydrated(self):
+        return dict.__contains__(self, 'content')
+
+    def __missing__(self, key):
+        if key != 'content':
+            raise KeyError(key)
+        self.hydrate()
+        return dict.__getitem__(self, 'content')
+
+    def __contains__(self, key):
+        return key == 'content' or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def hydrate(self):
+        if self.hydrated:
+            return
+        entry = None
+        if self._source.unchanged():
+            try:
+                entry = json.loads(self._source.read(self._offset, self._length))
+            except ValueError:
+                entry = None
+            if not isinstance(entry, dict) or entry.get('id') != dict.__getitem__(self, 'id'):
+                entry = None
+        if entry is None:
+            entry = self._source.find(dict.__getitem__(self, 'id'))
+        # None marks an entry that was deleted from the file by another process
+        dict.__setitem__(self, 'content', entry.get('content') if entry else None)
+
+    def raw_bytes(self, handle):
+        """The entry's serialized bytes, copied verbatim from the history file (caller checked the file is unchanged)."""
+        return self._source.read(self._offset, self._length, handle)
+
+    def rebind(self, source, offset, length):
+        self._source = source
+        self._offset = offset
+        self._length = length
+
 
 class ChatHistoryManager:
-    def __init__(self, file_path=CHAT_HISTORY_FILE, images_path=IMAGES_FILE):
+    def __init__(self, file_path=CHAT_HISTORY_FILE, images_path=IMAGES_FILE, blob_store=None, lazy=True):
         self.file_path = file_path
         self.images_path = images_path
+        self.index_path = file_path + INDEX_SUFFIX
+        # With lazy=True only the index is read; entry contents are loaded on first access
+        self.lazy = lazy
+        # Images and screenshots are stored as blobs; history entries only hold references
+        self.blobs = blob_store or BlobStore(os.path.join(os.path.dirname(os.path.abspath(file_path)), 'blobs'))
+        self._generated_images = None
         self.history = self.load_history()
-        self.generated_images = self.load_generated_images()
+
+    @property
+    def generated_images(self):
+        if self._generated_images is None:
+            self._generated_images = self.load_generated_images()
+        return self._generated_images
+
+    @generated_images.setter
+    def generated_images(self, value):
+        self._generated_images = value
 
     def _wrap_entry(self, content):
         """Wrap an OpenAI message object in metadata envelope."""
+        content = self.blobs.externalize(content)
         content_json = json.dumps(content, ensure_ascii=False)
         content_size = len(content_json.encode('utf-8'))
         
@@ -42,20 +155,70 @@ class ChatHistoryManager:
         }
 
     def _unwrap_entries(self, wrapped_entries):
-        """Extract OpenAI message objects from wrapped entries."""
-        return [entry['content'] for entry in wrapped_entries]
+        """Extract OpenAI message objects from wrapped entries, turning blob references back into data URLs."""
+        contents = (entry['content'] for entry in wrapped_entries)
+        return [self.blobs.resolve(content) for content in contents if content is not None]
+
+    def _externalize_entry(self, entry):
+        """Move inline base64 payloads of an already wrapped entry into the blob store."""
+        content = self.blobs.externalize(entry['content'])
+        if content is entry['content']:
+            return entry
+        size = len(json.dumps(content, ensure_ascii=False).encode('utf-8'))
+        return {**entry, "size": size, "content": content}
+
+    def collect_garbage(self):
+        """Delete blobs no longer referenced by the history or the generated images."""
+        # Scan the saved file text rather than hydrating every lazy entry
+        live = set()
+        if os.path.exists(self.file_path):
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                live = BlobStore.refs_in_text(f.read())
+        BlobStore.refs_in([entry['content'] for entry in self.history if not isinstance(entry, LazyEntry) or entry.hydrated], live)
+        BlobStore.refs_in(self.generated_images, live)
+        return self.blobs.collect_garbage(live)
+
+    def _load_index(self):
+        """Lazy entries from the index sidecar, or None if it is missing or does not match the history file."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            st = os.stat(self.file_path)
+        except (OSError, ValueError):
+            return None
+        if index.get('version') != INDEX_VERSION or index.get('size') != st.st_size or index.get('mtime_ns') != st.st_mtime_ns:
+            return None
+        source = _HistorySource(self.file_path, st.st_size, st.st_mtime_ns)
+        return [LazyEntry(meta, source, meta['offset'], meta['length']) for meta in index['entries']]
 
     def load_history(self):
         """Load history from file. Handles both old and new format."""
+        if self.lazy:
+            entries = self._load_index()
+            if entries is not None:
+                return entries
         if os.path.exists(self.file_path):
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            st = os.stat(self.file_path)
+            with open(self.file_path, 'rb') as f:
+                raw_bytes = f.read()
+                raw = raw_bytes.decode('utf-8')
+                data = json.loads(raw)
                 
                 # Check if data is already in new wrapped format
                 if data and isinstance(data, list) and len(data) > 0:
                     first_entry = data[0]
                     if isinstance(first_entry, dict) and 'id' in first_entry and 'ts' in first_entry and 'content' in first_entry:
-                        # Already in new format
+                        # Already in new format; move any inline base64 images into the blob store
+                        if '"data:' in raw:
+                            migrated = [self._externalize_entry(entry) for entry in data]
+                            if any(a is not b for a, b in zip(migrated, data)):
+                                print("Moving inline images in chat history to the blob store...")
+                                self.history = data = migrated
+                                self.save_history()
+                                return data
+                        if self.lazy:
+                            # No usable index yet: build it from the file as read, so the next load only needs the index
+                            self._rebuild_index(raw, data, st)
                         return data
                     else:
                         # Old format - migrate to new format
@@ -70,12 +233,110 @@ class ChatHistoryManager:
         return []
 
     def save_history(self):
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.history, f, ensure_ascii=False, indent=2)
+        """
+        Atomically write the history and its index. Entries that were never loaded are copied as raw
+        byte ranges from the current file instead of being parsed and re-serialized.
+        """
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        handles = {}
+        index = []
+        kept = []
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(b'[')
+                pos = 1
+                for entry in self.history:
+                    data = None
+                    if isinstance(entry, LazyEntry) and not entry.hydrated:
+                        source = entry._source
+                        if source not in handles:
+                            handles[source] = open(source.path, 'rb') if source.unchanged() else None
+                        if handles[source] is not None:
+                            data = entry.raw_bytes(handles[source])
+                    if data is None:
+                        if isinstance(entry, LazyEntry) and entry['content'] is None:
+                            continue
+                        data = json.dumps(entry, ensure_ascii=False, indent=2).encode('utf-8')
+                    separator = b'\n' if not index else b',\n'
+                    out.write(separator)
+                    pos += len(separator)
+                    index.append({"id": entry['id'], "ts": entry['ts'], "type": entry['type'], "size": entry['size'], "offset": pos, "length": len(data)})
+                    kept.append(entry)
+                    out.write(data)
+                    pos += len(data)
+                out.write(b'\n]\n')
+                out.flush()
+                os.fsync(out.fileno())
+            for handle in handles.values():
+                if handle is not None:
+                    handle.close()
+            handles = {}
+            os.replace(tmp_path, self.file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            for handle in handles.values():
+                if handle is not None:
+                    handle.close()
+        self.history = kept
 
-    def get_history(self):
-        """Get OpenAI-compatible message list (unwrapped contents)."""
-        return self._unwrap_entries(self.history)
+        st = os.stat(self.file_path)
+        source = _HistorySource(self.file_path, st.st_size, st.st_mtime_ns)
+        for entry, meta in zip(kept, index):
+            if isinstance(entry, LazyEntry):
+                entry.rebind(source, meta['offset'], meta['length'])
+        self._save_index(index, st)
+
+    def _rebuild_index(self, text, data, st):
+        """
+        Write only the index sidecar for the history file as read: text is its decoded content, data
+        the parsed entries and st its stat from before reading. The history file itself is never
+        rewritten by a read, so a concurrent writer's changes cannot be lost; if the file changed
+        while it was read, no index is written.
+        """
+        decoder = json.JSONDecoder()
+        index = []
+        pos = text.index('[') + 1
+        byte_pos = len(text[:pos].encode('utf-8'))
+        for entry in data:
+            start = pos
+            while text[start] in ' \t\r\n,':
+                start += 1
+            _, end = decoder.raw_decode(text, start)
+            offset = byte_pos + len(text[pos:start].encode('utf-8'))
+            length = len(text[start:end].encode('utf-8'))
+            index.append({"id": entry['id'], "ts": entry['ts'], "type": entry.get('type', 'unknown'), "size": entry.get('size', length), "offset": offset, "length": length})
+            pos, byte_pos = end, offset + length
+        try:
+            current = os.stat(self.file_path)
+        except OSError:
+            return
+        if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return
+        try:
+            self._save_index(index, st)
+        except OSError:
+            # The index is only a cache; without it the next load parses the file again
+            pass
+
+    def _save_index(self, entries, st):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get_history(self, limit=None):
+        """Get OpenAI-compatible message list (unwrapped contents), optionally only the last `limit` entries."""
+        entries = self.history[-limit:] if limit else self.history
+        return self._unwrap_entries(entries)
 
     def get_wrapped_history(self):
         """Get full wrapped entries with metadata."""
@@ -106,6 +367,7 @@ class ChatHistoryManager:
         
         if deleted_count > 0:
             self.save_history()
+            self.collect_garbage()
         
         return {
             "status": "success",
@@ -117,18 +379,25 @@ class ChatHistoryManager:
         """Get a single wrapped entry by ID."""
         for entry in self.history:
             if entry['id'] == entry_id:
-                return entry
+                if entry['content'] is None:
+                    return None
+                return dict(entry)
         return None
 
     def clear_history(self):
         self.history = []
         self.save_history()
+        self.collect_garbage()
 
     def load_generated_images(self):
         if self.images_path and os.path.exists(self.images_path):
             with open(self.images_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                return data
+            migrated = self.blobs.externalize(data)
+            if migrated is not data:
+                self.generated_images = migrated
+                self.save_generated_images()
+            return migrated
         return []
 
     def save_generated_images(self):
@@ -136,13 +405,14 @@ class ChatHistoryManager:
             json.dump(self.generated_images, f, ensure_ascii=False, indent=2)
 
     def get_generated_images(self):
-        return self.generated_images
+        return self.blobs.resolve(self.generated_images)
     
     def add_generated_images(self, images):
         if images:
-            self.generated_images.extend(images)
+            self.generated_images.extend(self.blobs.externalize(images))
         self.save_generated_images()
 
     def clear_generated_images(self):
         self.generated_images = []
         self.save_generated_images()
+        self.collect_garbage()
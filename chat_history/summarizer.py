@@ -0,0 +1,279 @@
+import os
+import hashlib
+import threading
+from datetime import datetime
+
+from storage import JsonStore
+
+SUMMARIES_FILE = os.path.join(os.path.dirname(__file__), 'summaries.json')
+
+SUMMARY_HEADER = "# Summary of the earlier conversation\n\nOlder turns were compacted into the summaries below; the most recent turns follow verbatim.\n"
+
+_LEAF_INSTRUCTIONS = (
+    "Summarize this part of a conversation between a user and an AI assistant, for the assistant's own later reference. "
+    "Keep facts, decisions, file paths, names, results of tool calls, open tasks and user preferences; drop pleasantries and repetition. "
+    "Write plain sentences, at most {max_words} words."
+)
+_MERGE_INSTRUCTIONS = (
+    "Combine these consecutive summaries of one conversation into a single summary, for the assistant's own later reference. "
+    "Keep facts, decisions, file paths, names, open tasks and user preferences; drop details that later parts superseded. "
+    "Write plain sentences, at most {max_words} words."
+)
+
+
+def _clip(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def render_entry(content):
+    """One line of plain text for a history entry's content ('' for reasoning and unknown items)."""
+    if not isinstance(content, dict):
+        return ""
+    kind = content.get('type')
+    if kind == 'reasoning':
+        return ""
+    if kind == 'function_call':
+        return f"[tool call] {content.get('name')}({_clip(content.get('arguments', ''), 300)})"
+    if kind == 'custom_tool_call':
+        return f"[tool call] {content.get('name')}({_clip(content.get('input', ''), 300)})"
+    if kind in ('function_call_output', 'custom_tool_call_output'):
+        return f"[tool result] {_clip(content.get('output', ''), 500)}"
+    if kind == 'image_generation_call':
+        return "[generated image]"
+    role = content.get('role')
+    if role is None:
+        return ""
+    parts = content.get('content')
+    if isinstance(parts, str):
+        text = parts
+    else:
+        text = " ".join(
+            part.get('text', '') if 'text' in part else "[image]"
+            for part in parts or [] if isinstance(part, dict)
+        )
+    return f"{role.capitalize()}: {_clip(text, 2000)}"
+
+
+class LocalSummarizer:
+    """
+    Extractive summarizer that needs no model: keeps the start of every user and assistant message
+    and the names of the tools used. Deterministic, so it is also the stand-in for tests and offline use.
+    """
+
+    def __init__(self, max_chars=1200):
+        self.max_chars = max_chars
+
+    def __call__(self, text, level):
+        if level > 1:
+            parts = [p for p in text.split("\n\n") if p]
+            share = max(80, self.max_chars // max(1, len(parts)))
+            return _clip(" ".join(_clip(p, share) for p in parts), self.max_chars)
+        lines, tools = [], []
+        for line in text.splitlines():
+            if line.startswith("[tool call] "):
+                name = line[len("[tool call] "):].split("(", 1)[0]
+                if name not in tools:
+                    tools.append(name)
+            elif line.startswith(("User: ", "Assistant: ")):
+                lines.append(_clip(line, 200))
+        if tools:
+            lines.append("Tools used: " + ", ".join(tools))
+        return _clip(" ".join(lines), self.max_chars)
+
+
+class OpenAISummarizer:
+    """Summarizes with a (cheaper) OpenAI model through the Responses API."""
+
+    def __init__(self, model="gpt-5-mini", max_words=200):
+        from openai import OpenAI
+        self.client = OpenAI()
+        self.model = model
+        self.max_words = max_words
+
+    def __call__(self, text, level):
+        instructions = (_LEAF_INSTRUCTIONS if level == 1 else _MERGE_INSTRUCTIONS).format(max_words=self.max_words)
+        response = self.client.responses.create(model=self.model, instructions=instructions, input=text, store=False)
+        return response.output_text.strip()
+
+
+class HistorySummarizer:
+    """
+    Compacts older chat history into hierarchical summaries, so the agent is sent
+    "summary + recent tail" instead of every past turn.
+
+    The history (minus the last keep_recent entries) is cut into leaf spans of at least chunk_size
+    entries, always ending before a user message so tool calls stay next to their outputs. Every
+    `fanout` consecutive summaries of one level are merged into one summary of the next level, so
+    the compacted prefix is covered by a few summaries, like the digits of a counter. Summaries are
+    cached in summaries.json under a hash of the span's entry ids (or of the child keys), so new
+    turns only summarize the newly completed spans and their parents.
+
+    `build_input()` never calls the model: spans without a cached summary stay verbatim in the tail.
+    `refresh()` (or `schedule()`, on a background thread) fills in the missing summaries.
+    """
+
+    def __init__(self, summarize=None, cache_path=SUMMARIES_FILE, chunk_size=40, fanout=4, keep_recent=40):
+        self.summarize = summarize or LocalSummarizer()
+        self.chunk_size = chunk_size
+        self.fanout = fanout
+        self.keep_recent = keep_recent
+        self._store = JsonStore(cache_path, default={})
+        self._cache = None
+        self._cache_version = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = None
+
+    def _summaries(self):
+        """Cached summaries {key: {...}}, re-read only when the file changed. The returned dict is never modified."""
+        # Called from the caller's thread (build_input) and the background thread (refresh)
+        with self._lock:
+            if self._cache is None or self._store.version() != self._cache_version:
+                try:
+                    data, self._cache_version = self._store.read()
+                except ValueError:
+                    data, self._cache_version = {}, self._store.version()
+                self._cache = data if isinstance(data, dict) else {}
+            return self._cache
+
+    @staticmethod
+    def _is_turn_start(entry):
+        # User messages are stored with the type of their first content part (input_text / input_image)
+        return str(entry.get('type', '')).startswith('input_')
+
+    def _leaves(self, entries):
+        limit = len(entries) - self.keep_recent
+        leaves, start = [], 0
+        for i in range(1, limit + 1):
+            if i - start >= self.chunk_size and i < len(entries) and self._is_turn_start(entries[i]):
+                ids = "\n".join(e['id'] for e in entries[start:i])
+                leaves.append({"key": hashlib.sha256(ids.encode('utf-8')).hexdigest()[:32], "level": 1,
+                               "start": start, "end": i, "children": []})
+                start = i
+        return leaves
+
+    def cover(self, entries):
+        """Summary nodes covering the compacted prefix of entries, in order (largest spans first)."""
+        cover, nodes, level = [], self._leaves(entries), 1
+        while nodes:
+            full = len(nodes) // self.fanout * self.fanout
+            cover = nodes[full:] + cover
+            parents = []
+            for i in range(0, full, self.fanout):
+                children = nodes[i:i + self.fanout]
+                keys = f"{level + 1}:" + ",".join(c['key'] for c in children)
+                parents.append({"key": hashlib.sha256(keys.encode('utf-8')).hexdigest()[:32], "level": level + 1,
+                                "start": children[0]['start'], "end": children[-1]['end'], "children": children})
+            nodes, level = parents, level + 1
+        return cover
+
+    def build_input(self, manager):
+        """Agent input for the history of a ChatHistoryManager: one summary message plus the verbatim tail."""
+        entries = manager.get_wrapped_history()
+        summaries = self._summaries()
+        texts, cut = [], 0
+        for node in self.cover(entries):
+            cached = summaries.get(node['key'])
+            if cached is None:
+                break
+            if cached['text']:
+                texts.append(cached['text'])
+            cut = node['end']
+        if not cut:
+            return manager.get_history()
+        tail = manager.get_history(limit=len(entries) - cut) if cut < len(entries) else []
+        if not texts:
+            return tail
+        summary = {"role": "user", "content": [{"type": "input_text", "text": SUMMARY_HEADER + "\n" + "\n\n".join(texts)}]}
+        return [summary] + tail
+
+    def _summary(self, node, entries, summaries, new):
+        cached = summaries.get(node['key']) or new.get(node['key'])
+        if cached is not None:
+            return cached['text']
+        if node['level'] == 1:
+            lines = (render_entry(entry.get('content')) for entry in entries[node['start']:node['end']])
+            source = "\n".join(line for line in lines if line)
+        else:
+            source = "\n\n".join(self._summary(child, entries, summaries, new) for child in node['children'])
+        text = self.summarize(source, node['level']) if source else ""
+        new[node['key']] = {
+            "level": node['level'],
+            "first_id": entries[node['start']]['id'],
+            "last_id": entries[node['end'] - 1]['id'],
+            "entries": node['end'] - node['start'],
+            "created": datetime.now().isoformat(),
+            "text": text,
+        }
+        return text
+
+    def refresh(self, entries):
+        """Summarize every span of the cover that has no cached summary yet; returns how many were added."""
+        cover = self.cover(entries)
+        summaries = self._summaries()
+        new = {}
+        for node in cover:
+            self._summary(node, entries, summaries, new)
+        live = {node['key'] for node in cover}
+        if not new and set(summaries) <= live:
+            return 0
+        with self._store.locked():
+            # Keep only the summaries of the current cover; merged children are no longer needed
+            current = dict(self._summaries())
+            current.update(new)
+            self._store.write({k: v for k, v in current.items() if k in live})
+        with self._lock:
+            self._cache = None
+        return sum(1 for key in new if key in live)
+
+    def _snapshot(self, entries):
+        """
+        Plain copies of the entries for the background thread, which must not touch the manager's
+        lazily loaded entries (saving the history re-points them at the new file). Content is only
+        copied for the leaf spans refresh() will have to summarize, found the way _summary() walks the cover.
+        """
+        summaries = self._summaries()
+        needed = set()
+        stack = list(self.cover(entries))
+        while stack:
+            node = stack.pop()
+            if node['key'] in summaries:
+                continue
+            if node['level'] == 1:
+                needed.update(range(node['start'], node['end']))
+            else:
+                stack.extend(node['children'])
+        return [
+            {"id": entry['id'], "type": entry.get('type'), "content": entry['content']} if i in needed
+            else {"id": entry['id'], "type": entry.get('type')}
+            for i, entry in enumerate(entries)
+        ]
+
+    def schedule(self, manager):
+        """Run refresh() for a snapshot of the manager's current history on a background thread; coalesces repeated calls."""
+        snapshot = self._snapshot(manager.get_wrapped_history())
+        with self._lock:
+            self._pending = snapshot
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_background, name="history-summarizer", daemon=True)
+            self._thread.start()
+
+    def _run_background(self):
+        while True:
+            with self._lock:
+                entries, self._pending = self._pending, None
+                if entries is None:
+                    self._thread = None
+                    return
+            try:
+                self.refresh(entries)
+            except Exception as e:
+                print(f"History summarization failed: {e}", flush=True)
+
+    def wait(self, timeout=None):
+        """Block until a scheduled background refresh has finished."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
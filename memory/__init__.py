@@ -4,7 +4,17 @@ Convenient import path: `from memory import MemoryManager`.
 """
 
 from .memory import MemoryManager
+from .vector_index import HashingEmbedder, VectorIndex
+from .bm25 import BM25Index
+from .prompt_block import MemoryPromptProvider
+from .consolidation import MemoryConsolidator, MinHasher
 
 __all__ = [
 	"MemoryManager",
+	"HashingEmbedder",
+	"VectorIndex",
+	"BM25Index",
+	"MemoryPromptProvider",
+	"MemoryConsolidator",
+	"MinHasher",
 ]
@@ -0,0 +1,80 @@
+import math
+import heapq
+from collections import Counter
+from operator import itemgetter
+
+from .vector_index import _TOKEN_RE, STOPWORDS
+
+
+def tokenize(text):
+    return [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring over (id, text) pairs, updated incrementally.
+
+    Postings map each term to {id: term frequency}, so a query only touches the documents that
+    contain one of its terms; adding, updating or removing a document touches only its own terms.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts = {}  # id -> indexed text
+        self.postings = {}  # term -> {id: tf}
+        self._terms = {}  # id -> Counter of terms (for removal)
+        self._lengths = {}  # id -> document length in terms
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _drop(self, id_):
+        for term in self._terms.pop(id_, ()):
+            posting = self.postings[term]
+            del posting[id_]
+            if not posting:
+                del self.postings[term]
+        self._total_length -= self._lengths.pop(id_, 0)
+        self.texts.pop(id_, None)
+
+    def upsert(self, id_, text):
+        if self.texts.get(id_) == text:
+            return
+        self._drop(id_)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[id_] = tf
+        self.texts[id_] = text
+        self._terms[id_] = terms
+        self._lengths[id_] = sum(terms.values())
+        self._total_length += self._lengths[id_]
+
+    def remove(self, ids):
+        for id_ in ids:
+            if id_ in self.texts:
+                self._drop(id_)
+
+    def sync(self, items):
+        """Bring the index in line with {id: text}: reindex only new or changed texts and drop missing ids."""
+        self.remove([id_ for id_ in self.texts if id_ not in items])
+        for id_, text in items.items():
+            self.upsert(id_, text)
+
+    def search(self, query, top_k=10):
+        """Return [(id, score)] of the top_k best-matching documents; documents sharing no term are not returned."""
+        n = len(self.texts)
+        if not n or top_k <= 0:
+            return []
+        avgdl = self._total_length / n or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for id_, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[id_] / avgdl)
+                scores[id_] = scores.get(id_, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=itemgetter(1))
@@ -0,0 +1,294 @@
+import os
+import re
+import random
+import hashlib
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below
+    np = None
+
+from storage import JsonStore
+
+from .memory import MemoryManager, MEMORY_FILE
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text):
+    return _SPACE_RE.sub(" ", text.lower()).strip(" .!")
+
+
+def _words(text):
+    return set(_WORD_RE.findall(text.lower()))
+
+
+class MinHasher:
+    """
+    MinHash signatures over character n-grams, so near-duplicate texts get signatures that agree
+    in roughly the fraction of positions equal to their n-gram Jaccard similarity.
+
+    Hash functions are (a*x + b) mod (2^31 - 1) with fixed seeds; with NumPy all of them are applied
+    to all n-grams of a text in one broadcast. Both code paths produce identical signatures.
+    """
+
+    def __init__(self, num_perm=128, ngram=5, seed=1):
+        self.num_perm = num_perm
+        self.ngram = ngram
+        rng = random.Random(seed)
+        self._a = [rng.randrange(1, _MERSENNE_PRIME) for _ in range(num_perm)]
+        self._b = [rng.randrange(0, _MERSENNE_PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a_np = np.array(self._a, dtype=np.uint64)[:, None]
+            self._b_np = np.array(self._b, dtype=np.uint64)[:, None]
+
+    def shingles(self, text):
+        text = _normalize(text)
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def _hashes(self, text):
+        return [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") % _MERSENNE_PRIME
+                for s in self.shingles(text)]
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+    def signatures(self, texts, chunk_columns=1 << 16):
+        """Signatures of many texts. With NumPy, the n-grams of consecutive texts are hashed together in
+        chunks of about chunk_columns n-grams and reduced per text with minimum.reduceat."""
+        hashed = [self._hashes(text) for text in texts]
+        if np is None:
+            return [tuple(min((a * x + b) % _MERSENNE_PRIME for x in hashes) for a, b in zip(self._a, self._b))
+                    for hashes in hashed]
+        result = []
+        start = 0
+        while start < len(hashed):
+            end, columns = start, 0
+            while end < len(hashed) and (end == start or columns + len(hashed[end]) <= chunk_columns):
+                columns += len(hashed[end])
+                end += 1
+            chunk = hashed[start:end]
+            x = np.fromiter((h for hashes in chunk for h in hashes), dtype=np.uint64, count=columns)[None, :]
+            offsets = np.cumsum([0] + [len(h) for h in chunk[:-1]])
+            mins = np.minimum.reduceat((self._a_np * x + self._b_np) % _MERSENNE_PRIME, offsets, axis=1)
+            result.extend(tuple(int(v) for v in column) for column in mins.T)
+            start = end
+        return result
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def find_clusters(items, threshold=0.6, hasher=None, bands=32):
+    """
+    Group near-duplicate texts. items is [(id, text)]; returns [(ids, min_similarity)] for every
+    group of two or more, with ids in input order.
+
+    Candidate pairs come from LSH banding (texts whose signatures agree on a whole band), so the
+    work grows with the number of near-duplicates rather than with all n^2 pairs. Candidates are
+    scored against the threshold (in blocks, with NumPy) and connected groups are merged with
+    union-find.
+    """
+    hasher = hasher or MinHasher()
+    rows = hasher.num_perm // bands
+    signatures = hasher.signatures([text for _, text in items])
+
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    candidates = set()
+    for band in range(bands):
+        buckets = {}
+        for i, sig in enumerate(signatures):
+            buckets.setdefault(sig[band * rows:(band + 1) * rows], []).append(i)
+        for members in buckets.values():
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    candidates.add((i, j))
+
+    pair_scores = {}
+    if np is not None and candidates:
+        # Score all candidate pairs at once: fraction of equal positions per row pair
+        matrix = np.array(signatures, dtype=np.int64)
+        pairs = np.array(sorted(candidates), dtype=np.intp)
+        for start in range(0, len(pairs), 8192):
+            block = pairs[start:start + 8192]
+            scores = (matrix[block[:, 0]] == matrix[block[:, 1]]).mean(axis=1)
+            for (i, j), score in zip(block.tolist(), scores.tolist()):
+                if score >= threshold:
+                    pair_scores[(i, j)] = score
+    else:
+        for i, j in candidates:
+            score = similarity(signatures[i], signatures[j])
+            if score >= threshold:
+                pair_scores[(i, j)] = score
+    for i, j in pair_scores:
+        parent[find(j)] = find(i)
+
+    groups, min_scores = {}, {}
+    for i in range(len(items)):
+        groups.setdefault(find(i), []).append(i)
+    for (i, j), score in pair_scores.items():
+        root = find(i)
+        min_scores[root] = min(score, min_scores.get(root, 1.0))
+    return [([items[i][0] for i in members], round(min_scores[root], 3))
+            for root, members in groups.items() if len(members) > 1]
+
+
+class MemoryConsolidator:
+    """
+    Finds near-duplicate memories and merges each group into its longest text (the most recent one
+    on ties). Similar is not the same: "prefers dark mode" and "prefers light mode" can share a
+    group. So a memory is only deleted ("remove") when every word of it also appears in the kept
+    text, and nothing it says is lost. The other members of a group are listed under "review", as
+    proposals for the model to merge by rewriting, and are never deleted here.
+
+    `schedule()` runs the analysis on a background thread; the report is cached per memories-file
+    version, so asking for it again costs nothing until the memories change. With auto_apply the
+    background run also applies the removals. Every report includes the size of the memory set
+    against char_budget, the cost of sending all memories to the model.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, file_path=MEMORY_FILE, threshold=0.6, char_budget=6000, auto_apply=False):
+        self.file_path = file_path
+        self.threshold = threshold
+        self.char_budget = char_budget
+        self.auto_apply = auto_apply
+        self.hasher = MinHasher()
+        self._lock = threading.Lock()
+        self._report = None
+        self._report_key = None
+        self._thread = None
+        self._rerun = False
+
+    @classmethod
+    def shared(cls, file_path=MEMORY_FILE):
+        """One consolidator per memories file, shared by the app and the memory tools."""
+        key = os.path.abspath(file_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(file_path)
+            return cls._instances[key]
+
+    def _stats(self, memories):
+        total_chars = sum(len(m['text']) for m in memories)
+        return {
+            "total_memories": len(memories),
+            "total_chars": total_chars,
+            "estimated_tokens": total_chars // 4,
+            "char_budget": self.char_budget,
+            "over_budget": total_chars > self.char_budget,
+        }
+
+    def analyze(self, threshold=None):
+        """Report of proposed merges and size stats for the current memories (cached per file version)."""
+        threshold = self.threshold if threshold is None else threshold
+        key = (JsonStore(self.file_path).version(), threshold)
+        with self._lock:
+            if self._report_key == key:
+                return self._report
+        manager = MemoryManager(self.file_path)
+        memories = manager.get_memories()
+        position = {m['id']: i for i, m in enumerate(memories)}
+        merges = []
+        saved_chars = 0
+        for ids, score in find_clusters([(m['id'], m['text']) for m in memories], threshold, self.hasher):
+            group = [manager.get_memory(id_) for id_ in ids]
+            keep = max(group, key=lambda m: (len(m['text']), position[m['id']]))
+            keep_words = _words(keep['text'])
+            others = [m for m in group if m is not keep]
+            remove = [m for m in others if _words(m['text']) <= keep_words]
+            review = [m for m in others if not _words(m['text']) <= keep_words]
+            saved_chars += sum(len(m['text']) for m in remove)
+            merges.append({
+                "keep": {"id": keep['id'], "text": keep['text']},
+                "remove": [{"id": m['id'], "text": m['text']} for m in remove],
+                "review": [{"id": m['id'], "text": m['text']} for m in review],
+                "similarity": score,
+            })
+        stats = self._stats(memories)
+        report = {
+            "status": "success",
+            "threshold": threshold,
+            "merges": merges,
+            "needs_review": sum(1 for merge in merges if merge["review"]),
+            **stats,
+            "chars_after_merges": stats["total_chars"] - saved_chars,
+        }
+        with self._lock:
+            self._report, self._report_key = report, key
+        return report
+
+    def apply(self, report):
+        """
+        Delete the "remove" memories of a report's merges ("review" members are left alone). Groups
+        whose memories were edited or deleted since the report was made are skipped; everything else
+        is deleted with one write.
+        """
+        manager = MemoryManager(self.file_path)
+        with manager._store.locked():
+            manager._refresh()
+            remove_ids, skipped = [], 0
+            for merge in report["merges"]:
+                if not merge["remove"]:
+                    continue
+                members = [merge["keep"]] + merge["remove"]
+                current = [manager.get_memory(m["id"]) for m in members]
+                if any(c is None or c['text'] != m["text"] for c, m in zip(current, members)):
+                    skipped += 1
+                    continue
+                remove_ids.extend(m["id"] for m in merge["remove"])
+            results = manager.delete_many(remove_ids)
+        errors = [r for r in results if r["status"] != "success"]
+        if errors:
+            return {"status": "error", "message": errors[0].get("message", "Failed to delete memories.")}
+        return {
+            "status": "success",
+            "removed": len(remove_ids),
+            "skipped_merges": skipped,
+            **self._stats(manager.get_memories()),
+        }
+
+    def schedule(self):
+        """Run analyze() (and apply() with auto_apply) on a background thread; coalesces repeated calls."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._rerun = True
+                return
+            self._thread = threading.Thread(target=self._run_background, name="memory-consolidation", daemon=True)
+            self._thread.start()
+
+    def _run_background(self):
+        while True:
+            try:
+                report = self.analyze()
+                if self.auto_apply and any(merge["remove"] for merge in report["merges"]):
+                    self.apply(report)
+            except Exception as e:
+                print(f"Memory consolidation failed: {e}", flush=True)
+            with self._lock:
+                if not self._rerun:
+                    self._thread = None
+                    return
+                self._rerun = False
+
+    def wait(self, timeout=None):
+        """Block until a scheduled background run has finished."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
@@ -1,86 +1,200 @@
 import os
-import json
+import uuid
+import threading
 from datetime import datetime
 
+from storage import JsonStore, VersionConflict
+
+from .bm25 import BM25Index
+from .vector_index import VectorIndex
+
 MEMORY_FILE = os.path.join(os.path.dirname(__file__), 'memories.json')
 
+# Search indexes are shared per memory file by every MemoryManager in the process (tools create a
+# new manager per call), so texts are indexed once and afterwards only when they change.
+_INDEX_FACTORIES = {"vector": VectorIndex, "keyword": BM25Index}
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
 class MemoryManager:
     def __init__(self, file_path=MEMORY_FILE):
         self.file_path = file_path
+        self._store = JsonStore(file_path, default=[])
+        self._version = None
         # Ensure the memories file exists on initialization
         if not os.path.exists(self.file_path):
             try:
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    json.dump([], f, ensure_ascii=False, indent=2)
+                self._store.write([], expected_version=None)
             except Exception:
-                # If file creation fails, proceed; load_memories will handle gracefully
+                # If file creation fails (or another process just created it), proceed; load_memories will handle gracefully
                 pass
         self.memories = self.load_memories()
+        self._by_id = {m['id']: m for m in self.memories}
+        self._indexes = {}
 
     def load_memories(self):
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        return data
-                    else:
-                        return []
-            except Exception as e:
-                return []
-        return []
-
-    def save_memories(self):
+        # Also records the file version the memories were read at, for save_memories()
+        try:
+            data, self._version = self._store.read()
+        except Exception:
+            # Unreadable file: start empty; the next save replaces it
+            self._version = self._store.version()
+            return []
+        return data if isinstance(data, list) else []
+
+    def save_memories(self, memories=None):
+        """
+        Atomically write memories (default: the loaded list); fails instead of overwriting changes
+        another writer made since they were loaded. Only a successful write replaces the loaded list,
+        so a failed batch leaves the manager as it was.
+        """
+        memories = self.memories if memories is None else memories
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.memories, f, ensure_ascii=False, indent=2)
-            return {"status": "success"}
+            self._version = self._store.write(memories, expected_version=self._version)
+        except VersionConflict as e:
+            return {"status": "error", "message": f"{e}; reload and retry."}
         except Exception as e:
             return {"status": "error", "message": str(e)}
+        self.memories = memories
+        self._by_id = {m['id']: m for m in memories}
+        return {"status": "success"}
+
+    def _refresh(self):
+        """Reload if another writer changed the file since it was read (a stat call otherwise). Call with the store locked."""
+        if self._store.version() == self._version:
+            return
+        self.memories = self.load_memories()
+        self._by_id = {m['id']: m for m in self.memories}
+        if self._indexes:
+            with _INDEXES_LOCK:
+                for index in self._indexes.values():
+                    index.sync({m['id']: m['text'] for m in self.memories})
 
     def get_memories(self):
         return self.memories
 
-    def add_memory(self, text):
+    def get_memory(self, memory_id):
+        return self._by_id.get(memory_id)
+
+    def _new_id(self):
+        # Ids are short random hex strings that never change, so references stay valid after deletions
+        while True:
+            new_id = uuid.uuid4().hex[:8]
+            if new_id not in self._by_id:
+                return new_id
+
+    def _index(self, kind):
+        """The shared index of the given kind for this file, synced with the loaded memories on first use."""
+        index = self._indexes.get(kind)
+        if index is None:
+            with _INDEXES_LOCK:
+                index = _INDEXES.setdefault((os.path.abspath(self.file_path), kind), _INDEX_FACTORIES[kind]())
+                index.sync({m['id']: m['text'] for m in self.memories})
+            self._indexes[kind] = index
+        return index
+
+    @property
+    def index(self):
+        """Vector index (semantic similarity)."""
+        return self._index("vector")
+
+    @property
+    def keyword_index(self):
+        """BM25 inverted index (keyword relevance)."""
+        return self._index("keyword")
+
+    def _ranked(self, index, query, top_k, *args):
+        with _INDEXES_LOCK:
+            hits = index.search(query, top_k, *args)
+        return [{**self._by_id[id_], "score": round(score, 4)} for id_, score in hits if id_ in self._by_id]
+
+    def search_memories(self, query, top_k=10, min_score=0.02):
+        """Return the top_k memories most similar to query (each with a 'score'), best first."""
+        return self._ranked(self.index, query, top_k, min_score)
+
+    def keyword_search(self, query, top_k=10):
+        """Return the top_k memories ranked by BM25 for query; memories sharing no term with it are left out."""
+        return self._ranked(self.keyword_index, query, top_k)
+
+    def _index_upsert(self, memories):
+        if self._indexes and memories:
+            with _INDEXES_LOCK:
+                for index in self._indexes.values():
+                    for memory in memories:
+                        index.upsert(memory['id'], memory['text'])
+
+    def _index_remove(self, ids):
+        if self._indexes and ids:
+            with _INDEXES_LOCK:
+                for index in self._indexes.values():
+                    index.remove(ids)
+
+    def add_many(self, texts):
+        """Add one memory per text with a single write. Returns one result per text."""
         try:
-            new_id = str(len(self.memories) + 1)
-            now = datetime.now()
-            memory = {
-                "id": new_id,
-                "date": now.strftime('%Y-%m-%d'),
-                "time": now.strftime('%H:%M'),
-                "text": text
-            }
-            self.memories.append(memory)
-            save_result = self.save_memories()
+            with self._store.locked():
+                self._refresh()
+                now = datetime.now()
+                added = []
+                new_ids = set()
+                for text in texts:
+                    memory_id = self._new_id()
+                    while memory_id in new_ids:
+                        memory_id = self._new_id()
+                    new_ids.add(memory_id)
+                    added.append({
+                        "id": memory_id,
+                        "date": now.strftime('%Y-%m-%d'),
+                        "time": now.strftime('%H:%M'),
+                        "text": text
+                    })
+                save_result = self.save_memories(self.memories + added) if added else {"status": "success"}
             if save_result["status"] == "success":
-                return {"status": "success", "id": new_id, "memory": memory}
+                self._index_upsert(added)
+                return [{"status": "success", "id": m['id'], "memory": m} for m in added]
             else:
-                return {"status": "error", "message": save_result.get("message", "Failed to save memory.")}
+                return [{"status": "error", "message": save_result.get("message", "Failed to save memory.")} for _ in added]
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            return [{"status": "error", "message": str(e)} for _ in texts]
 
-    def update_memory(self, memory_id, new_text):
-        for memory in self.memories:
-            if memory['id'] == memory_id:
-                memory['text'] = new_text
-                save_result = self.save_memories()
-                if save_result["status"] == "success":
-                    return {"status": "success", "id": memory_id, "memory": memory}
-                else:
-                    return {"status": "error", "id": memory_id, "message": save_result.get("message", "Failed to save memory.")}
-        return {"status": "error", "id": memory_id, "message": "Memory id not found."}
+    def update_many(self, entries):
+        """Apply [{"id", "text"}, ...] with a single write. Returns one result per entry."""
+        with self._store.locked():
+            self._refresh()
+            updated = {}
+            for entry in entries:
+                memory = updated.get(entry['id']) or self._by_id.get(entry['id'])
+                if memory is not None:
+                    # Changed copies; the loaded memories stay untouched unless the write succeeds
+                    updated[memory['id']] = {**memory, "text": entry['text']}
+            if updated:
+                save_result = self.save_memories([updated.get(m['id'], m) for m in self.memories])
+            else:
+                save_result = {"status": "success"}
+        if save_result["status"] == "success":
+            self._index_upsert(list(updated.values()))
+        results = []
+        for entry in entries:
+            id_ = entry['id']
+            if id_ not in updated:
+                results.append({"status": "error", "id": id_, "message": "Memory id not found."})
+            elif save_result["status"] == "success":
+                results.append({"status": "success", "id": id_, "memory": updated[id_]})
+            else:
+                results.append({"status": "error", "id": id_, "message": save_result.get("message", "Failed to save memory.")})
+        return results
 
-    def delete_memories(self, ids):
-        found = set()
-        for id_ in ids:
-            if any(m['id'] == id_ for m in self.memories):
-                found.add(id_)
-        self.memories = [m for m in self.memories if m['id'] not in found]
-        # Renumber IDs after deletion
-        for idx, memory in enumerate(self.memories, start=1):
-            memory['id'] = str(idx)
-        save_result = self.save_memories()
+    def delete_many(self, ids):
+        """Delete memories by id with a single write. Returns one result per id."""
+        with self._store.locked():
+            self._refresh()
+            found = {id_ for id_ in ids if id_ in self._by_id}
+            if found:
+                save_result = self.save_memories([m for m in self.memories if m['id'] not in found])
+            else:
+                save_result = {"status": "success"}
+        if save_result["status"] == "success":
+            self._index_remove(found)
         results = []
         for id_ in ids:
             if id_ in found:
@@ -91,3 +205,12 @@ class MemoryManager:
             else:
                 results.append({"status": "error", "id": id_, "message": "Memory id not found."})
         return results
+
+    def add_memory(self, text):
+        return self.add_many([text])[0]
+
+    def update_memory(self, memory_id, new_text):
+        return self.update_many([{"id": memory_id, "text": new_text}])[0]
+
+    def delete_memories(self, ids):
+        return self.delete_many(ids)
@@ -0,0 +1,70 @@
+import os
+
+from .memory import MemoryManager, MEMORY_FILE
+
+BLOCK_HEADER = (
+    "# USER MEMORIES (preloaded)\n\n"
+    "The user's most relevant stored memories are listed below; do not call `get_user_memories` at the start. "
+    "Use `search_user_memories` or `get_user_memories` with a query only when you need something that is not listed.\n"
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) - good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class MemoryPromptProvider:
+    """
+    Builds the memory block an Agent appends to its instructions.
+
+    Memories are ranked by relevance to a query (vector similarity plus BM25), taken best-first
+    until the token budget is spent, then rendered in their stored order so that the same
+    selection always produces byte-identical text. `version()` changes only when the memories
+    file changes, so the agent can keep reusing the same block and the model's prompt cache stays warm.
+    """
+
+    def __init__(self, file_path=MEMORY_FILE):
+        self.file_path = file_path
+
+    def version(self):
+        try:
+            st = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _line(self, memory):
+        return f"- [{memory['id']}] {memory['text']}\n"
+
+    def select(self, query, token_budget):
+        manager = MemoryManager(self.file_path)
+        memories = manager.get_memories()
+        budget = token_budget - estimate_tokens(BLOCK_HEADER)
+        if sum(estimate_tokens(self._line(m)) for m in memories) <= budget:
+            return list(memories)
+
+        # Relevance first (normalized semantic + keyword scores), then the most recent memories
+        scores = {}
+        if query and query.strip():
+            for hits in (manager.search_memories(query, top_k=len(memories)), manager.keyword_search(query, top_k=len(memories))):
+                best = max((h['score'] for h in hits), default=0) or 1
+                for h in hits:
+                    scores[h['id']] = scores.get(h['id'], 0.0) + h['score'] / best
+        position = {m['id']: i for i, m in enumerate(memories)}
+        ranked = sorted(memories, key=lambda m: (-scores.get(m['id'], 0.0), -position[m['id']]))
+
+        chosen = set()
+        for memory in ranked:
+            cost = estimate_tokens(self._line(memory))
+            if cost <= budget:
+                chosen.add(memory['id'])
+                budget -= cost
+        return [m for m in memories if m['id'] in chosen]
+
+    def build_block(self, query, token_budget):
+        """The rendered memory block for instructions, or '' when there are no memories."""
+        selected = self.select(query, token_budget)
+        if not selected:
+            return ""
+        return BLOCK_HEADER + "\n" + "".join(self._line(m) for m in selected)
@@ -0,0 +1,140 @@
+import re
+import math
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below
+    np = None
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Words that occur in nearly every memory ("User prefers ...") and carry no topic
+STOPWORDS = frozenset(
+    "user users the a an and or of to in on for with is are was were be been it its this that "
+    "as at by from has have had not no but if so than then they them their he she his her i me my "
+    "we our you your".split()
+)
+
+
+class HashingEmbedder:
+    """
+    Local text embedder using the hashing trick: word unigrams, word bigrams and character trigrams
+    are hashed into a fixed number of signed buckets and L2-normalized. Needs no model or service,
+    and the same text always maps to the same vector across processes.
+
+    Any object with `dim` and `embed(text) -> {bucket: weight}` can be used instead.
+    """
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _features(self, text):
+        words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+        features = {}
+        for i, word in enumerate(words):
+            features[word] = features.get(word, 0) + 1.0
+            if i:
+                bigram = words[i - 1] + " " + word
+                features[bigram] = features.get(bigram, 0) + 0.5
+            padded = f"#{word}#"
+            for j in range(len(padded) - 2):
+                gram = "~" + padded[j:j + 3]
+                features[gram] = features.get(gram, 0) + 0.25
+        return features
+
+    def embed(self, text):
+        """Sparse unit vector {bucket: weight}."""
+        vector = {}
+        for feature, count in self._features(text).items():
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = h % self.dim
+            sign = 1.0 if (h >> 63) & 1 else -1.0
+            vector[bucket] = vector.get(bucket, 0.0) + sign * (1.0 + math.log(count) if count >= 1 else count)
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+class VectorIndex:
+    """
+    In-memory cosine-similarity index over (id, text) pairs, updated incrementally.
+
+    With NumPy, vectors are rows of a float32 matrix (grown by doubling, deletes swap in the last
+    row) and search is one matrix-vector product plus argpartition. Without NumPy, vectors stay
+    sparse dicts and search is a sparse dot product per entry.
+    """
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.texts = {}  # id -> indexed text
+        self._rows = {}  # id -> matrix row (NumPy mode)
+        self._ids = []  # row -> id (NumPy mode)
+        self._matrix = np.zeros((16, self.embedder.dim), dtype=np.float32) if np is not None else None
+        self._sparse = {}  # id -> sparse vector (fallback mode)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _dense(self, sparse):
+        row = np.zeros(self.embedder.dim, dtype=np.float32)
+        if sparse:
+            row[list(sparse.keys())] = list(sparse.values())
+        return row
+
+    def upsert(self, id_, text):
+        if self.texts.get(id_) == text:
+            return
+        self.texts[id_] = text
+        sparse = self.embedder.embed(text)
+        if np is None:
+            self._sparse[id_] = sparse
+            return
+        row = self._rows.get(id_)
+        if row is None:
+            row = len(self._ids)
+            if row == self._matrix.shape[0]:
+                grown = np.zeros((row * 2, self.embedder.dim), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self._rows[id_] = row
+            self._ids.append(id_)
+        self._matrix[row] = self._dense(sparse)
+
+    def remove(self, ids):
+        for id_ in ids:
+            if self.texts.pop(id_, None) is None:
+                continue
+            if np is None:
+                self._sparse.pop(id_, None)
+                continue
+            row = self._rows.pop(id_)
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._matrix[last] = 0
+            self._ids.pop()
+
+    def sync(self, items):
+        """Bring the index in line with {id: text}: embed only new or changed texts and drop missing ids."""
+        self.remove([id_ for id_ in self.texts if id_ not in items])
+        for id_, text in items.items():
+            self.upsert(id_, text)
+
+    def search(self, query, top_k=10, min_score=0.0):
+        """Return [(id, score)] of the top_k most similar entries, best first."""
+        sparse = self.embedder.embed(query)
+        if not sparse or not self.texts or top_k <= 0:
+            return []
+        if np is None:
+            scored = [(id_, sum(w * vec.get(k, 0.0) for k, w in sparse.items())) for id_, vec in self._sparse.items()]
+            scored.sort(key=lambda pair: pair[1], reverse=True)
+            return [(id_, score) for id_, score in scored[:top_k] if score > min_score]
+        n = len(self._ids)
+        scores = self._matrix[:n] @ self._dense(sparse)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[i], float(scores[i])) for i in top if scores[i] > min_score]
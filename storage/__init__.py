@@ -0,0 +1,14 @@
+"""Storage package exports.
+
+Convenient import path: `from storage import JsonStore`.
+"""
+
+from .json_store import JsonStore, FileLock, VersionConflict
+from .artifacts import ArtifactStore
+
+__all__ = [
+	"JsonStore",
+	"FileLock",
+	"VersionConflict",
+	"ArtifactStore",
+]
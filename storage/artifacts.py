@@ -0,0 +1,71 @@
+import os
+import re
+import uuid
+import tempfile
+
+_ARTIFACT_ID_RE = re.compile(r'^[A-Za-z0-9_.-]{1,120}$')
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class ArtifactStore:
+    """
+    Text artifacts in one folder (e.g. oversized tool outputs), addressed by id and read back in
+    character pages. Only the newest max_artifacts files are kept.
+    """
+
+    def __init__(self, root, max_artifacts=200):
+        self.root = root
+        self.max_artifacts = max_artifacts
+
+    def _path(self, artifact_id):
+        if not _ARTIFACT_ID_RE.match(artifact_id or "") or artifact_id.startswith('.'):
+            raise ValueError(f"Invalid artifact id: {artifact_id!r}")
+        return os.path.join(self.root, artifact_id + '.txt')
+
+    def put(self, text, prefix="artifact"):
+        """Save text atomically and return its new artifact id."""
+        os.makedirs(self.root, exist_ok=True)
+        artifact_id = f"{_UNSAFE_RE.sub('_', prefix)[:60]}-{uuid.uuid4().hex[:12]}"
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(artifact_id))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune()
+        return artifact_id
+
+    def read_text(self, artifact_id):
+        with open(self._path(artifact_id), 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def read(self, artifact_id, offset=0, max_chars=20000):
+        """Return {text, offset, next_offset, total_chars, eof} for the page starting at character offset."""
+        text = self.read_text(artifact_id)
+        offset = max(0, offset)
+        page = text[offset:offset + max_chars]
+        end = offset + len(page)
+        return {
+            "text": page,
+            "offset": offset,
+            "next_offset": end if end < len(text) else None,
+            "total_chars": len(text),
+            "eof": end >= len(text),
+        }
+
+    def _prune(self):
+        try:
+            entries = [e for e in os.scandir(self.root) if e.name.endswith('.txt')]
+        except OSError:
+            return
+        if len(entries) <= self.max_artifacts:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_artifacts]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
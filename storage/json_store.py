@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+class VersionConflict(Exception):
+    """The file was changed by another writer since the version the caller read."""
+
+
+def _file_version(path):
+    """(inode, mtime_ns, size) of path, or None if it does not exist. Every atomic replace creates a new inode."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class FileLock:
+    """
+    Exclusive lock on '<path>.lock', held across threads and processes.
+
+    Re-entrant within a thread. Threads of one process queue on a threading.RLock and only the
+    outermost holder takes the OS lock (fcntl.flock on POSIX, msvcrt.locking on Windows).
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.lock_path = os.path.abspath(path) + '.lock'
+        with FileLock._locks_guard:
+            # One in-process lock per file, shared by every FileLock for that path
+            self._rlock, self._state = FileLock._locks.setdefault(self.lock_path, (threading.RLock(), {"depth": 0, "fd": None}))
+
+    def _os_lock(self, fd):
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)  # retries for ~10s, then raises
+                    return
+                except OSError:
+                    continue
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _os_unlock(self, fd):
+        if os.name == 'nt':
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            return
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._state["depth"] == 0:
+            try:
+                os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._os_lock(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._rlock.release()
+                raise
+            self._state["fd"] = fd
+        self._state["depth"] += 1
+
+    def release(self):
+        self._state["depth"] -= 1
+        if self._state["depth"] == 0:
+            fd, self._state["fd"] = self._state["fd"], None
+            try:
+                self._os_unlock(fd)
+            finally:
+                os.close(fd)
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class JsonStore:
+    """
+    A JSON document on disk that several threads and processes can update safely.
+
+    - Writes go to a temp file in the same directory, are fsynced and then atomically renamed over
+      the target, so readers see either the old or the new document, never a truncated one.
+    - `version()` is a cheap stat-based token; `write(data, expected_version=...)` raises
+      VersionConflict instead of overwriting a document that changed since it was read.
+    - `locked()` holds a per-file lock for read-modify-write cycles. Each file has its own lock, so
+      writers to different stores never wait on each other.
+    """
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = default
+        self._lock = FileLock(path)
+
+    def version(self):
+        return _file_version(self.path)
+
+    def locked(self):
+        """Context manager holding this store's exclusive lock (re-entrant)."""
+        return self._lock
+
+    def read(self):
+        """Return (data, version). A missing file gives (default, None); invalid JSON raises ValueError."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                # fstat describes the file actually opened, even if it is replaced meanwhile
+                st = os.fstat(f.fileno())
+                data = json.load(f)
+        except FileNotFoundError:
+            return self.default, None
+        return data, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def write(self, data, expected_version=False):
+        """
+        Atomically replace the document with data and return the new version.
+        With expected_version (None meaning "file must not exist"), raise VersionConflict if the
+        document on disk is no longer at that version.
+        """
+        with self._lock:
+            if expected_version is not False and _file_version(self.path) != expected_version:
+                raise VersionConflict(f"{self.path} was modified by another writer")
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                _replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            _fsync_dir(directory)
+            return _file_version(self.path)
+
+
+def _replace(src, dst):
+    # On Windows the rename fails while a reader has dst open; readers hold it only briefly
+    for attempt in range(50):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if os.name != 'nt' or attempt == 49:
+                raise
+            time.sleep(0.01)
+
+
+def _fsync_dir(directory):
+    # Persist the rename itself (POSIX only; directories cannot be opened on Windows)
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
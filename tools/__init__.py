@@ -1,8 +1,10 @@
 from .memory_tools import (
     GetUserMemoriesTool,
+    SearchUserMemoriesTool,
     CreateUserMemoryTool,
     UpdateUserMemoryTool,
     DeleteUserMemoryTool,
+    ConsolidateUserMemoriesTool,
 )
 
 from .todo_tools import (
@@ -18,16 +20,21 @@ from .history_tools import (
     GetChatHistoryEntryTool,
     DeleteChatHistoryEntriesTool,
     GetChatHistoryStatsTool,
+    ReadToolOutputArtifactTool,
 )
 
 from .filesystem_tools import (
     ReadFolderContentTool,
+    ReadFolderTreeTool,
     ReadFileContentTool,
+    ReadFilesTool,
     WriteFileContentTool,
     CreateFolderTool,
     RemovePathsTool,
     InsertTextInFileTool,
     ReplaceTextInFileTool,
+    ApplyEditsTool,
+    ApplyPatchTool,
     SearchInFileTool,
     CopyPathsTool,
     RenamePathTool,
@@ -35,40 +42,63 @@ from .filesystem_tools import (
     PathStatTool,
 )
 
-from .document_tools import CreateWordDocumentTool
-from .devops_tools import RunTerminalCommandsTool
-from .visualization_tools import MultiXYPlotTool
+from .document_tools import CreateWordDocumentTool, BuildWordDocumentTool
+from .devops_tools import (
+    RunTerminalCommandsTool,
+    StartJobTool,
+    PollJobTool,
+    ReadJobOutputTool,
+    CancelJobTool,
+    RunInShellSessionTool,
+    CloseShellSessionTool,
+)
+from .visualization_tools import MultiXYPlotTool, PlotDataFilesTool
 from .web_and_media_tools import WebSearchTool, ImageGenerationTool
 
 __all__ = [
     'GetUserMemoriesTool',
+    'SearchUserMemoriesTool',
     'CreateUserMemoryTool',
     'UpdateUserMemoryTool',
     'DeleteUserMemoryTool',
+    'ConsolidateUserMemoriesTool',
     'GetChatHistoryMetadataTool',
     'GetChatHistoryEntryTool',
     'DeleteChatHistoryEntriesTool',
     'GetChatHistoryStatsTool',
+    'ReadToolOutputArtifactTool',
     'ReadFolderContentTool',
+    'ReadFolderTreeTool',
     'ReadFileContentTool',
+    'ReadFilesTool',
     'WriteFileContentTool',
     'CreateFolderTool',
     'RemovePathsTool',
     'InsertTextInFileTool',
     'ReplaceTextInFileTool',
+    'ApplyEditsTool',
+    'ApplyPatchTool',
     'SearchInFileTool',
     'CopyPathsTool',
     'RenamePathTool',
     'MovePathsTool',
     'PathStatTool',
     'CreateWordDocumentTool',
+    'BuildWordDocumentTool',
     'GetTodosTool',
     'CreateTodoTool',
     'UpdateTodoTool',
     'DeleteTodoTool',
     'ClearTodosTool',
     'RunTerminalCommandsTool',
+    'StartJobTool',
+    'PollJobTool',
+    'ReadJobOutputTool',
+    'CancelJobTool',
+    'RunInShellSessionTool',
+    'CloseShellSessionTool',
     'MultiXYPlotTool',
+    'PlotDataFilesTool',
     'WebSearchTool',
     'ImageGenerationTool',
 ]
@@ -1,30 +1,217 @@
 import os
+import re
+import sys
+import time
 import uuid
+import queue
+import atexit
+import codecs
+import locale
+import signal
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+from .filesystem_tools import _drain
+
+
+# -----------------
+# Process helpers
+# -----------------
+
+class _OutputBuffer:
+    """
+    Byte-capped output capture that keeps the head and the tail of a stream.
+    The first half of max_bytes is kept verbatim; after that only the most recent bytes are retained
+    in a ring buffer, so a chatty process cannot grow memory without bound.
+    """
+
+    def __init__(self, max_bytes=64 * 1024):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total_bytes = 0
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail.append(data)
+        self.tail_size += len(data)
+        while self.tail_size - len(self.tail[0]) >= self.tail_limit:
+            self.tail_size -= len(self.tail.popleft())
+
+    @property
+    def truncated(self):
+        return self.total_bytes > len(self.head) + self.tail_limit
+
+    def text(self, encoding):
+        tail = b''.join(self.tail)
+        if len(tail) > self.tail_limit:
+            tail = tail[-self.tail_limit:]
+        omitted = self.total_bytes - len(self.head) - len(tail)
+        head_text = bytes(self.head).decode(encoding, errors='replace')
+        tail_text = tail.decode(encoding, errors='replace')
+        if omitted > 0:
+            return f"{head_text}\n... [{omitted} bytes omitted] ...\n{tail_text}"
+        return head_text + tail_text
+
+
+def _popen_kwargs():
+    """Platform options so the whole process tree can be killed later."""
+    if sys.platform == 'win32':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_process_tree(proc):
+    """Kill a shell process and everything it started."""
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except Exception:
+        proc.kill()
+
+
+# Seconds to wait for EOF after the shell exited; a background process it started may keep the pipes open
+_EOF_GRACE_SECONDS = 1.0
+
+
+def _pump(pipe, name, out_queue):
+    """Reader thread: forward raw chunks from a pipe, then None on EOF."""
+    try:
+        for chunk in iter(lambda: pipe.read1(8192) if hasattr(pipe, 'read1') else pipe.read(8192), b''):
+            out_queue.put((name, chunk))
+    finally:
+        out_queue.put((name, None))
+
+
+def run_command_streaming(command, cwd, timeout=None, max_output_bytes=64 * 1024, flush_interval=0.2):
+    """
+    Run a shell command, yielding {"stream", "text"} chunks as output arrives.
+
+    stdout/stderr are captured into byte-capped head+tail buffers. The process tree is killed if the
+    shell runs longer than `timeout` seconds, or if the generator is closed early. Once the shell has
+    exited, output is read for a short grace period only, so a background process that inherited the
+    pipes neither delays the result nor counts as a timeout. Returns a result dict with
+    output, error, returncode, timed_out, duration_seconds and output sizes.
+    """
+    encoding = locale.getpreferredencoding(False) or 'utf-8'
+    start = time.monotonic()
+    deadline = start + timeout if timeout else None
+    proc = subprocess.Popen(
+        command, shell=True, cwd=cwd,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        **_popen_kwargs(),
+    )
+    buffers = {"stdout": _OutputBuffer(max_output_bytes), "stderr": _OutputBuffer(max_output_bytes)}
+    decoders = {name: codecs.getincrementaldecoder(encoding)(errors='replace') for name in buffers}
+    pending = {name: [] for name in buffers}
+    chunks = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(proc.stdout, "stdout", chunks), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, "stderr", chunks), daemon=True),
+    ]
+    for t in readers:
+        t.start()
+
+    open_streams = 2
+    timed_out = False
+    exited_at = None
+    last_flush = start
+    try:
+        while open_streams:
+            try:
+                name, data = chunks.get(timeout=0.1)
+                if data is None:
+                    open_streams -= 1
+                else:
+                    buffers[name].write(data)
+                    pending[name].append(data)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if exited_at is None and proc.poll() is not None:
+                exited_at = now
+            detached = exited_at is not None and now - exited_at > _EOF_GRACE_SECONDS
+            # Coalesce small chunks so the event stream is not flooded
+            if now - last_flush >= flush_interval or not open_streams or detached:
+                last_flush = now
+                for name, parts in pending.items():
+                    if parts:
+                        text = decoders[name].decode(b''.join(parts))
+                        parts.clear()
+                        if text:
+                            yield {"stream": name, "text": text}
+            if detached:
+                # A background grandchild still holds the pipes open; stop waiting for EOF
+                break
+            if deadline and now > deadline and exited_at is None and not timed_out:
+                timed_out = True
+                _kill_process_tree(proc)
+        returncode = proc.wait()
+    finally:
+        _kill_process_tree(proc)
+        if not open_streams:
+            for t in readers:
+                t.join(timeout=1)
+
+    return {
+        "output": buffers["stdout"].text(encoding),
+        "error": buffers["stderr"].text(encoding),
+        "returncode": returncode,
+        "timed_out": timed_out,
+        "duration_seconds": round(time.monotonic() - start, 3),
+        "output_bytes": buffers["stdout"].total_bytes,
+        "error_bytes": buffers["stderr"].total_bytes,
+        "output_truncated": buffers["stdout"].truncated or buffers["stderr"].truncated,
+    }
+
 
 class RunTerminalCommandsTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "run_terminal_commands",
         "description": (
             "Run one or more terminal commands in the Windows environment, starting from the project root directory. "
             "Provide a list of commands to execute. The tool will concatenate them using '&&' and run them as a single command. "
+            "The run is killed after timeout_seconds. Very long output keeps only its beginning and end. "
         ),
         "strict": True,
         "parameters": {
             "type": "object",
             "properties": {
-                "commands": {"type": "array", "items": {"type": "string"}, "description": "A list of terminal commands to run from the project root directory."}
+                "commands": {"type": "array", "items": {"type": "string"}, "description": "A list of terminal commands to run from the project root directory."},
+                "timeout_seconds": {"type": "integer", "minimum": 1, "default": 300, "description": "Kill the commands if they run longer than this many seconds."}
             },
-            "required": ["commands"],
+            "required": ["commands", "timeout_seconds"],
             "additionalProperties": False,
         },
     }
 
-    def __init__(self, root_path, permission_required=True):
+    def __init__(self, root_path, permission_required=True, default_timeout=300, max_output_bytes=64 * 1024):
         self.root_path = root_path
         self.permission_required = permission_required
+        self.default_timeout = default_timeout
+        self.max_output_bytes = max_output_bytes
+
+    def run(self, commands, timeout_seconds=None):
+        return _drain(self.run_streaming(commands, timeout_seconds))
 
-    def run(self, commands):
+    def run_streaming(self, commands, timeout_seconds=None):
+        """Generator form of run(): yields output chunks as they are produced and returns the result."""
         if not isinstance(commands, list) or not commands:
             print("No commands provided.")
             return {"status": "error", "message": "No commands provided."}
@@ -35,19 +222,670 @@ class RunTerminalCommandsTool:
                 print("Command execution cancelled by user.")
                 return {"status": "error", "message": "Command execution cancelled by user."}
         try:
-            import subprocess
             print(f"Executing: {command_str}")
-            result = subprocess.run(command_str, shell=True, cwd=self.root_path, capture_output=True, text=True)
-            print(f"Return code: {result.returncode}")
-            print(f"Output:\n{result.stdout}")
-            if result.stderr:
-                print(f"Error:\n{result.stderr}")
+            result = yield from run_command_streaming(
+                command_str, self.root_path,
+                timeout=timeout_seconds or self.default_timeout,
+                max_output_bytes=self.max_output_bytes,
+            )
+            print(f"Return code: {result['returncode']}")
+            if result["timed_out"]:
+                print(f"Timed out after {result['duration_seconds']}s")
+            status = "success" if result["returncode"] == 0 and not result["timed_out"] else "error"
+            return {"status": status, **result}
+        except Exception as e:
+            print(f"Exception: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+
+# -----------------
+# Background jobs
+# -----------------
+
+JOBS_DIR = os.path.join(tempfile.gettempdir(), "ai_agent_jobs")
+
+
+class JobManager:
+    """
+    Runs shell commands in the background with their output spooled to a log file.
+
+    stdout and stderr go straight to disk, so a job costs no memory however much it prints;
+    callers read the log incrementally by byte offset. At most max_concurrent_jobs run at once.
+    A job leaves "running" exactly once (to exited, timed_out or cancelled), under the manager's lock.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, jobs_dir=JOBS_DIR, max_concurrent_jobs=4, max_finished_jobs=50):
+        self.jobs_dir = jobs_dir
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        atexit.register(self.cancel_all)
+
+    @classmethod
+    def shared(cls, jobs_dir=JOBS_DIR):
+        """One manager per jobs folder, shared by all job tools in the process."""
+        with cls._instances_lock:
+            if jobs_dir not in cls._instances:
+                cls._instances[jobs_dir] = cls(jobs_dir)
+            return cls._instances[jobs_dir]
+
+    def _running_count(self):
+        return sum(1 for job in self.jobs.values() if job["status"] == "running")
+
+    def _prune(self):
+        """Forget the oldest finished jobs (and their logs) beyond max_finished_jobs."""
+        finished = sorted((j for j in self.jobs.values() if j["status"] != "running"), key=lambda j: j["started_at"])
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            self.jobs.pop(job["id"], None)
+            try:
+                os.remove(job["log_path"])
+            except OSError:
+                pass
+
+    def start(self, command, cwd, timeout=None):
+        with self._lock:
+            if self._running_count() >= self.max_concurrent_jobs:
+                return {"status": "error", "message": f"Too many running jobs (max {self.max_concurrent_jobs}). Wait for one to finish or cancel one."}
+            self._prune()
+            job_id = uuid.uuid4().hex[:8]
+            log_path = os.path.join(self.jobs_dir, f"{job_id}.log")
+            log_file = open(log_path, 'wb')
+            try:
+                proc = subprocess.Popen(
+                    command, shell=True, cwd=cwd,
+                    stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+                    **_popen_kwargs(),
+                )
+            except Exception as e:
+                log_file.close()
+                return {"status": "error", "message": str(e)}
+            finally:
+                # The child holds its own handle; ours is no longer needed
+                if not log_file.closed:
+                    log_file.close()
+            job = {
+                "id": job_id,
+                "command": command,
+                "status": "running",
+                "returncode": None,
+                "started_at": time.time(),
+                "ended_at": None,
+                "timeout": timeout,
+                "log_path": log_path,
+                "proc": proc,
+            }
+            self.jobs[job_id] = job
+        threading.Thread(target=self._watch, args=(job,), daemon=True).start()
+        return {"status": "success", **self.describe(job)}
+
+    def _transition(self, job, status):
+        """Move a running job to status; False if it already left "running". Call with the lock held."""
+        if job["status"] != "running":
+            return False
+        job["status"] = status
+        return True
+
+    def _record_end(self, job, returncode):
+        with self._lock:
+            if job["ended_at"] is None:
+                job["returncode"] = returncode
+                job["ended_at"] = time.time()
+
+    def _watch(self, job):
+        proc = job["proc"]
+        try:
+            proc.wait(timeout=job["timeout"])
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                timed_out = self._transition(job, "timed_out")
+            if timed_out:
+                _kill_process_tree(proc)
+            proc.wait()
+        with self._lock:
+            self._transition(job, "exited")
+        self._record_end(job, proc.returncode)
+
+    def describe(self, job):
+        end = job["ended_at"] or time.time()
+        try:
+            log_size = os.path.getsize(job["log_path"])
+        except OSError:
+            log_size = 0
+        return {
+            "job_id": job["id"],
+            "command": job["command"],
+            "state": job["status"],
+            "returncode": job["returncode"],
+            "duration_seconds": round(end - job["started_at"], 3),
+            "output_bytes": log_size,
+        }
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return [self.describe(job) for job in sorted(self.jobs.values(), key=lambda j: j["started_at"])]
+
+    def read_output(self, job_id, offset=0, max_bytes=16 * 1024):
+        """
+        Read a slice of a job's log. A negative offset reads the last |offset| bytes.
+        Returns text plus next_offset so callers can resume where they stopped.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {"status": "error", "message": f"Unknown job id '{job_id}'."}
+        size = os.path.getsize(job["log_path"]) if os.path.exists(job["log_path"]) else 0
+        start = max(0, size + offset) if offset < 0 else min(offset, size)
+        with open(job["log_path"], 'rb') as f:
+            f.seek(start)
+            data = f.read(max(1, max_bytes))
+        encoding = locale.getpreferredencoding(False) or 'utf-8'
+        next_offset = start + len(data)
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "state": job["status"],
+            "offset": start,
+            "next_offset": next_offset,
+            "output_bytes": size,
+            "eof": next_offset >= size and job["status"] != "running",
+            "text": data.decode(encoding, errors='replace'),
+        }
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {"status": "error", "message": f"Unknown job id '{job_id}'."}
+        with self._lock:
+            cancelled = self._transition(job, "cancelled")
+        if not cancelled:
+            return {"status": "success", "message": "Job already finished.", **self.describe(job)}
+        _kill_process_tree(job["proc"])
+        self._record_end(job, job["proc"].wait())
+        return {"status": "success", "message": "Job cancelled.", **self.describe(job)}
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+
+class StartJobTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "start_job",
+        "description": (
+            "Start terminal commands as a background job from the project root and return a job id immediately. "
+            "Use for long-running builds, test suites or servers instead of run_terminal_commands, then keep working "
+            "and check in with poll_job / read_job_output. Commands are joined with '&&'. stdout and stderr are combined into one log."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "commands": {"type": "array", "items": {"type": "string"}, "description": "A list of terminal commands to run from the project root directory."},
+                "timeout_seconds": {"type": "integer", "minimum": 1, "default": 3600, "description": "Kill the job if it runs longer than this many seconds."}
+            },
+            "required": ["commands", "timeout_seconds"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, permission_required=True, job_manager=None):
+        self.root_path = root_path
+        self.permission_required = permission_required
+        self.job_manager = job_manager or JobManager.shared()
+
+    def run(self, commands, timeout_seconds=3600):
+        if not isinstance(commands, list) or not commands:
+            return {"status": "error", "message": "No commands provided."}
+        command_str = " && ".join(commands)
+        if self.permission_required:
+            permission = input(f"Start the following command(s) as a background job?\n{command_str}\nProceed? (y/n): ")
+            if permission.lower() != 'y':
+                return {"status": "error", "message": "Job start cancelled by user."}
+        return self.job_manager.start(command_str, self.root_path, timeout=timeout_seconds)
+
+
+class PollJobTool:
+    # A running job keeps changing files after start_job; polling marks where cached reads go stale
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "poll_job",
+        "description": (
+            "Check the state of a background job (running/exited/timed_out/cancelled), its return code, duration and output size. "
+            "Pass an empty job_id to list all known jobs."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "string", "description": "Job id from start_job, or empty string for all jobs."}
+            },
+            "required": ["job_id"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, job_manager=None):
+        self.job_manager = job_manager or JobManager.shared()
+
+    def run(self, job_id=""):
+        if not job_id:
+            return {"status": "success", "jobs": self.job_manager.list()}
+        job = self.job_manager.get(job_id)
+        if job is None:
+            return {"status": "error", "message": f"Unknown job id '{job_id}'."}
+        return {"status": "success", **self.job_manager.describe(job)}
+
+
+class ReadJobOutputTool:
+    schema = {
+        "type": "function",
+        "name": "read_job_output",
+        "description": (
+            "Read a background job's combined output incrementally. Start with offset 0 (or a negative offset to read the last N bytes), "
+            "then pass the returned next_offset to get only new output. eof=true means the job finished and everything was read."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "string", "description": "Job id from start_job."},
+                "offset": {"type": "integer", "default": 0, "description": "Byte offset to read from; negative reads from the end."},
+                "max_bytes": {"type": "integer", "minimum": 1, "default": 16384, "description": "Maximum bytes to return."}
+            },
+            "required": ["job_id", "offset", "max_bytes"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, job_manager=None):
+        self.job_manager = job_manager or JobManager.shared()
+
+    def run(self, job_id, offset=0, max_bytes=16384):
+        return self.job_manager.read_output(job_id, offset, max_bytes)
+
+
+class CancelJobTool:
+    schema = {
+        "type": "function",
+        "name": "cancel_job",
+        "description": "Stop a running background job and everything it started.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "string", "description": "Job id from start_job."}
+            },
+            "required": ["job_id"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, job_manager=None):
+        self.job_manager = job_manager or JobManager.shared()
+
+    def run(self, job_id):
+        return self.job_manager.cancel(job_id)
+
+
+# -----------------
+# Persistent shell sessions
+# -----------------
+
+class ShellSession:
+    """
+    A long-lived shell process that runs commands one at a time.
+
+    On POSIX the shell is attached to a pseudo-terminal (so tools behave as in a real terminal and
+    Ctrl-C can interrupt a hung command); on Windows it is cmd.exe over pipes. Each command is followed
+    by a unique sentinel line carrying the exit code, which marks where its output ends. cd, exported
+    variables and activated virtualenvs persist between commands.
+    """
+
+    def __init__(self, cwd, max_output_bytes=64 * 1024):
+        self.id = uuid.uuid4().hex[:8]
+        self.cwd = cwd
+        self.max_output_bytes = max_output_bytes
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.commands_run = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._eof = False
+        self._master_fd = None
+        env = dict(os.environ, PS1="", PS2="", PROMPT_COMMAND="", TERM="dumb")
+        if sys.platform == 'win32':
+            self.encoding = locale.getpreferredencoding(False) or 'utf-8'
+            self.proc = subprocess.Popen(
+                ["cmd.exe", "/Q", "/K", "prompt $S"], cwd=cwd, env=env,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+            )
+            self._read = lambda: self.proc.stdout.read1(8192)
+            self._write = lambda data: (self.proc.stdin.write(data), self.proc.stdin.flush())
+        else:
+            import fcntl
+            import pty
+            import termios
+            self.encoding = 'utf-8'
+            master_fd, slave_fd = pty.openpty()
+            # No echo: only command output should come back
+            attrs = termios.tcgetattr(slave_fd)
+            attrs[3] &= ~termios.ECHO
+            termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+            shell = "/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh"
+            argv = [shell, "--noprofile", "--norc", "--noediting", "-i"] if shell.endswith("bash") else [shell, "-i"]
+
+            def make_controlling_tty():
+                # New session with the pty as its controlling terminal, so Ctrl-C reaches the foreground job
+                os.setsid()
+                fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+            self.proc = subprocess.Popen(
+                argv, cwd=cwd, env=env,
+                stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+                preexec_fn=make_controlling_tty,
+            )
+            os.close(slave_fd)
+            self._master_fd = master_fd
+            self._read = lambda: os.read(master_fd, 8192)
+            self._write = lambda data: os.write(master_fd, data)
+        threading.Thread(target=self._reader, daemon=True).start()
+        # Settle the shell and discard any startup banner
+        _drain(self.execute("cd .", timeout=10))
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None and not self._eof
+
+    @property
+    def busy(self):
+        """True while a command is running."""
+        return self._lock.locked()
+
+    def _reader(self):
+        while True:
+            try:
+                data = self._read()
+            except (OSError, ValueError):
+                data = b''
+            with self._cond:
+                if not data:
+                    self._eof = True
+                    self._cond.notify_all()
+                    return
+                self._buffer += data
+                self._cond.notify_all()
+
+    def _take(self, wait):
+        with self._cond:
+            if not self._buffer and not self._eof:
+                self._cond.wait(timeout=wait)
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+
+    def _sentinel_command(self, token):
+        if sys.platform == 'win32':
+            return f"echo.\r\necho __AGENT_DONE_{token}__%ERRORLEVEL%\r\n"
+        return f"printf '\\n__AGENT_DONE_{token}__%s\\n' \"$?\"\n"
+
+    def execute(self, command, timeout=None):
+        """
+        Run one command in the session, yielding {"stream", "text"} chunks as output arrives.
+        Returns a dict with exit_code, output, timed_out, duration_seconds and output size.
+        On timeout the command is interrupted (Ctrl-C); if the shell does not recover it is killed.
+        """
+        with self._lock:
+            if not self.alive:
+                raise RuntimeError("Shell session has exited.")
+            self.last_used = time.time()
+            token = uuid.uuid4().hex
+            marker = re.compile(rb"\r?\n__AGENT_DONE_" + token.encode() + rb"__(-?\d+)\r?\n")
+            newline = "\r\n" if sys.platform == 'win32' else "\n"
+            start = time.monotonic()
+            deadline = start + timeout if timeout else None
+            output = _OutputBuffer(self.max_output_bytes)
+            decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            self._take(0)  # drop anything printed between commands
+            self._write((command.rstrip() + newline + self._sentinel_command(token)).encode(self.encoding))
+
+            pending = b''
+            exit_code = None
+            timed_out = False
+            prefix = b"__AGENT_DONE_" + token.encode() + b"__"
+            while True:
+                pending += self._take(0.1)
+                match = marker.search(pending)
+                if match:
+                    exit_code = int(match.group(1))
+                    chunk, pending = pending[:match.start()], b''
+                elif self._eof:
+                    chunk, pending = pending, b''
+                else:
+                    cut = len(pending)
+                    # Hold back a trailing line that could be the start of the sentinel
+                    newline_at = pending.rfind(b"\n")
+                    tail = pending[newline_at + 1:]
+                    if newline_at != -1 and (prefix.startswith(tail) or tail.startswith(prefix)):
+                        cut = newline_at - 1 if pending[newline_at - 1:newline_at] == b"\r" else newline_at
+                    chunk, pending = pending[:cut], pending[cut:]
+                if chunk:
+                    output.write(chunk)
+                    text = decoder.decode(chunk).replace('\r\n', '\n')
+                    if text:
+                        yield {"stream": "stdout", "text": text}
+                if match or self._eof:
+                    break
+                if deadline and time.monotonic() > deadline:
+                    if not timed_out and self._master_fd is not None:
+                        # Ctrl-C on the terminal interrupts the foreground command, keeping the shell.
+                        # It also flushes pending terminal input, so the sentinel has to be sent again.
+                        timed_out = True
+                        self._write(b"\x03")
+                        time.sleep(0.1)
+                        self._write(self._sentinel_command(token).encode(self.encoding))
+                        deadline = time.monotonic() + 3
+                    else:
+                        timed_out = True
+                        self.close()
+                        break
+
+            self.last_used = time.time()
+            self.commands_run += 1
             return {
-                "status": "success" if result.returncode == 0 else "error",
-                "output": result.stdout,
-                "error": result.stderr,
-                "returncode": result.returncode,
+                "session_id": self.id,
+                "exit_code": exit_code,
+                "output": output.text(self.encoding).replace('\r\n', '\n'),
+                "timed_out": timed_out,
+                "session_alive": self.alive,
+                "duration_seconds": round(time.monotonic() - start, 3),
+                "output_bytes": output.total_bytes,
+                "output_truncated": output.truncated,
             }
+
+    def close(self):
+        _kill_process_tree(self.proc)
+        try:
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+        if self._master_fd is not None:
+            try:
+                os.close(self._master_fd)
+            except OSError:
+                pass
+            self._master_fd = None
+
+
+class ShellSessionPool:
+    """
+    Keeps a bounded set of ShellSessions addressable by id; idle sessions are closed automatically.
+    A session that is running a command is never reaped or evicted. New shells start outside the
+    pool lock, so opening one does not stall the other sessions.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, max_sessions=4, idle_timeout=30 * 60):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self._starting = 0  # sessions being created outside the lock; they count against max_sessions
+        self._lock = threading.Lock()
+        atexit.register(self.close_all)
+
+    @classmethod
+    def shared(cls):
+        with cls._instances_lock:
+            if "default" not in cls._instances:
+                cls._instances["default"] = cls()
+            return cls._instances["default"]
+
+    def _reap(self):
+        """Remove dead and idle sessions from the pool (call with the lock held); returns them for closing."""
+        now = time.time()
+        stale = [s for s in self.sessions.values() if not s.busy and (not s.alive or now - s.last_used > self.idle_timeout)]
+        for session in stale:
+            self.sessions.pop(session.id, None)
+        return stale
+
+    def get_or_create(self, session_id, cwd):
+        """Return (session, created). An empty session_id starts a new session."""
+        with self._lock:
+            stale = self._reap()
+            session = self.sessions.get(session_id) if session_id else None
+            if session is not None:
+                # Keep it from being evicted before its command starts
+                session.last_used = time.time()
+            full = False
+            if not session_id:
+                if len(self.sessions) + self._starting >= self.max_sessions:
+                    # Make room by closing the least recently used session that is not running a command
+                    idle = [s for s in self.sessions.values() if not s.busy]
+                    if idle:
+                        stale.append(self.sessions.pop(min(idle, key=lambda s: s.last_used).id))
+                full = len(self.sessions) + self._starting >= self.max_sessions
+                if not full:
+                    self._starting += 1
+        for old in stale:
+            old.close()
+        if session_id:
+            if session is None:
+                raise ValueError(f"Unknown or expired shell session '{session_id}'.")
+            return session, False
+        if full:
+            raise RuntimeError(f"All {self.max_sessions} shell sessions are running commands; reuse one when it finishes or close one.")
+        try:
+            session = ShellSession(cwd)
+        except Exception:
+            with self._lock:
+                self._starting -= 1
+            raise
+        with self._lock:
+            self._starting -= 1
+            self.sessions[session.id] = session
+        return session, True
+
+    def close(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class RunInShellSessionTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "run_in_shell_session",
+        "description": (
+            "Run commands in a persistent shell session that keeps its state (current directory, environment variables, "
+            "activated virtualenvs) between calls and skips shell startup cost. "
+            "Pass an empty session_id to open a new session in the project root; reuse the returned session_id for follow-up commands. "
+            "Commands are joined with '&&'. On timeout the running command is interrupted; the session survives if it can. "
+            "Use start_job instead for commands that run for many minutes."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "session_id": {"type": "string", "description": "Existing session id, or empty string to open a new session."},
+                "commands": {"type": "array", "items": {"type": "string"}, "description": "Commands to run in the session."},
+                "timeout_seconds": {"type": "integer", "minimum": 1, "default": 300, "description": "Interrupt the commands if they run longer than this many seconds."}
+            },
+            "required": ["session_id", "commands", "timeout_seconds"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, permission_required=True, session_pool=None):
+        self.root_path = root_path
+        self.permission_required = permission_required
+        self.session_pool = session_pool or ShellSessionPool.shared()
+
+    def run(self, session_id, commands, timeout_seconds=300):
+        return _drain(self.run_streaming(session_id, commands, timeout_seconds))
+
+    def run_streaming(self, session_id, commands, timeout_seconds=300):
+        """Generator form of run(): yields output chunks as they are produced and returns the result."""
+        if not isinstance(commands, list) or not commands:
+            return {"status": "error", "message": "No commands provided."}
+        command_str = " && ".join(commands)
+        if self.permission_required:
+            permission = input(f"Run the following command(s) in shell session '{session_id or 'new'}'?\n{command_str}\nProceed? (y/n): ")
+            if permission.lower() != 'y':
+                return {"status": "error", "message": "Command execution cancelled by user."}
+        try:
+            session, created = self.session_pool.get_or_create(session_id, self.root_path)
+            result = yield from session.execute(command_str, timeout=timeout_seconds)
         except Exception as e:
-            print(f"Exception: {str(e)}")
             return {"status": "error", "message": str(e)}
+        if not result["session_alive"]:
+            self.session_pool.close(session.id)
+        status = "success" if result["exit_code"] == 0 and not result["timed_out"] else "error"
+        return {"status": status, "session_created": created, **result}
+
+
+class CloseShellSessionTool:
+    schema = {
+        "type": "function",
+        "name": "close_shell_session",
+        "description": "Close a persistent shell session opened by run_in_shell_session and stop everything running in it.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "session_id": {"type": "string", "description": "Session id to close."}
+            },
+            "required": ["session_id"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, session_pool=None):
+        self.session_pool = session_pool or ShellSessionPool.shared()
+
+    def run(self, session_id):
+        if self.session_pool.close(session_id):
+            return {"status": "success", "message": f"Shell session '{session_id}' closed."}
+        return {"status": "error", "message": f"Unknown shell session '{session_id}'."}
@@ -1,6 +1,200 @@
+import io
 import os
+import csv
+import uuid
+from collections import OrderedDict
+
+from .worker_pool import WorkerPool
+
+
+# -----------------
+# Document engine (runs in worker processes)
+# -----------------
+
+# Parsed templates are mutable, so the cache keeps each template's bytes keyed by (path, mtime, size)
+# and every document is opened from an in-memory copy; an edited template gets a new key.
+_TEMPLATE_CACHE = OrderedDict()
+_TEMPLATE_CACHE_SIZE = 8
+
+
+def _open_document(template_path):
+    from docx import Document
+    if not template_path:
+        return Document()
+    st = os.stat(template_path)
+    key = (template_path, st.st_mtime_ns, st.st_size)
+    data = _TEMPLATE_CACHE.get(key)
+    if data is None:
+        with open(template_path, 'rb') as f:
+            data = f.read()
+        for stale in [k for k in _TEMPLATE_CACHE if k[0] == template_path]:
+            del _TEMPLATE_CACHE[stale]
+        _TEMPLATE_CACHE[key] = data
+        while len(_TEMPLATE_CACHE) > _TEMPLATE_CACHE_SIZE:
+            _TEMPLATE_CACHE.popitem(last=False)
+    else:
+        _TEMPLATE_CACHE.move_to_end(key)
+    return Document(io.BytesIO(data))
+
+
+class _DocumentWriter:
+    """
+    Appends blocks to a python-docx Document in linear time.
+
+    python-docx's Document.add_* rescans the whole body to find the section properties on every call,
+    and looks each style up by name (rescanning every style for the default) on every paragraph. Here
+    content is inserted before a trailing anchor paragraph, and style names are resolved to ids once.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self._anchor = document.add_paragraph()
+        self._styles = {}
+        self._style_ids = {}
+        self.stats = {"paragraphs": 0, "headings": 0, "tables": 0, "table_rows": 0, "images": 0}
+
+    def style(self, name):
+        if name not in self._styles:
+            try:
+                self._styles[name] = self.document.styles[name]
+            except KeyError:
+                # Templates may not define every built-in style; fall back to the default style
+                self._styles[name] = None
+        return self._styles[name]
+
+    def _style_id(self, name):
+        if name not in self._style_ids:
+            from docx.enum.style import WD_STYLE_TYPE
+            style = self.style(name)
+            self._style_ids[name] = self.document.part.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH) if style is not None else None
+        return self._style_ids[name]
+
+    def _new_paragraph(self, text=""):
+        return self._anchor.insert_paragraph_before(text)
+
+    def paragraph(self, text, style_name=None):
+        paragraph = self._new_paragraph(text)
+        style_id = self._style_id(style_name) if style_name else None
+        if style_id:
+            paragraph._p.style = style_id
+        self.stats["paragraphs"] += 1
+
+    def heading(self, text, level):
+        level = min(max(int(level), 0), 9)
+        paragraph = self._new_paragraph(text)
+        style_id = self._style_id("Title" if level == 0 else f"Heading {level}")
+        if style_id:
+            paragraph._p.style = style_id
+        self.stats["headings"] += 1
+
+    def table(self, rows):
+        """rows is any iterable of string lists; the first row is the header. Rows are consumed lazily."""
+        rows = iter(rows)
+        header = next(rows, None)
+        if not header:
+            return
+        cols = len(header)
+        table = self.document.add_table(rows=1, cols=cols)
+        self._anchor._p.addprevious(table._tbl)
+        grid = self.style("Table Grid")
+        if grid is not None:
+            table.style = grid
+        for cell, value in zip(table.rows[0].cells, header):
+            cell.text = ""
+            cell.paragraphs[0].add_run(str(value)).bold = True
+        for row in rows:
+            # add_row().cells touches only the new row; table.cell(r, c) would rescan the whole table each time
+            for cell, value in zip(table.add_row().cells, list(row)[:cols]):
+                cell.text = str(value)
+            self.stats["table_rows"] += 1
+        self.stats["tables"] += 1
+
+    def image(self, path, width_inches=0):
+        from docx.shared import Inches
+        self._new_paragraph().add_run().add_picture(path, width=Inches(width_inches) if width_inches else None)
+        self.stats["images"] += 1
+
+    def page_break(self):
+        from docx.enum.text import WD_BREAK
+        self._new_paragraph().add_run().add_break(WD_BREAK.PAGE)
+
+    def finish(self):
+        self._anchor._p.getparent().remove(self._anchor._p)
+        return self.document
+
+    def append_file(self, path):
+        """
+        Stream a text file into the document without loading it whole. CSV/TSV become a table;
+        other text is split into paragraphs on blank lines, with '#' headings and '-'/'*' bullets.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            if ext in ('.csv', '.tsv'):
+                self.table(csv.reader(f, delimiter='\t' if ext == '.tsv' else ','))
+                return
+            pending = []
+            for line in f:
+                line = line.rstrip('\r\n')
+                stripped = line.strip()
+                if not stripped or stripped.startswith('#') or stripped[:2] in ('- ', '* '):
+                    if pending:
+                        self.paragraph(" ".join(pending))
+                        pending = []
+                    if stripped.startswith('#'):
+                        level = len(stripped) - len(stripped.lstrip('#'))
+                        self.heading(stripped[level:].strip(), min(level, 9))
+                    elif stripped:
+                        self.paragraph(stripped[2:], "List Bullet")
+                else:
+                    pending.append(stripped)
+            if pending:
+                self.paragraph(" ".join(pending))
+
+
+def _build_word_document(blocks, output_path, template_path=""):
+    """Build a .docx from blocks (paths already resolved) and save it atomically. Returns content stats."""
+    writer = _DocumentWriter(_open_document(template_path))
+    for block in blocks:
+        kind = block.get("type", "paragraph")
+        if kind == "heading":
+            writer.heading(block.get("text", ""), block.get("level", 1))
+        elif kind == "paragraph":
+            writer.paragraph(block.get("text", ""))
+        elif kind == "bullet":
+            writer.paragraph(block.get("text", ""), "List Bullet")
+        elif kind == "table":
+            writer.table(block.get("rows") or [])
+        elif kind == "image":
+            writer.image(block["path"], block.get("width_inches") or 0)
+        elif kind == "page_break":
+            writer.page_break()
+        elif kind == "file":
+            writer.append_file(block["path"])
+        else:
+            raise ValueError(f"Unknown block type '{kind}'.")
+    tmp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        writer.finish().save(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return writer.stats
+
+
+def _render_document(worker_pool, blocks, output_path, template_path, timeout):
+    try:
+        return worker_pool.run(_build_word_document, blocks, output_path, template_path, timeout=timeout)
+    except ImportError:
+        raise ImportError("python-docx package not installed.")
+
+
+# -----------------
+# Tools
+# -----------------
 
 class CreateWordDocumentTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "create_word_document",
@@ -9,6 +203,7 @@ class CreateWordDocumentTool:
             "Provide the filename (ending with .docx) and a list of paragraphs as strings. "
             "The tool will create the document, add each paragraph, and save it. "
             "Use this tool to generate reports, notes, or formatted documents for project use. "
+            "For headings, tables, images, templates or content from files use build_word_document. "
             "Safety: Only create documents within the project scope. Never overwrite system or hidden files."
         ),
         "strict": True,
@@ -23,9 +218,14 @@ class CreateWordDocumentTool:
         },
     }
 
-    def __init__(self, root_path, permission_required=True):
+    def __init__(self, root_path, permission_required=True, worker_pool=None, timeout=300):
         self.root_path = root_path
         self.permission_required = permission_required
+        self.timeout = timeout
+        self.worker_pool = worker_pool or WorkerPool.shared(warm_modules=("docx",))
+
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
 
     def run(self, relative_path, paragraphs):
         file_path = os.path.join(self.root_path, relative_path)
@@ -41,14 +241,93 @@ class CreateWordDocumentTool:
         if not os.path.exists(folder):
             os.makedirs(folder)
         try:
-            from docx import Document
-        except ImportError:
-            return {"status": "error", "message": "python-docx package not installed."}
-        try:
-            document = Document()
-            for para in paragraphs:
-                document.add_paragraph(para)
-            document.save(abs_file_path)
+            blocks = [{"type": "paragraph", "text": para} for para in paragraphs]
+            _render_document(self.worker_pool, blocks, abs_file_path, "", self.timeout)
             return {"status": "success", "message": f"Word document '{relative_path}' created successfully."}
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+
+class BuildWordDocumentTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "build_word_document",
+        "description": (
+            "Build a formatted Word (.docx) document from an ordered list of blocks: heading, paragraph, bullet, table, image, page_break, "
+            "or file (appends a workspace text/markdown file as paragraphs with '#' headings and '-' bullets, or a CSV/TSV file as a table, streamed in chunks). "
+            "Optionally start from a .docx template (its styles and existing content are kept). "
+            "Unused block fields should be empty strings, 0 or empty lists. Large reports should reference files instead of inlining content. "
+            "Safety: Only create documents within the project scope."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "relative_path": {"type": "string", "description": "Output file path (ending with .docx) relative to the project root."},
+                "template_path": {"type": "string", "description": "Optional .docx template relative to the project root; empty string for a blank document."},
+                "blocks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "type": {"type": "string", "enum": ["heading", "paragraph", "bullet", "table", "image", "page_break", "file"], "description": "Block type."},
+                            "text": {"type": "string", "description": "Text for heading, paragraph and bullet blocks."},
+                            "level": {"type": "integer", "minimum": 0, "maximum": 9, "description": "Heading level (0 = title)."},
+                            "rows": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}, "description": "Table rows; the first row is the header."},
+                            "source_path": {"type": "string", "description": "Image or file path relative to the project root."},
+                            "width_inches": {"type": "number", "minimum": 0, "description": "Image width in inches (0 = natural size)."},
+                        },
+                        "required": ["type", "text", "level", "rows", "source_path", "width_inches"],
+                        "additionalProperties": False,
+                    },
+                    "description": "Document content in order.",
+                },
+            },
+            "required": ["relative_path", "template_path", "blocks"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, permission_required=True, worker_pool=None, timeout=300):
+        self.root_path = root_path
+        self.permission_required = permission_required
+        self.timeout = timeout
+        self.worker_pool = worker_pool or WorkerPool.shared(warm_modules=("docx",))
+
+    def _resolve(self, relative_path):
+        abs_root = os.path.abspath(self.root_path)
+        abs_path = os.path.abspath(os.path.join(abs_root, relative_path))
+        return abs_path if abs_path.startswith(abs_root) else None
+
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
+    def run(self, relative_path, template_path, blocks):
+        abs_file_path = self._resolve(relative_path)
+        if not abs_file_path or not relative_path.lower().endswith('.docx'):
+            return {"status": "error", "message": "Output must be a .docx path inside the project scope."}
+        abs_template = ""
+        if template_path:
+            abs_template = self._resolve(template_path)
+            if not abs_template or not os.path.isfile(abs_template):
+                return {"status": "error", "message": f"Template not found in project scope: {template_path}"}
+        resolved = []
+        for i, block in enumerate(blocks):
+            block = dict(block)
+            if block.get("type") in ("image", "file"):
+                source = self._resolve(block.get("source_path", ""))
+                if not source or not os.path.isfile(source):
+                    return {"status": "error", "message": f"Block {i}: source file not found in project scope: {block.get('source_path')}"}
+                block["path"] = source
+            resolved.append(block)
+        if self.permission_required:
+            permission = input(f"Create Word document '{relative_path}' ({len(blocks)} blocks)? Proceed? (y/n): ")
+            if permission.lower() != 'y':
+                return {"status": "error", "message": "Word document creation cancelled by user."}
+        os.makedirs(os.path.dirname(abs_file_path), exist_ok=True)
+        try:
+            stats = _render_document(self.worker_pool, resolved, abs_file_path, abs_template, self.timeout)
+            return {"status": "success", "message": f"Word document '{relative_path}' created successfully.", **stats}
+        except Exception as e:
+            return {"status": "error", "message": str(e) or e.__class__.__name__}
@@ -1,7 +1,13 @@
 import os
 import re
+import errno
 import shutil
+import fnmatch
 import hashlib
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # -----------------
 # Helper functions
@@ -146,6 +152,23 @@ def _hash_sha256(text: str) -> str:
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
+def _allocate_char_budget(lengths, budget: int):
+    """
+    Split a global character budget across several texts.
+    Short texts get their full length; the leftover is shared evenly by the longer ones,
+    so one huge file cannot starve the others. Returns a list of per-text allowances.
+    """
+    allowances = [0] * len(lengths)
+    remaining = max(0, budget)
+    left = len(lengths)
+    for i in sorted(range(len(lengths)), key=lambda k: lengths[k]):
+        share = remaining // left if left else 0
+        allowances[i] = min(lengths[i], share)
+        remaining -= allowances[i]
+        left -= 1
+    return allowances
+
+
 def _normalize_newlines(text: str, newline_style: str, fallback: str = 'LF') -> str:
     """
     Normalize text newlines to match newline_style ('LF'|'CRLF'|'CR'|'mixed'|'none').
@@ -159,7 +182,32 @@ def _normalize_newlines(text: str, newline_style: str, fallback: str = 'LF') ->
     return re.sub(r"\r\n|\r|\n", target, text)
 
 
+def _atomic_write_text(abs_path: str, content: str):
+    """
+    Write text to abs_path atomically: write a temp file in the same folder, fsync it,
+    then os.replace() it over the target. Readers see either the old or the new file, never a partial one.
+    """
+    folder = os.path.dirname(abs_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(abs_path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(abs_path):
+            shutil.copymode(abs_path, tmp_path)
+        os.replace(tmp_path, abs_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class ReadFolderContentTool:
+    memoizable = True
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "read_folder_content",
@@ -185,6 +233,9 @@ class ReadFolderContentTool:
     def __init__(self, root_path):
         self.root_path = root_path
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path):
         folder_path = os.path.join(self.root_path, relative_path)
         if not os.path.isdir(folder_path):
@@ -193,7 +244,112 @@ class ReadFolderContentTool:
         return {"status": "success", "items": items}
 
 
+class ReadFolderTreeTool:
+    schema = {
+        "type": "function",
+        "name": "read_folder_tree",
+        "description": (
+            "Recursively list a folder as a compact table of entries with type, size and mtime. "
+            "Use this to explore a project in one call instead of read_folder_content + path_stat per entry. "
+            "Rows are [path, type, size, mtime] where path is relative to the listed folder, type is 'file'|'dir'|'link'|'other', "
+            "size is bytes (null for dirs) and mtime is a unix timestamp. "
+            "Filter with include_globs (matched against file names or relative paths) and ignore_globs (prunes whole subtrees). "
+            "Safety: Never use this tool to access system or hidden folders. Only use for project-relevant paths."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "relative_path": {"type": "string", "description": "The folder path relative to the project root."},
+                "max_depth": {"type": "integer", "minimum": 0, "default": 3, "description": "How many directory levels below the folder to descend. 0 lists only the folder itself."},
+                "include_globs": {"type": "array", "items": {"type": "string"}, "description": "Only list files matching any of these globs (e.g. '*.py'). Empty = all files. Directories are always listed."},
+                "ignore_globs": {"type": "array", "items": {"type": "string"}, "description": "Skip entries (and their subtrees) matching any of these globs. Common noise like .git and __pycache__ is always skipped."},
+                "include_hidden": {"type": "boolean", "default": False, "description": "Include dot-files and dot-folders."},
+                "max_entries": {"type": "integer", "minimum": 1, "default": 500, "description": "Stop after this many entries; the result is marked truncated."}
+            },
+            "required": ["relative_path", "max_depth", "include_globs", "ignore_globs", "include_hidden", "max_entries"],
+            "additionalProperties": False,
+        },
+    }
+
+    DEFAULT_IGNORES = ('.git', '__pycache__', 'node_modules', '.venv', 'venv', '.mypy_cache', '.pytest_cache', '.ruff_cache', '.tox')
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+
+    def _matches(self, name, rel, patterns):
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in patterns)
+
+    def run(self, relative_path, max_depth=3, include_globs=None, ignore_globs=None, include_hidden=False, max_entries=500):
+        abs_root = os.path.abspath(self.root_path)
+        abs_folder = os.path.abspath(os.path.join(self.root_path, relative_path))
+        if not abs_folder.startswith(abs_root):
+            return {"status": "error", "message": "Folder path is outside the project scope."}
+        if not os.path.isdir(abs_folder):
+            return {"status": "error", "message": "Folder not found."}
+        include_globs = [g for g in (include_globs or []) if g]
+        ignore_globs = list(self.DEFAULT_IGNORES) + [g for g in (ignore_globs or []) if g]
+
+        rows = []
+        errors = []
+        truncated = False
+        # Iterative DFS; scandir reuses directory-entry data for type checks (and for stat on Windows)
+        stack = [(abs_folder, '', 0)]
+        while stack and not truncated:
+            dir_abs, dir_rel, depth = stack.pop()
+            try:
+                with os.scandir(dir_abs) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                errors.append({"path": dir_rel or '.', "error": str(e)})
+                continue
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                rel = f"{dir_rel}/{name}" if dir_rel else name
+                if not include_hidden and name.startswith('.'):
+                    continue
+                if self._matches(name, rel, ignore_globs):
+                    continue
+                try:
+                    if entry.is_symlink():
+                        kind = 'link'
+                    elif entry.is_dir():
+                        kind = 'dir'
+                    elif entry.is_file():
+                        kind = 'file'
+                    else:
+                        kind = 'other'
+                    st = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    errors.append({"path": rel, "error": str(e)})
+                    continue
+                if kind == 'dir':
+                    if depth < max_depth:
+                        subdirs.append((entry.path, rel, depth + 1))
+                elif include_globs and not self._matches(name, rel, include_globs):
+                    continue
+                if len(rows) >= max_entries:
+                    truncated = True
+                    break
+                rows.append([rel, kind, None if kind == 'dir' else st.st_size, round(st.st_mtime, 3)])
+            # Push in reverse so directories are visited in name order
+            stack.extend(reversed(subdirs))
+
+        return {
+            "status": "success",
+            "root": relative_path,
+            "columns": ["path", "type", "size", "mtime"],
+            "rows": rows,
+            "count": len(rows),
+            "truncated": truncated,
+            "errors": errors,
+        }
+
+
 class ReadFileContentTool:
+    memoizable = True
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "read_file_content",
@@ -223,6 +379,9 @@ class ReadFileContentTool:
     def __init__(self, root_path):
         self.root_path = root_path
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path, with_index=False, content_mode='full', start_line=None, end_line=None, index_mode='none', with_hash=False, max_chars=None):
         file_path = os.path.join(self.root_path, relative_path)
         abs_file_path = os.path.abspath(file_path)
@@ -296,7 +455,121 @@ class ReadFileContentTool:
             return {"status": "error", "message": str(e)}
 
 
+class ReadFilesTool:
+    memoizable = True
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "read_files",
+        "description": (
+            "Read several files in one call. Each entry takes a path and either the full content or a line range. "
+            "Prefer this over repeated read_file_content calls when you need more than one file (e.g. gathering context at task start). "
+            "max_chars is a single budget shared by all returned content; short files are returned whole and the rest is split fairly between larger ones. "
+            "Safety: Never use this tool to access system or hidden files. Only project-relevant paths."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "files": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "relative_path": {"type": "string", "description": "Path relative to project root."},
+                            "content_mode": {"type": "string", "enum": ["full", "range"], "default": "full", "description": "full = whole file; range = only start..end lines."},
+                            "start_line": {"type": "integer", "minimum": 1, "description": "First line when content_mode='range'. Inclusive."},
+                            "end_line": {"type": "integer", "minimum": 1, "description": "Last line when content_mode='range'. Inclusive."}
+                        },
+                        "required": ["relative_path", "content_mode", "start_line", "end_line"],
+                        "additionalProperties": False,
+                    },
+                    "description": "Files to read, returned in the same order.",
+                },
+                "max_chars": {"type": "integer", "minimum": 1, "default": 60000, "description": "Global cap on characters of content returned across all files."},
+                "with_hash": {"type": "boolean", "default": False, "description": "Include SHA-256 of each file's full content."}
+            },
+            "required": ["files", "max_chars", "with_hash"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, max_workers=8):
+        self.root_path = root_path
+        self.max_workers = max_workers
+
+    def _read_one(self, spec, with_hash):
+        relative_path = spec.get('relative_path') if isinstance(spec, dict) else None
+        if not relative_path:
+            return {"relative_path": relative_path, "status": "error", "message": "relative_path is required."}
+        abs_root_path = os.path.abspath(self.root_path)
+        abs_file_path = os.path.abspath(os.path.join(self.root_path, relative_path))
+        if not abs_file_path.startswith(abs_root_path):
+            return {"relative_path": relative_path, "status": "error", "message": "File path is outside the project scope."}
+        if not os.path.isfile(abs_file_path):
+            return {"relative_path": relative_path, "status": "error", "message": "File not found."}
+        try:
+            with open(abs_file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            out = {"relative_path": relative_path, "status": "success"}
+            if spec.get('content_mode', 'full') == 'range':
+                start_line, end_line = spec.get('start_line'), spec.get('end_line')
+                if start_line is None or end_line is None:
+                    return {"relative_path": relative_path, "status": "error", "message": "start_line and end_line required for content_mode='range'."}
+                idx = _index_text(content)
+                out["content"] = _slice_content_by_lines(content, idx, start_line, end_line)
+                out["start_line"] = start_line
+                out["end_line"] = min(end_line, idx['line_count'])
+                out["line_count"] = idx['line_count']
+            else:
+                out["content"] = content
+            if with_hash:
+                out["sha256"] = _hash_sha256(content)
+            return out
+        except Exception as e:
+            return {"relative_path": relative_path, "status": "error", "message": str(e)}
+
+    def memo_paths(self, files, **kwargs):
+        return [os.path.join(self.root_path, f["relative_path"]) for f in files]
+
+    def run(self, files, max_chars=60000, with_hash=False):
+        if not isinstance(files, list) or not files:
+            return {"status": "error", "message": "'files' must be a non-empty list."}
+        # File reads are I/O bound, so a small thread pool overlaps them well
+        workers = max(1, min(self.max_workers, len(files)))
+        if workers == 1:
+            results = [self._read_one(spec, with_hash) for spec in files]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda spec: self._read_one(spec, with_hash), files))
+
+        # Apply one character budget across all successful reads
+        readable = [r for r in results if "content" in r]
+        allowances = _allocate_char_budget([len(r["content"]) for r in readable], max_chars if max_chars is not None else sum(len(r["content"]) for r in readable))
+        total_chars = 0
+        truncated = False
+        for r, allowance in zip(readable, allowances):
+            full_length = len(r["content"])
+            if full_length > allowance:
+                r["content"] = r["content"][:allowance]
+                r["content_truncated"] = True
+                r["content_length"] = full_length
+                truncated = True
+            total_chars += len(r["content"])
+
+        errors = sum(1 for r in results if r["status"] != "success")
+        return {
+            "status": "success" if errors == 0 else "error",
+            "count": len(results),
+            "errors": errors,
+            "total_chars": total_chars,
+            "truncated": truncated,
+            "files": results,
+        }
+
+
 class WriteFileContentTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "write_file_content",
@@ -324,6 +597,9 @@ class WriteFileContentTool:
         self.root_path = root_path
         self.permission_required = permission_required
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path, content):
         file_path = os.path.join(self.root_path, relative_path)
         abs_file_path = os.path.abspath(file_path)
@@ -346,6 +622,7 @@ class WriteFileContentTool:
 
 
 class CreateFolderTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "create_folder",
@@ -370,6 +647,9 @@ class CreateFolderTool:
         self.root_path = root_path
         self.permission_required = permission_required
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path):
         folder_path = os.path.join(self.root_path, relative_path)
         abs_folder_path = os.path.abspath(folder_path)
@@ -388,6 +668,7 @@ class CreateFolderTool:
 
 
 class RemovePathsTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "remove_paths",
@@ -416,6 +697,9 @@ class RemovePathsTool:
         self.root_path = root_path
         self.permission_required = permission_required
 
+    def memo_paths(self, paths, **kwargs):
+        return [os.path.join(self.root_path, p) for p in paths]
+
     def run(self, paths):
         if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
             return {"status": "error", "message": "'paths' must be a list of strings."}
@@ -495,6 +779,7 @@ class RemovePathsTool:
 
 
 class InsertTextInFileTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "insert_text_in_file",
@@ -525,6 +810,9 @@ class InsertTextInFileTool:
         self.root_path = root_path
         self.permission_required = permission_required
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path, line, column, text, expected_sha256=None, normalize_newlines=True, newline_fallback='LF'):
         abs_root = os.path.abspath(self.root_path)
         file_path = os.path.join(self.root_path, relative_path)
@@ -575,6 +863,7 @@ class InsertTextInFileTool:
 
 
 class ReplaceTextInFileTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "replace_text_in_file",
@@ -606,6 +895,9 @@ class ReplaceTextInFileTool:
         self.root_path = root_path
         self.permission_required = permission_required
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path, start_line, start_column, end_line, end_column, text, expected_sha256=None, normalize_newlines=True, newline_fallback='LF'):
         abs_root = os.path.abspath(self.root_path)
         file_path = os.path.join(self.root_path, relative_path)
@@ -661,7 +953,496 @@ class ReplaceTextInFileTool:
             return {"status": "error", "message": str(e)}
 
 
+class ApplyEditsTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "apply_edits",
+        "description": (
+            "Apply many range edits across one or more files in a single call. "
+            "Each edit replaces the text between two (line, column) positions; use equal start and end positions to insert. "
+            "All positions refer to the file as it is BEFORE any edit in this call, so you never need to adjust for earlier edits. "
+            "Edits in one file must not overlap. Every file is validated first; if anything fails nothing is written. "
+            "Prefer this over repeated insert_text_in_file/replace_text_in_file calls for multi-spot refactors. "
+            "1-based line/column, column counts characters within line content only; start inclusive, end exclusive."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "files": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "relative_path": {"type": "string", "description": "Path to the file relative to project root."},
+                            "expected_sha256": {"type": "string", "description": "If non-empty, the file hash must match before any edit is applied."},
+                            "edits": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "start_line": {"type": "integer", "minimum": 1, "description": "Start line (inclusive)."},
+                                        "start_column": {"type": "integer", "minimum": 1, "description": "Start column (inclusive)."},
+                                        "end_line": {"type": "integer", "minimum": 1, "description": "End line (exclusive end position)."},
+                                        "end_column": {"type": "integer", "minimum": 1, "description": "End column (exclusive)."},
+                                        "text": {"type": "string", "description": "Replacement text (empty string deletes the range)."}
+                                    },
+                                    "required": ["start_line", "start_column", "end_line", "end_column", "text"],
+                                    "additionalProperties": False,
+                                },
+                                "description": "Edits for this file, in any order.",
+                            }
+                        },
+                        "required": ["relative_path", "expected_sha256", "edits"],
+                        "additionalProperties": False,
+                    },
+                    "description": "Files to edit, each with its list of edits.",
+                },
+                "normalize_newlines": {"type": "boolean", "default": True, "description": "Normalize inserted text newlines to each file's style."},
+                "newline_fallback": {"type": "string", "enum": ["LF", "CRLF", "CR"], "default": "LF", "description": "Fallback when a file has mixed/none newlines."}
+            },
+            "required": ["files", "normalize_newlines", "newline_fallback"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, permission_required=True):
+        self.root_path = root_path
+        self.permission_required = permission_required
+
+    def _plan_file(self, spec, normalize_newlines, newline_fallback):
+        """Validate one file's edits and return (abs_path, old_content, new_content, edit_count) or an error dict."""
+        relative_path = spec.get('relative_path')
+        abs_root = os.path.abspath(self.root_path)
+        abs_file = os.path.abspath(os.path.join(self.root_path, relative_path or ''))
+        if not relative_path or not abs_file.startswith(abs_root):
+            return {"relative_path": relative_path, "message": "File path is outside the project scope."}
+        if not os.path.isfile(abs_file):
+            return {"relative_path": relative_path, "message": "File not found."}
+        with open(abs_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        expected_sha256 = spec.get('expected_sha256')
+        if expected_sha256:
+            actual = _hash_sha256(content)
+            if actual != expected_sha256:
+                return {"relative_path": relative_path, "message": "File hash mismatch.", "actual_sha256": actual}
+
+        idx = _index_text(content)
+        resolved = []
+        for n, edit in enumerate(spec.get('edits') or [], start=1):
+            try:
+                start_off = _offset_from_line_col(idx, edit['start_line'], edit['start_column'])
+                end_off = _offset_from_line_col(idx, edit['end_line'], edit['end_column'])
+            except (KeyError, ValueError) as e:
+                return {"relative_path": relative_path, "message": f"Edit #{n}: {e}"}
+            if end_off < start_off:
+                return {"relative_path": relative_path, "message": f"Edit #{n}: end position precedes start position."}
+            text = edit.get('text', '')
+            if normalize_newlines:
+                text = _normalize_newlines(text, idx['newline'], newline_fallback)
+            resolved.append((start_off, end_off, n, text))
+        if not resolved:
+            return {"relative_path": relative_path, "message": "No edits provided."}
+
+        # Stable sort keeps same-offset inserts in the order given
+        resolved.sort(key=lambda e: (e[0], e[1]))
+        for prev, cur in zip(resolved, resolved[1:]):
+            if cur[0] < prev[1]:
+                return {"relative_path": relative_path, "message": f"Edits #{prev[2]} and #{cur[2]} overlap."}
+
+        # All offsets refer to the original text, so one forward pass builds the result
+        parts = []
+        pos = 0
+        for start_off, end_off, _, text in resolved:
+            parts.append(content[pos:start_off])
+            parts.append(text)
+            pos = end_off
+        parts.append(content[pos:])
+        return abs_file, content, ''.join(parts), len(resolved)
+
+    def memo_paths(self, files, **kwargs):
+        return [os.path.join(self.root_path, f["relative_path"]) for f in files]
+
+    def run(self, files, normalize_newlines=True, newline_fallback='LF'):
+        if not isinstance(files, list) or not files:
+            return {"status": "error", "message": "'files' must be a non-empty list."}
+        plans = []
+        errors = []
+        seen = set()
+        for spec in files:
+            if not isinstance(spec, dict):
+                errors.append({"relative_path": None, "message": "Invalid file entry."})
+                continue
+            try:
+                plan = self._plan_file(spec, normalize_newlines, newline_fallback)
+            except Exception as e:
+                plan = {"relative_path": spec.get('relative_path'), "message": str(e)}
+            if isinstance(plan, dict):
+                errors.append(plan)
+                continue
+            if plan[0] in seen:
+                errors.append({"relative_path": spec.get('relative_path'), "message": "File listed more than once; merge its edits into one entry."})
+                continue
+            seen.add(plan[0])
+            plans.append((spec['relative_path'],) + plan)
+        if errors:
+            return {"status": "error", "message": "Validation failed; no files were modified.", "errors": errors}
+
+        if self.permission_required:
+            preview = "\n".join(f"- {rel}: {count} edit(s)" for rel, _, _, _, count in plans)
+            permission = input(f"Apply the following edits?\n{preview}\nProceed? (y/n): ")
+            if permission.lower() != 'y':
+                return {"status": "error", "message": "Edits cancelled by user."}
+
+        written = []
+        try:
+            for rel, abs_file, old_content, new_content, count in plans:
+                _atomic_write_text(abs_file, new_content)
+                written.append((abs_file, old_content))
+        except Exception as e:
+            # Put back any file already replaced so the batch stays all-or-nothing
+            for abs_file, old_content in reversed(written):
+                try:
+                    _atomic_write_text(abs_file, old_content)
+                except Exception:
+                    pass
+            return {"status": "error", "message": f"Write failed, changes rolled back: {e}"}
+
+        return {
+            "status": "success",
+            "message": f"Applied {sum(p[4] for p in plans)} edit(s) across {len(plans)} file(s).",
+            "files": [
+                {"relative_path": rel, "edits": count, "new_length": len(new_content), "sha256": _hash_sha256(new_content)}
+                for rel, _, _, new_content, count in plans
+            ],
+        }
+
+
+# -----------------
+# Unified diff / patch application
+# -----------------
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _patch_path(raw: str, strip):
+    """
+    Clean a path from a '---'/'+++' header. Returns None for /dev/null.
+    strip=None removes a leading 'a/' or 'b/' (git style); an int strips that many components.
+    """
+    path = raw.split('\t', 1)[0].strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == '/dev/null':
+        return None
+    if strip is None:
+        if path[:2] in ('a/', 'b/'):
+            path = path[2:]
+    elif strip > 0:
+        parts = path.split('/')
+        path = '/'.join(parts[strip:]) if len(parts) > strip else parts[-1]
+    return path
+
+
+def _parse_unified_diff(patch_text: str, strip=None):
+    """
+    Parse a unified diff into a list of file patches:
+      { old_path, new_path, hunks: [ { old_start, old_len, new_start, new_len, lines: [(tag, text)], new_no_eol } ] }
+    tag is ' ', '-' or '+'. Raises ValueError on malformed input.
+    """
+    files = []
+    current = None
+    lines = patch_text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('--- ') and i + 1 < len(lines) and lines[i + 1].startswith('+++ '):
+            current = {
+                'old_path': _patch_path(line[4:], strip),
+                'new_path': _patch_path(lines[i + 1][4:], strip),
+                'hunks': [],
+            }
+            files.append(current)
+            i += 2
+            continue
+        m = _HUNK_HEADER_RE.match(line)
+        if m:
+            if current is None:
+                raise ValueError(f"Hunk without file header at patch line {i + 1}.")
+            hunk = {
+                'old_start': int(m.group(1)),
+                'old_len': int(m.group(2)) if m.group(2) is not None else 1,
+                'new_start': int(m.group(3)),
+                'new_len': int(m.group(4)) if m.group(4) is not None else 1,
+                'lines': [],
+                'new_no_eol': False,
+            }
+            old_seen = new_seen = 0
+            i += 1
+            while i < len(lines) and (old_seen < hunk['old_len'] or new_seen < hunk['new_len']):
+                body = lines[i]
+                tag, text = (body[:1], body[1:]) if body else (' ', '')
+                if tag == '\\':
+                    i += 1
+                    continue
+                if tag not in (' ', '-', '+'):
+                    raise ValueError(f"Unexpected line in hunk at patch line {i + 1}: {body[:40]!r}")
+                hunk['lines'].append((tag, text))
+                if tag != '+':
+                    old_seen += 1
+                if tag != '-':
+                    new_seen += 1
+                i += 1
+            # A trailing "\ No newline at end of file" after a new-side line drops the final EOL
+            if i < len(lines) and lines[i].startswith('\\'):
+                if hunk['lines'] and hunk['lines'][-1][0] in (' ', '+'):
+                    hunk['new_no_eol'] = True
+                i += 1
+            current['hunks'].append(hunk)
+            continue
+        i += 1
+    if not files:
+        raise ValueError("No file headers ('--- ' / '+++ ') found in patch.")
+    return files
+
+
+def _find_block(lines, block, expected: int, lo: int, same):
+    """Find block in lines[lo:], trying positions nearest to expected first. Returns index or None."""
+    n, m = len(lines), len(block)
+    if m == 0:
+        return max(lo, min(expected, n))
+    last = n - m
+    if last < lo:
+        return None
+    expected = max(lo, min(expected, last))
+    for delta in range(0, max(expected - lo, last - expected) + 1):
+        for pos in ((expected,) if delta == 0 else (expected - delta, expected + delta)):
+            if lo <= pos <= last and all(same(lines[pos + k], block[k]) for k in range(m)):
+                return pos
+    return None
+
+
+def _apply_hunks(old_lines, hunks, max_fuzz: int):
+    """
+    Apply parsed hunks to a list of lines (without EOLs).
+    Each hunk is located near its expected position: first exactly, then ignoring trailing whitespace,
+    then with up to max_fuzz leading/trailing context lines dropped (like GNU patch fuzz).
+    Returns (new_lines, report) or raises ValueError naming the failing hunk.
+    """
+    exact = lambda a, b: a == b
+    loose = lambda a, b: a.rstrip() == b.rstrip()
+    result = []
+    src_pos = 0
+    shift = 0
+    report = []
+    for n, hunk in enumerate(hunks, start=1):
+        body = hunk['lines']
+        # A zero-length old side means "insert after line old_start"
+        base = hunk['old_start'] - 1 if hunk['old_len'] else hunk['old_start']
+        expected = max(0, base + shift)
+        found = None
+        for fuzz in range(0, max_fuzz + 1):
+            # Drop up to `fuzz` context lines from each end, never touching changed lines
+            head = 0
+            while head < fuzz and head < len(body) and body[head][0] == ' ':
+                head += 1
+            tail = 0
+            while tail < fuzz and tail < len(body) - head and body[len(body) - 1 - tail][0] == ' ':
+                tail += 1
+            trimmed = body[head:len(body) - tail]
+            old_block = [t for tag, t in trimmed if tag != '+']
+            for same in (exact, loose):
+                pos = _find_block(old_lines, old_block, expected + head, src_pos, same)
+                if pos is not None:
+                    found = (pos, head, trimmed, old_block, fuzz, same is loose)
+                    break
+            if found:
+                break
+        if not found:
+            raise ValueError(f"Hunk #{n} (@@ -{hunk['old_start']},{hunk['old_len']} @@) does not match the file.")
+        pos, head, trimmed, old_block, fuzz, whitespace = found
+        result.extend(old_lines[src_pos:pos])
+        # Context lines keep the file's own text; only '+' lines come from the patch
+        k = pos
+        for tag, text in trimmed:
+            if tag == ' ':
+                result.append(old_lines[k])
+                k += 1
+            elif tag == '-':
+                k += 1
+            else:
+                result.append(text)
+        src_pos = pos + len(old_block)
+        # Later hunks are expected to drift by the same amount as this one
+        shift = (pos - head) - base
+        report.append({"hunk": n, "line": pos - head + 1, "offset": pos - head - expected, "fuzz": fuzz, "whitespace_insensitive": whitespace})
+    result.extend(old_lines[src_pos:])
+    return result, report
+
+
+class ApplyPatchTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "apply_patch",
+        "description": (
+            "Apply a unified diff (as produced by 'diff -u' or 'git diff') to one or more files. "
+            "Supports modifying, creating (--- /dev/null) and deleting (+++ /dev/null) files. "
+            "Hunks are located near their stated line numbers even if the file has shifted, tolerate trailing-whitespace differences, "
+            "and may drop up to 'fuzz' context lines at each end when context has drifted. "
+            "All files are checked before anything is written; on any failure no file is changed. "
+            "Prefer this for medium/large edits: send only the changed lines plus ~3 lines of context instead of rewriting whole files. "
+            "Safety: Only operates within the project root."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "patch": {"type": "string", "description": "Unified diff text. Paths are relative to project root; git-style a/ b/ prefixes are stripped."},
+                "fuzz": {"type": "integer", "minimum": 0, "maximum": 3, "default": 2, "description": "Max context lines that may be ignored at each end of a hunk."},
+                "dry_run": {"type": "boolean", "default": False, "description": "Check that the patch applies and report, without writing."}
+            },
+            "required": ["patch", "fuzz", "dry_run"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, permission_required=True):
+        self.root_path = root_path
+        self.permission_required = permission_required
+
+    def _resolve(self, rel):
+        abs_root = os.path.abspath(self.root_path)
+        abs_path = os.path.abspath(os.path.join(self.root_path, rel))
+        if not abs_path.startswith(abs_root) or abs_path == abs_root:
+            raise ValueError(f"Path is outside the project scope: {rel}")
+        return abs_path
+
+    def _plan(self, file_patch, fuzz):
+        """Return an operation dict {action, path, abs_path, [old_abs], content, hunks} for one file patch."""
+        old_rel, new_rel = file_patch['old_path'], file_patch['new_path']
+        if old_rel is None and new_rel is None:
+            raise ValueError("Both sides of a file header are /dev/null.")
+        hunks = file_patch['hunks']
+
+        if old_rel is None:
+            abs_path = self._resolve(new_rel)
+            if os.path.exists(abs_path):
+                raise ValueError(f"Cannot create '{new_rel}': it already exists.")
+            new_lines, report = _apply_hunks([], hunks, 0)
+            no_eol = bool(hunks) and hunks[-1]['new_no_eol']
+            content = '\n'.join(new_lines) + ('' if no_eol or not new_lines else '\n')
+            return {"action": "create", "path": new_rel, "abs_path": abs_path, "content": content, "hunks": report}
+
+        old_abs = self._resolve(old_rel)
+        if not os.path.isfile(old_abs):
+            raise ValueError(f"File not found: {old_rel}")
+        with open(old_abs, 'r', encoding='utf-8') as f:
+            original = f.read()
+        old_lines = original.splitlines()
+        new_lines, report = _apply_hunks(old_lines, hunks, fuzz)
+
+        if new_rel is None:
+            if new_lines:
+                raise ValueError(f"Deletion patch for '{old_rel}' leaves {len(new_lines)} line(s) behind.")
+            return {"action": "delete", "path": old_rel, "abs_path": old_abs, "hunks": report}
+
+        ends_with_eol = original.endswith(('\n', '\r'))
+        if hunks and hunks[-1]['new_no_eol']:
+            ends_with_eol = False
+        elif hunks and not ends_with_eol and hunks[-1]['lines'] and hunks[-1]['lines'][-1][0] == '+':
+            ends_with_eol = True
+        content = '\n'.join(new_lines) + ('\n' if ends_with_eol and new_lines else '')
+        abs_path = self._resolve(new_rel)
+        if abs_path != old_abs:
+            if os.path.exists(abs_path):
+                raise ValueError(f"Cannot rename to '{new_rel}': it already exists.")
+            return {"action": "rename", "path": new_rel, "old_path": old_rel, "abs_path": abs_path, "old_abs": old_abs, "content": content, "hunks": report}
+        return {"action": "modify", "path": new_rel, "abs_path": abs_path, "content": content, "hunks": report}
+
+    def _commit(self, ops):
+        """Write all operations; on failure undo the ones already done and re-raise."""
+        undo = []  # callables restoring previous state, run in reverse
+        backups = []  # (backup_path, original_path) for deleted/renamed-away files
+        try:
+            for op in ops:
+                if op['action'] in ('create', 'rename'):
+                    os.makedirs(os.path.dirname(op['abs_path']), exist_ok=True)
+                    _atomic_write_text(op['abs_path'], op['content'])
+                    undo.append(lambda p=op['abs_path']: os.remove(p))
+                elif op['action'] == 'modify':
+                    with open(op['abs_path'], 'r', encoding='utf-8') as f:
+                        previous = f.read()
+                    _atomic_write_text(op['abs_path'], op['content'])
+                    undo.append(lambda p=op['abs_path'], c=previous: _atomic_write_text(p, c))
+                if op['action'] in ('delete', 'rename'):
+                    victim = op['abs_path'] if op['action'] == 'delete' else op['old_abs']
+                    backup = victim + f".{uuid.uuid4().hex[:8]}.bak"
+                    os.replace(victim, backup)
+                    backups.append((backup, victim))
+                    undo.append(lambda b=backup, v=victim: os.replace(b, v))
+        except BaseException:
+            for step in reversed(undo):
+                try:
+                    step()
+                except Exception:
+                    pass
+            raise
+        # Everything landed; drop the backups of removed files
+        for backup, _ in backups:
+            try:
+                os.remove(backup)
+            except OSError:
+                pass
+
+    def run(self, patch, fuzz=2, dry_run=False):
+        try:
+            file_patches = _parse_unified_diff(patch or '')
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid patch: {e}"}
+
+        ops = []
+        errors = []
+        seen = set()
+        for fp in file_patches:
+            label = fp['new_path'] or fp['old_path']
+            try:
+                op = self._plan(fp, max(0, min(int(fuzz or 0), 3)))
+            except Exception as e:
+                errors.append({"path": label, "message": str(e)})
+                continue
+            if op['abs_path'] in seen:
+                errors.append({"path": label, "message": "File appears more than once in the patch."})
+                continue
+            seen.add(op['abs_path'])
+            ops.append(op)
+        if errors:
+            return {"status": "error", "message": "Patch does not apply; no files were modified.", "errors": errors}
+
+        summary = [{k: v for k, v in op.items() if k in ('action', 'path', 'old_path', 'hunks')} for op in ops]
+        if dry_run:
+            return {"status": "success", "message": f"Patch applies cleanly to {len(ops)} file(s) (dry run).", "files": summary}
+
+        if self.permission_required:
+            preview = "\n".join(f"- {op['action']}: {op['path']}" for op in ops)
+            permission = input(f"Apply patch to the following files?\n{preview}\nProceed? (y/n): ")
+            if permission.lower() != 'y':
+                return {"status": "error", "message": "Patch cancelled by user."}
+
+        try:
+            self._commit(ops)
+        except Exception as e:
+            return {"status": "error", "message": f"Write failed, changes rolled back: {e}"}
+        for op, item in zip(ops, summary):
+            if 'content' in op:
+                item['sha256'] = _hash_sha256(op['content'])
+        return {"status": "success", "message": f"Patched {len(ops)} file(s).", "files": summary}
+
+
 class SearchInFileTool:
+    memoizable = True
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "search_in_file",
@@ -697,6 +1478,9 @@ class SearchInFileTool:
     def __init__(self, root_path):
         self.root_path = root_path
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(
         self,
         relative_path,
@@ -840,16 +1624,207 @@ class SearchInFileTool:
             return {"status": "error", "message": str(e)}
 
 
+# -----------------
+# Bulk copy engine
+# -----------------
+
+def _copy_file_data(src: str, dst: str):
+    """
+    Copy file bytes using the kernel where possible: os.copy_file_range (Linux, stays in-kernel and can
+    reflink on CoW filesystems), otherwise shutil.copyfile, which itself uses sendfile on Linux and
+    fcopyfile on macOS.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining <= 0:
+                    return
+        except OSError:
+            # Cross-filesystem on older kernels, unsupported FS, etc.
+            pass
+    shutil.copyfile(src, dst)
+
+
+def _file_sha256(abs_path: str) -> str:
+    h = hashlib.sha256()
+    with open(abs_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _drain(stream):
+    """Run a progress generator to completion and return its result (used by run() of streaming tools)."""
+    while True:
+        try:
+            next(stream)
+        except StopIteration as stop:
+            return stop.value
+
+
+class BulkCopyEngine:
+    """
+    Copies many files on a thread pool and reports progress.
+
+    skip_mode decides when an existing destination file counts as already up to date:
+      - 'none': always copy
+      - 'size_mtime': same size and modification time (what copy2/preserve_metadata produces)
+      - 'hash': same size and SHA-256
+    Symbolic links are followed and their targets copied, as copy2/copytree do; with
+    preserve_symlinks (used for cross-device moves, like shutil.move) links are recreated as links.
+    FIFOs, sockets and device files are not copied but reported as errors, since reading them can block.
+    run() is a generator: it yields progress dicts while working and returns a summary dict
+    (the counters, plus "errors" and the source paths of the "skipped" files).
+    """
+
+    PROGRESS_INTERVAL = 0.25  # seconds between progress events
+
+    def __init__(self, max_workers=8, skip_mode='size_mtime', preserve_metadata=True, overwrite=False, preserve_symlinks=False):
+        self.max_workers = max_workers
+        self.skip_mode = skip_mode
+        self.preserve_metadata = preserve_metadata
+        self.overwrite = overwrite
+        self.preserve_symlinks = preserve_symlinks
+
+    def plan(self, src_abs: str, dst_abs: str):
+        """Expand a file or directory copy into (dirs_to_create, [(src_file, dst_file, size)])."""
+        follow = not self.preserve_symlinks
+        if not os.path.isdir(src_abs) or (not follow and os.path.islink(src_abs)):
+            try:
+                size = os.stat(src_abs, follow_symlinks=follow).st_size
+            except OSError:
+                size = 0  # e.g. a broken link; reported when the copy fails
+            return [], [(src_abs, dst_abs, size)]
+        dirs = [dst_abs]
+        files = []
+        stack = [(src_abs, dst_abs)]
+        seen = {os.path.realpath(src_abs)}
+        while stack:
+            s_dir, d_dir = stack.pop()
+            with os.scandir(s_dir) as it:
+                for entry in it:
+                    d_path = os.path.join(d_dir, entry.name)
+                    if entry.is_dir(follow_symlinks=follow):
+                        # A followed link back up the tree would otherwise recurse forever
+                        real = os.path.realpath(entry.path)
+                        if real in seen:
+                            continue
+                        seen.add(real)
+                        dirs.append(d_path)
+                        stack.append((entry.path, d_path))
+                    else:
+                        try:
+                            size = entry.stat(follow_symlinks=follow).st_size
+                        except OSError:
+                            size = 0
+                        files.append((entry.path, d_path, size))
+        return dirs, files
+
+    def _up_to_date(self, src: str, dst: str) -> bool:
+        if self.skip_mode == 'none':
+            return False
+        try:
+            s, d = os.stat(src), os.stat(dst)
+        except OSError:
+            return False
+        if s.st_size != d.st_size:
+            return False
+        if self.skip_mode == 'hash':
+            return _file_sha256(src) == _file_sha256(dst)
+        return abs(s.st_mtime - d.st_mtime) < 1e-3
+
+    def _copy_one(self, src: str, dst: str):
+        """Copy one file. Returns 'copied' or 'skipped'; raises on error."""
+        if os.path.lexists(dst):
+            if self._up_to_date(src, dst):
+                return 'skipped'
+            if not self.overwrite:
+                raise FileExistsError(f"Destination exists: {dst}")
+        if self.preserve_symlinks and os.path.islink(src):
+            if os.path.lexists(dst):
+                os.remove(dst)
+            os.symlink(os.readlink(src), dst)
+            return 'copied'
+        if not os.path.isfile(src):
+            if os.path.exists(src):
+                raise OSError(f"Not a regular file (FIFO, socket or device), not copied: {src}")
+            raise FileNotFoundError(f"Source not found (broken link?): {src}")
+        _copy_file_data(src, dst)
+        if self.preserve_metadata:
+            shutil.copystat(src, dst)
+        else:
+            shutil.copymode(src, dst)
+        return 'copied'
+
+    def run(self, dirs, files):
+        for d in dirs:
+            os.makedirs(d, exist_ok=True)
+        total_bytes = sum(size for _, _, size in files)
+        stats = {"files_total": len(files), "files_done": 0, "files_copied": 0, "files_skipped": 0, "bytes_total": total_bytes, "bytes_done": 0}
+        errors = []
+        skipped = []
+        last_emit = 0.0
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(files) or 1)))
+        try:
+            futures = {pool.submit(self._copy_one, src, dst): (src, dst, size) for src, dst, size in files}
+            for fut in as_completed(futures):
+                src, dst, size = futures[fut]
+                try:
+                    outcome = fut.result()
+                    stats["files_copied" if outcome == 'copied' else "files_skipped"] += 1
+                    if outcome == 'skipped':
+                        skipped.append(src)
+                except Exception as e:
+                    errors.append({"src": src, "dst": dst, "error": str(e)})
+                stats["files_done"] += 1
+                stats["bytes_done"] += size
+                now = time.monotonic()
+                if now - last_emit >= self.PROGRESS_INTERVAL or stats["files_done"] == len(files):
+                    last_emit = now
+                    yield dict(stats)
+        finally:
+            # Closing the generator early (e.g. user stop) cancels copies that have not started
+            pool.shutdown(wait=True, cancel_futures=True)
+        stats["errors"] = errors
+        stats["skipped"] = skipped
+        return stats
+
+
+def _mirrors(src_dir: str, dst_dir: str) -> bool:
+    """True if dst_dir looks like an earlier copy of src_dir: not empty, and every entry also exists in src_dir as the same kind."""
+    try:
+        with os.scandir(dst_dir) as it:
+            dst_entries = {e.name: e.is_dir() for e in it}
+        if not dst_entries:
+            return False
+        with os.scandir(src_dir) as it:
+            src_entries = {e.name: e.is_dir() for e in it}
+    except OSError:
+        return False
+    return all(src_entries.get(name) == is_dir for name, is_dir in dst_entries.items())
+
+
 # -----------------
 # New tools: copy, rename, move, path stat
 # -----------------
 
 class CopyPathsTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "copy_paths",
         "description": (
             "Copy one or more files/folders to destination locations within the project workspace. "
+            "Files are copied in parallel; destination files that are already identical are skipped (see skip_unchanged), "
+            "so re-running a copy only transfers what changed. "
+            "Placement: if dst does not exist it becomes the copy; if dst is an existing folder the source goes inside it as dst/<name of src>, "
+            "unless dst/<name of src> does not exist and dst already holds an earlier copy of the folder src (only entries that src also has), in which case dst is synced. "
             "Safety: both source and destination must resolve inside the project root."
         ),
         "strict": True,
@@ -870,31 +1845,43 @@ class CopyPathsTool:
                     "description": "List of copy operations (src -> dst)."
                 },
                 "overwrite": {"type": "boolean", "default": False, "description": "Overwrite/merge if destination exists."},
-                "preserve_metadata": {"type": "boolean", "default": True, "description": "Preserve file metadata where possible."}
+                "preserve_metadata": {"type": "boolean", "default": True, "description": "Preserve file metadata where possible."},
+                "skip_unchanged": {"type": "string", "enum": ["none", "size_mtime", "hash"], "default": "size_mtime", "description": "Skip destination files that already match: by size+mtime (fast), by SHA-256 (exact), or never. Lets an existing folder be synced without overwrite."}
             },
-            "required": ["items", "overwrite", "preserve_metadata"],
+            "required": ["items", "overwrite", "preserve_metadata", "skip_unchanged"],
             "additionalProperties": False,
         },
     }
 
-    def __init__(self, root_path):
+    def __init__(self, root_path, max_workers=8):
         self.root_path = root_path
+        self.max_workers = max_workers
 
     def _ensure_inside(self, abs_path: str, abs_root: str):
         return abs_path.startswith(abs_root)
 
-    def run(self, items, overwrite=False, preserve_metadata=True):
+    def memo_paths(self, items, **kwargs):
+        return [os.path.join(self.root_path, p) for item in items for p in (item["src"], item["dst"])]
+
+    def run(self, items, overwrite=False, preserve_metadata=True, skip_unchanged='size_mtime'):
+        return _drain(self.run_streaming(items, overwrite, preserve_metadata, skip_unchanged))
+
+    def run_streaming(self, items, overwrite=False, preserve_metadata=True, skip_unchanged='size_mtime'):
+        """Generator form of run(): yields progress dicts while copying and returns the result."""
         if not isinstance(items, list) or not all(isinstance(x, dict) and 'src' in x and 'dst' in x for x in items):
             return {"status": "error", "message": "'items' must be a list of {src,dst}."}
         abs_root = os.path.abspath(self.root_path)
         copied = []
+        unchanged = []
         errors = []
         out_of_scope = []
         not_found = []
         invalid = []
 
-        copy_func = shutil.copy2 if preserve_metadata else shutil.copy
-
+        # Plan every item up front so all files share one worker pool
+        planned = []  # (spec_out, file_srcs)
+        all_dirs = []
+        all_files = []
         for spec in items:
             src_rel = spec.get('src')
             dst_rel = spec.get('dst')
@@ -907,41 +1894,74 @@ class CopyPathsTool:
             if not self._ensure_inside(src_abs, abs_root) or not self._ensure_inside(dst_abs, abs_root):
                 out_of_scope.append({"src": src_rel, "dst": dst_rel})
                 continue
-            if not (os.path.exists(src_abs)):
+            if not (os.path.exists(src_abs) or os.path.islink(src_abs)):
                 not_found.append(src_rel)
                 continue
             if src_abs == abs_root:
                 invalid.append({"src": src_rel, "dst": dst_rel})
                 continue
 
-            # If destination is an existing directory, place inside using src basename
+            is_dir = os.path.isdir(src_abs)
+            # If destination is an existing directory, place inside using src basename, unless it is
+            # the result of an earlier run of the same copy (then it is synced in place)
             final_dst = dst_abs
             if os.path.isdir(dst_abs):
-                final_dst = os.path.join(dst_abs, os.path.basename(src_abs))
+                nested = os.path.join(dst_abs, os.path.basename(src_abs))
+                if not (is_dir and not os.path.lexists(nested) and _mirrors(src_abs, dst_abs)):
+                    final_dst = nested
 
             try:
-                os.makedirs(os.path.dirname(final_dst), exist_ok=True)
-                if os.path.isfile(src_abs) or os.path.islink(src_abs):
-                    if os.path.exists(final_dst) and not overwrite:
-                        raise FileExistsError(f"Destination exists: {dst_rel}")
-                    copy_func(src_abs, final_dst)
-                    copied.append({"src": src_rel, "dst": os.path.relpath(final_dst, self.root_path), "type": "file"})
-                elif os.path.isdir(src_abs):
+                if is_dir:
                     # If final dst exists and is a file, error
                     if os.path.isfile(final_dst):
                         raise FileExistsError(f"Destination is a file: {dst_rel}")
-                    # Merge or create
-                    shutil.copytree(src_abs, final_dst, dirs_exist_ok=bool(overwrite), copy_function=copy_func)
-                    copied.append({"src": src_rel, "dst": os.path.relpath(final_dst, self.root_path), "type": "dir"})
-                else:
-                    not_found.append(src_rel)
+                    if os.path.exists(final_dst) and not overwrite and skip_unchanged == 'none':
+                        raise FileExistsError(f"Destination exists: {dst_rel}")
+                    if final_dst == src_abs or final_dst.startswith(src_abs + os.sep):
+                        raise ValueError(f"Cannot copy a folder into itself: {src_rel}")
+                dirs, files = BulkCopyEngine().plan(src_abs, final_dst)
+                if not is_dir:
+                    dirs = [os.path.dirname(final_dst)]
+                all_dirs.extend(dirs)
+                all_files.extend(files)
+                planned.append(({"src": src_rel, "dst": os.path.relpath(final_dst, self.root_path), "type": "dir" if is_dir else "file"}, {f[0] for f in files}))
             except Exception as e:
                 errors.append({"src": src_rel, "dst": dst_rel, "error": str(e)})
 
+        stats = None
+        if all_files or all_dirs:
+            engine = BulkCopyEngine(
+                max_workers=self.max_workers,
+                skip_mode=skip_unchanged if skip_unchanged in ('none', 'size_mtime', 'hash') else 'size_mtime',
+                preserve_metadata=preserve_metadata,
+                overwrite=overwrite,
+            )
+            try:
+                stats = yield from engine.run(all_dirs, all_files)
+            except Exception as e:
+                errors.append({"src": None, "dst": None, "error": str(e)})
+            file_errors = (stats or {}).get("errors", [])
+            file_skipped = set((stats or {}).get("skipped", []))
+            for spec_out, srcs in planned:
+                item_errors = [err for err in file_errors if err["src"] in srcs]
+                if item_errors:
+                    errors.append({"src": spec_out["src"], "dst": spec_out["dst"], "error": item_errors[0]["error"], "failed_files": len(item_errors)})
+                elif stats is None:
+                    continue
+                elif srcs and srcs <= file_skipped:
+                    # Every file was already up to date
+                    unchanged.append(spec_out)
+                else:
+                    copied.append(spec_out)
+
         status = "success" if not errors else "error"
         msg_bits = []
         if copied:
-            msg_bits.append(f"Copied {len(copied)} item(s).")
+            msg_bits.append(f"Copied {len(copied)} item(s) ({stats['files_copied']} file(s)).")
+        if unchanged:
+            msg_bits.append(f"Already up to date: {len(unchanged)} item(s).")
+        if stats and stats["files_skipped"]:
+            msg_bits.append(f"Skipped {stats['files_skipped']} unchanged file(s).")
         if not_found:
             msg_bits.append(f"Not found: {len(not_found)}")
         if out_of_scope:
@@ -950,18 +1970,25 @@ class CopyPathsTool:
             msg_bits.append(f"Invalid: {len(invalid)}")
         if errors:
             msg_bits.append(f"Errors: {len(errors)}")
-        return {
+        result = {
             "status": status,
             "message": " ".join(msg_bits) or "No action taken.",
             "copied": copied,
+            "unchanged": unchanged,
             "not_found": not_found,
             "out_of_scope": out_of_scope,
             "invalid": invalid,
             "errors": errors,
         }
+        if stats:
+            result["files_copied"] = stats["files_copied"]
+            result["files_skipped"] = stats["files_skipped"]
+            result["bytes_total"] = stats["bytes_total"]
+        return result
 
 
 class RenamePathTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "rename_path",
@@ -985,6 +2012,9 @@ class RenamePathTool:
     def __init__(self, root_path):
         self.root_path = root_path
 
+    def memo_paths(self, src, dst, **kwargs):
+        return [os.path.join(self.root_path, src), os.path.join(self.root_path, dst)]
+
     def run(self, src, dst, overwrite=False):
         abs_root = os.path.abspath(self.root_path)
         src_abs = os.path.abspath(os.path.join(self.root_path, src))
@@ -1013,6 +2043,7 @@ class RenamePathTool:
 
 
 class MovePathsTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "move_paths",
@@ -1044,10 +2075,37 @@ class MovePathsTool:
         },
     }
 
-    def __init__(self, root_path):
+    def __init__(self, root_path, max_workers=8):
         self.root_path = root_path
+        self.max_workers = max_workers
+
+    def _move(self, src_abs, dst_abs):
+        """Rename in place when possible; across devices, copy with the bulk engine and then delete the source."""
+        try:
+            os.rename(src_abs, dst_abs)
+            return None
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        engine = BulkCopyEngine(max_workers=self.max_workers, skip_mode='none', preserve_metadata=True, overwrite=True, preserve_symlinks=True)
+        dirs, files = engine.plan(src_abs, dst_abs)
+        stats = yield from engine.run(dirs or [os.path.dirname(dst_abs)], files)
+        if stats["errors"]:
+            raise OSError(stats["errors"][0]["error"])
+        if os.path.isdir(src_abs) and not os.path.islink(src_abs):
+            shutil.rmtree(src_abs)
+        else:
+            os.remove(src_abs)
+        return stats
+
+    def memo_paths(self, items, **kwargs):
+        return [os.path.join(self.root_path, p) for item in items for p in (item["src"], item["dst"])]
 
     def run(self, items, overwrite=False):
+        return _drain(self.run_streaming(items, overwrite))
+
+    def run_streaming(self, items, overwrite=False):
+        """Generator form of run(): yields copy progress for cross-device moves and returns the result."""
         abs_root = os.path.abspath(self.root_path)
         moved = []
         errors = []
@@ -1080,7 +2138,7 @@ class MovePathsTool:
                         shutil.rmtree(dst_abs)
                     else:
                         os.remove(dst_abs)
-                shutil.move(src_abs, dst_abs)
+                yield from self._move(src_abs, dst_abs)
                 moved.append({"src": src, "dst": dst})
             except Exception as e:
                 errors.append({"src": src, "dst": dst, "error": str(e)})
@@ -1108,6 +2166,8 @@ class MovePathsTool:
 
 
 class PathStatTool:
+    memoizable = True
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "path_stat",
@@ -1137,6 +2197,9 @@ class PathStatTool:
                 h.update(chunk)
         return h.hexdigest()
 
+    def memo_paths(self, relative_path, **kwargs):
+        return [os.path.join(self.root_path, relative_path)]
+
     def run(self, relative_path, with_hash=False):
         abs_root = os.path.abspath(self.root_path)
         abs_path = os.path.abspath(os.path.join(self.root_path, relative_path))
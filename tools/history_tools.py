@@ -1,4 +1,5 @@
 from chat_history import ChatHistoryManager
+from storage.artifacts import ArtifactStore
 
 class GetChatHistoryMetadataTool:
     schema = {
@@ -85,6 +86,7 @@ class GetChatHistoryEntryTool:
 
 
 class DeleteChatHistoryEntriesTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "delete_chat_history_entries",
@@ -205,3 +207,46 @@ class GetChatHistoryStatsTool:
             "oldest_entry": oldest,
             "newest_entry": newest
         }
+
+
+class ReadToolOutputArtifactTool:
+    schema = {
+        "type": "function",
+        "name": "read_tool_output_artifact",
+        "description": (
+            "Page through a tool result that was too large to return in full. Such results come back with status='truncated', an artifact_id and only a head/tail preview. "
+            "Read the next page by passing the returned next_offset as offset. Use find to jump to the first occurrence of a text at or after offset. "
+            "Read only what you need: large pages cost context on every later turn."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "artifact_id": {"type": "string", "description": "The artifact_id from the truncated tool result."},
+                "offset": {"type": "integer", "minimum": 0, "default": 0, "description": "Character offset to start reading at."},
+                "max_chars": {"type": "integer", "minimum": 1, "maximum": 20000, "default": 8000, "description": "Maximum characters to return."},
+                "find": {"type": "string", "description": "Optional text to search for from offset; the page starts at its first occurrence. Empty string = no search."},
+            },
+            "required": ["artifact_id", "offset", "max_chars", "find"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, artifacts_dir, max_page_chars=20000):
+        self.artifacts = ArtifactStore(artifacts_dir)
+        self.max_page_chars = max_page_chars
+
+    def run(self, artifact_id, offset=0, max_chars=8000, find=""):
+        max_chars = max(1, min(max_chars, self.max_page_chars))
+        try:
+            if find:
+                position = self.artifacts.read_text(artifact_id).find(find, max(0, offset))
+                if position < 0:
+                    return {"status": "error", "artifact_id": artifact_id, "message": f"'{find}' not found after offset {offset}."}
+                offset = position
+            page = self.artifacts.read(artifact_id, offset, max_chars)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        except FileNotFoundError:
+            return {"status": "error", "message": f"Artifact '{artifact_id}' not found (it may have been pruned)."}
+        return {"status": "success", "artifact_id": artifact_id, **page}
@@ -1,29 +1,74 @@
 import os
 from memory import MemoryManager
+from memory.memory import MEMORY_FILE
+from memory.consolidation import MemoryConsolidator
 
 class GetUserMemoriesTool:
+    memoizable = True
+    resource_tags = ("memories",)
     schema = {
         "type": "function",
         "name": "get_user_memories",
         "description": (
             "Retrieve the user's long-term and emotional memories. Entries are concise (typically 50-150 characters) and include important facts, preferences, explicit requests, ideas, and patterns over past interactions. "
             "ALWAYS call silently at conversation start to understand user context. Re-call when uncertain about user preferences or when context has shifted. "
+            "Pass the current topic or user message as query to get only the top_k most relevant memories (semantic match); an empty query returns all memories. "
             "Context gathering is the foundation of good reasoning."
         ),
         "strict": True,
         "parameters": {
             "type": "object", 
-            "properties": {}, 
-            "required": [],
+            "properties": {
+                "query": {"type": "string", "description": "Topic or message to find relevant memories for; empty string returns all memories."},
+                "top_k": {"type": "integer", "minimum": 1, "default": 10, "description": "Maximum number of memories to return when a query is given."},
+            }, 
+            "required": ["query", "top_k"],
             "additionalProperties": False,
         },
     }
 
-    def run(self, **kwargs):
+    def memo_paths(self, **kwargs):
+        return [MEMORY_FILE]
+
+    def run(self, query="", top_k=10, **kwargs):
         memory_manager = MemoryManager()
+        if query and query.strip():
+            memories = memory_manager.search_memories(query, top_k)
+            return {"status": "success", "total_memories": len(memory_manager.get_memories()), "memories": memories}
         return {"status": "success", "memories": memory_manager.get_memories()}
 
+class SearchUserMemoriesTool:
+    memoizable = True
+    resource_tags = ("memories",)
+    schema = {
+        "type": "function",
+        "name": "search_user_memories",
+        "description": (
+            "Keyword search over the user's memories (BM25 ranking). Returns only memories that share words with the query, best match first, each with id and score. "
+            "Use to check whether something is already stored before creating a memory, or to find the ids of memories to update or delete, without fetching every memory."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Keywords to search for."},
+                "top_k": {"type": "integer", "minimum": 1, "default": 10, "description": "Maximum number of memories to return."},
+            },
+            "required": ["query", "top_k"],
+            "additionalProperties": False,
+        },
+    }
+
+    def memo_paths(self, **kwargs):
+        return [MEMORY_FILE]
+
+    def run(self, query, top_k=10):
+        memory_manager = MemoryManager()
+        memories = memory_manager.keyword_search(query, top_k)
+        return {"status": "success", "count": len(memories), "memories": memories}
+
 class CreateUserMemoryTool:
+    resource_tags = ("memories",)
     schema = {
         "type": "function",
         "name": "create_user_memory",
@@ -51,13 +96,13 @@ class CreateUserMemoryTool:
 
     def run(self, texts):
         memory_manager = MemoryManager()
-        results = []
-        for text in texts:
-            result = memory_manager.add_memory(text)
-            results.append(result)
+        results = memory_manager.add_many(texts)
+        # Look for new near-duplicates in the background
+        MemoryConsolidator.shared().schedule()
         return results
 
 class UpdateUserMemoryTool:
+    resource_tags = ("memories",)
     schema = {
         "type": "function",
         "name": "update_user_memory",
@@ -91,20 +136,17 @@ class UpdateUserMemoryTool:
 
     def run(self, entries):
         memory_manager = MemoryManager()
-        results = []
-        for entry in entries:
-            result = memory_manager.update_memory(entry["id"], entry["text"])
-            results.append(result)
-        return results
+        return memory_manager.update_many(entries)
 
 class DeleteUserMemoryTool:
+    resource_tags = ("memories",)
     schema = {
         "type": "function",
         "name": "delete_user_memory",
         "description": (
             "Delete one or more existing user memories by id. Use for explicit user requests, irreconcilable conflicts, or clearly outdated info. "
             "Part of maintaining memory quality: if during your review loop you identify memories that are no longer relevant or accurate, clean them up. "
-            "After successful deletion, remaining memory ids are re-numbered starting at 1. Think before deleting - only remove genuinely obsolete entries."
+            "Memory ids are stable: deleting never changes the ids of the remaining memories. Think before deleting - only remove genuinely obsolete entries."
         ),
         "strict": True,
         "parameters": {
@@ -123,5 +165,37 @@ class DeleteUserMemoryTool:
 
     def run(self, ids):
         memory_manager = MemoryManager()
-        results = memory_manager.delete_memories(ids)
-        return results
+        return memory_manager.delete_many(ids)
+
+class ConsolidateUserMemoriesTool:
+    resource_tags = ("memories",)
+    schema = {
+        "type": "function",
+        "name": "consolidate_user_memories",
+        "description": (
+            "Find near-duplicate user memories (character n-gram similarity) and merge each group into its longest memory ('keep'). "
+            "Memories whose every word is already in the kept one are listed under 'remove'; similar memories that say something else (e.g. a changed preference) are listed under 'review' and are never deleted by this tool. "
+            "With apply=false returns the proposals plus the size of the memory set against its character budget; with apply=true deletes the 'remove' memories. "
+            "For 'review' entries decide yourself: combine them with update_user_memory and delete_user_memory, delete the outdated one, or keep both."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "apply": {"type": "boolean", "description": "false = only propose merges; true = delete the 'remove' memories of every merge ('review' ones are kept)."},
+                "threshold": {"type": "number", "minimum": 0.3, "maximum": 1.0, "description": "Similarity (0.3-1.0) above which memories count as duplicates; 0.6 is a good default."},
+            },
+            "required": ["apply", "threshold"],
+            "additionalProperties": False,
+        },
+    }
+
+    def run(self, apply=False, threshold=0.6):
+        consolidator = MemoryConsolidator.shared()
+        report = consolidator.analyze(threshold)
+        if not apply or not any(merge["remove"] for merge in report["merges"]):
+            return report
+        result = consolidator.apply(report)
+        if result["status"] == "success":
+            result["merges"] = report["merges"]
+        return result
@@ -2,22 +2,28 @@ import os
 import json
 from datetime import datetime
 
+from storage import JsonStore, VersionConflict
+
 TODOS_FILE = os.path.join(os.path.dirname(__file__), 'todos.json')
 LEGACY_PLANS_FILE = os.path.join(os.path.dirname(__file__), 'plans.json')
 
 class TodoManager:
     def __init__(self, file_path=TODOS_FILE):
         self.file_path = file_path
+        self._store = JsonStore(file_path, default=[])
+        self._version = None
         self.todos = self.load_todos()
+        self._reindex()
 
     def load_todos(self):
         # Prefer new todos.json; fall back to legacy plans.json for migration
         if os.path.exists(self.file_path):
+            # Also records the file version the todos were read at, for save_todos()
             try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data if isinstance(data, list) else []
+                data, self._version = self._store.read()
+                return data if isinstance(data, list) else []
             except Exception:
+                self._version = self._store.version()
                 return []
         elif os.path.exists(LEGACY_PLANS_FILE):
             try:
@@ -32,70 +38,110 @@ class TodoManager:
                 pass
         return []
 
-    def save_todos(self):
+    def save_todos(self, todos=None):
+        """
+        Atomically write todos (default: the loaded list); fails instead of overwriting changes another
+        writer made since they were loaded. Only a successful write replaces the loaded list.
+        """
+        todos = self.todos if todos is None else todos
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.todos, f, ensure_ascii=False, indent=2)
-            return {"status": "success"}
+            self._version = self._store.write(todos, expected_version=self._version)
+        except VersionConflict as e:
+            return {"status": "error", "message": f"{e}; reload and retry."}
         except Exception as e:
             return {"status": "error", "message": str(e)}
+        self.todos = todos
+        self._reindex()
+        return {"status": "success"}
+
+    def _reindex(self):
+        self._by_id = {t['id']: t for t in self.todos}
+
+    def _refresh(self):
+        """Reload if another writer changed the file since it was read (a stat call otherwise). Call with the store locked."""
+        if self._store.version() != self._version:
+            self.todos = self.load_todos()
+            self._reindex()
 
     def get_todos(self):
         return self.todos
 
-    def add_todo(self, text, status="new"):
+    def add_many(self, texts, status="new"):
+        """Append one to-do per text with a single write. Returns one result per text."""
         try:
-            new_id = str(len(self.todos) + 1)
-            now = datetime.now()
-            todo = {
-                "id": new_id,
-                "date": now.strftime('%Y-%m-%d'),
-                "time": now.strftime('%H:%M'),
-                "text": text,
-                "status": status  # 'new' or 'done'
-            }
-            self.todos.append(todo)
-            save_result = self.save_todos()
+            with self._store.locked():
+                self._refresh()
+                now = datetime.now()
+                added = []
+                for text in texts:
+                    added.append({
+                        "id": str(len(self.todos) + len(added) + 1),
+                        "date": now.strftime('%Y-%m-%d'),
+                        "time": now.strftime('%H:%M'),
+                        "text": text,
+                        "status": status  # 'new' or 'done'
+                    })
+                save_result = self.save_todos(self.todos + added) if added else {"status": "success"}
             if save_result["status"] == "success":
-                return {"status": "success", "id": new_id, "todo": todo}
+                return [{"status": "success", "id": t['id'], "todo": t} for t in added]
             else:
-                return {"status": "error", "message": save_result.get("message", "Failed to save todo.")}
+                return [{"status": "error", "message": save_result.get("message", "Failed to save todo.")} for _ in added]
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            return [{"status": "error", "message": str(e)} for _ in texts]
 
-    def update_todo(self, todo_id, new_text=None, new_status=None):
-        for todo in self.todos:
-            if todo['id'] == todo_id:
-                updated = False
+    def update_many(self, entries):
+        """
+        Apply [{"id", "text"?, "status"?}, ...] with a single write. A missing or None text/status is
+        left unchanged; a boolean status is normalized to 'done'/'new'. Returns one result per entry.
+        """
+        with self._store.locked():
+            self._refresh()
+            outcomes = []
+            changed = {}
+            for entry in entries:
+                todo = changed.get(entry['id']) or self._by_id.get(entry['id'])
+                new_text, new_status = entry.get('text'), entry.get('status')
+                if todo is None:
+                    outcomes.append("To-Do id not found.")
+                    continue
+                if new_text is None and new_status is None:
+                    outcomes.append("No updates provided.")
+                    continue
+                # Changed copies; the loaded todos stay untouched unless the write succeeds
+                todo = changed[todo['id']] = dict(todo)
                 if new_text is not None:
                     todo['text'] = new_text
-                    updated = True
                 if new_status is not None:
-                    # Accept boolean or string; normalize boolean to 'done'/'new'
                     if isinstance(new_status, bool):
                         todo['status'] = 'done' if new_status else 'new'
                     else:
                         todo['status'] = new_status
-                    updated = True
-                if not updated:
-                    return {"status": "error", "id": todo_id, "message": "No updates provided."}
-                save_result = self.save_todos()
-                if save_result["status"] == "success":
-                    return {"status": "success", "id": todo_id, "todo": todo}
-                else:
-                    return {"status": "error", "id": todo_id, "message": save_result.get("message", "Failed to save todo.")}
-        return {"status": "error", "id": todo_id, "message": "To-Do id not found."}
+                outcomes.append(todo)
+            if changed:
+                save_result = self.save_todos([changed.get(t['id'], t) for t in self.todos])
+            else:
+                save_result = {"status": "success"}
+        results = []
+        for entry, outcome in zip(entries, outcomes):
+            if isinstance(outcome, str):
+                results.append({"status": "error", "id": entry['id'], "message": outcome})
+            elif save_result["status"] == "success":
+                results.append({"status": "success", "id": entry['id'], "todo": changed[entry['id']]})
+            else:
+                results.append({"status": "error", "id": entry['id'], "message": save_result.get("message", "Failed to save todo.")})
+        return results
 
-    def delete_todos(self, ids):
-        found = set()
-        for id_ in ids:
-            if any(t['id'] == id_ for t in self.todos):
-                found.add(id_)
-        self.todos = [t for t in self.todos if t['id'] not in found]
-        # Renumber IDs after deletion
-        for idx, todo in enumerate(self.todos, start=1):
-            todo['id'] = str(idx)
-        save_result = self.save_todos()
+    def delete_many(self, ids):
+        """Delete to-dos by id with a single write; the remaining items are renumbered from 1. Returns one result per id."""
+        with self._store.locked():
+            self._refresh()
+            found = {id_ for id_ in ids if id_ in self._by_id}
+            if found:
+                # Renumber IDs after deletion
+                remaining = [{**t, "id": str(idx)} for idx, t in enumerate((t for t in self.todos if t['id'] not in found), start=1)]
+                save_result = self.save_todos(remaining)
+            else:
+                save_result = {"status": "success"}
         results = []
         for id_ in ids:
             if id_ in found:
@@ -106,13 +152,25 @@ class TodoManager:
             else:
                 results.append({"status": "error", "id": id_, "message": "To-Do id not found."})
         return results
-    
+
+    def add_todo(self, text, status="new"):
+        return self.add_many([text], status)[0]
+
+    def update_todo(self, todo_id, new_text=None, new_status=None):
+        return self.update_many([{"id": todo_id, "text": new_text, "status": new_status}])[0]
+
+    def delete_todos(self, ids):
+        return self.delete_many(ids)
+
     def clear_todos(self):
-        self.todos = []
-        return self.save_todos()
+        with self._store.locked():
+            self._refresh()
+            return self.save_todos([])
 
 
 class GetTodosTool:
+    memoizable = True
+    resource_tags = ("todos",)
     schema = {
         "type": "function",
         "name": "get_todos",
@@ -130,12 +188,16 @@ class GetTodosTool:
         },
     }
 
+    def memo_paths(self, **kwargs):
+        return [TODOS_FILE]
+
     def run(self, **kwargs):
         todo_manager = TodoManager()
         return {"status": "success", "todos": todo_manager.get_todos()}
 
 
 class CreateTodoTool:
+    resource_tags = ("todos",)
     schema = {
         "type": "function",
         "name": "create_todo",
@@ -161,14 +223,11 @@ class CreateTodoTool:
 
     def run(self, texts):
         todo_manager = TodoManager()
-        results = []
-        for text in texts:
-            result = todo_manager.add_todo(text)
-            results.append(result)
-        return results
+        return todo_manager.add_many(texts)
 
 
 class UpdateTodoTool:
+    resource_tags = ("todos",)
     schema = {
         "type": "function",
         "name": "update_todo",
@@ -203,14 +262,11 @@ class UpdateTodoTool:
 
     def run(self, entries):
         todo_manager = TodoManager()
-        results = []
-        for entry in entries:
-            result = todo_manager.update_todo(entry["id"], entry.get("text"), entry.get("status"))
-            results.append(result)
-        return results
+        return todo_manager.update_many(entries)
 
 
 class DeleteTodoTool:
+    resource_tags = ("todos",)
     schema = {
         "type": "function",
         "name": "delete_todo",
@@ -235,11 +291,11 @@ class DeleteTodoTool:
 
     def run(self, ids):
         todo_manager = TodoManager()
-        results = todo_manager.delete_todos(ids)
-        return results
+        return todo_manager.delete_many(ids)
 
 
 class ClearTodosTool:
+    resource_tags = ("todos",)
     schema = {
         "type": "function",
         "name": "clear_todos",
@@ -1,7 +1,236 @@
 import os
 import uuid
 
+from .worker_pool import WorkerPool
+
+
+# -----------------
+# Rendering (runs in worker processes)
+# -----------------
+
+def _values_and_labels(datasets, axis):
+    """Concatenate one axis of every dataset into (values, labels) arrays."""
+    import numpy as np
+    points = [obj for dataset in datasets for obj in dataset[axis]]
+    values = np.fromiter((obj["value"] for obj in points), dtype=float, count=len(points))
+    labels = np.array([obj["label"] for obj in points], dtype=object)
+    return values, labels
+
+
+def _tick_map(values, labels):
+    """Sorted unique tick values with their labels; later labels for the same value win."""
+    import numpy as np
+    unique, last = np.unique(values[::-1], return_index=True)
+    return unique, labels[::-1][last]
+
+
+def _render_xy_plot(datasets, title, output_base, formats=("png", "svg")):
+    """
+    Draw datasets with the object-oriented Agg API (no pyplot global state) and save one file per format.
+    Returns the list of written paths.
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib import rc_context
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    for dataset in datasets:
+        x_vals = np.fromiter((obj["value"] for obj in dataset["x"]), dtype=float, count=len(dataset["x"]))
+        y_vals = np.fromiter((obj["value"] for obj in dataset["y"]), dtype=float, count=len(dataset["y"]))
+        if dataset["type"] == "line":
+            ax.plot(x_vals, y_vals, label=dataset["label"])
+        elif dataset["type"] == "dot":
+            ax.scatter(x_vals, y_vals, label=dataset["label"])
+    x_ticks, x_labels = _tick_map(*_values_and_labels(datasets, "x"))
+    y_ticks, y_labels = _tick_map(*_values_and_labels(datasets, "y"))
+    ax.set_xticks(x_ticks)
+    ax.set_xticklabels(x_labels)
+    ax.set_yticks(y_ticks)
+    ax.set_yticklabels(y_labels)
+    if title:
+        ax.set_title(title)
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.legend()
+    fig.tight_layout()
+
+    paths = []
+    # SVG keeps text as text instead of glyph paths and drops the timestamp, which keeps files small
+    with rc_context({"svg.fonttype": "none", "path.simplify": True}):
+        for fmt in formats:
+            path = f"{output_base}.{fmt}"
+            fig.savefig(path, format=fmt, metadata={"Date": None} if fmt == "svg" else None)
+            paths.append(path)
+    return paths
+
+
+# -----------------
+# File-backed series and downsampling (run in worker processes)
+# -----------------
+
+def _downsample_minmax(x, y, max_points):
+    """Indices keeping the min and max y of each of (max_points - 2) // 2 equal-size buckets, plus both ends."""
+    import numpy as np
+    n = len(y)
+    buckets = max(1, (max_points - 2) // 2)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(rows), axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    rows = rows[valid]
+    idx = np.concatenate([offsets + np.nanargmin(rows, axis=1), offsets + np.nanargmax(rows, axis=1), [0, n - 1]])
+    return np.unique(idx)
+
+
+def _downsample_lttb(x, y, max_points):
+    """Largest-Triangle-Three-Buckets: indices of max_points points that preserve the visual shape of the series."""
+    import numpy as np
+    n = len(y)
+    if max_points < 3:
+        return np.array([0, n - 1])
+    # max_points - 2 middle buckets over points 1..n-2, then the last point as its own bucket
+    bounds = np.append(np.linspace(1, n - 1, max_points - 1).astype(np.intp), n)
+    counts = np.diff(bounds)
+    avg_x = np.add.reduceat(x, bounds[:-1]) / counts
+    avg_y = np.add.reduceat(y, bounds[:-1]) / counts
+    out = np.empty(max_points, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def _downsample(x, y, method, max_points):
+    import numpy as np
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if method == "none" or len(y) <= max_points:
+        return x, y
+    idx = _downsample_lttb(x, y, max_points) if method == "lttb" else _downsample_minmax(x, y, max_points)
+    return x[idx], y[idx]
+
+
+def _column_index(ref, names):
+    if ref in names:
+        return names.index(ref)
+    if ref.lstrip("-").isdigit():
+        index = int(ref)
+        if -len(names) <= index < len(names):
+            return index % len(names)
+    raise ValueError(f"Column '{ref}' not found. Available columns: {', '.join(names[:50])}")
+
+
+def _load_columns(path, refs):
+    """Read only the referenced columns of a CSV/TSV, NPY or Parquet file. Returns {ref: float array}."""
+    import numpy as np
+    ext = os.path.splitext(path)[1].lower()
+    refs = [r for r in refs if r]
+    if ext == ".npy":
+        data = np.load(path, mmap_mode="r", allow_pickle=False)
+        if data.dtype.names:
+            return {r: np.asarray(data[data.dtype.names[_column_index(r, list(data.dtype.names))]], dtype=float) for r in refs}
+        if data.ndim == 1:
+            return {r: np.asarray(data, dtype=float) for r in refs}
+        names = [str(i) for i in range(data.shape[1])]
+        return {r: np.asarray(data[:, _column_index(r, names)], dtype=float) for r in refs}
+    if ext in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+            names = pq.read_schema(path).names
+            wanted = sorted({names[_column_index(r, names)] for r in refs})
+            table = pq.read_table(path, columns=wanted)
+            return {r: table.column(names[_column_index(r, names)]).to_numpy().astype(float) for r in refs}
+        except ImportError:
+            import pandas as pd
+            frame = pd.read_parquet(path)
+            names = [str(c) for c in frame.columns]
+            return {r: frame.iloc[:, _column_index(r, names)].to_numpy(dtype=float) for r in refs}
+    if ext in (".csv", ".tsv", ".txt"):
+        import csv
+        delimiter = "\t" if ext == ".tsv" else ","
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f, delimiter=delimiter), [])
+        names = [h.strip() for h in header]
+        try:
+            [float(h) for h in names]
+            has_header, names = False, [str(i) for i in range(len(names))]
+        except ValueError:
+            has_header = True
+        cols = sorted({_column_index(r, names) for r in refs})
+        if not cols:
+            return {}
+        data = np.loadtxt(path, delimiter=delimiter, skiprows=1 if has_header else 0, usecols=cols, ndmin=2, dtype=float, encoding="utf-8")
+        return {r: data[:, cols.index(_column_index(r, names))] for r in refs}
+    raise ValueError(f"Unsupported data file type '{ext}'. Use .csv, .tsv, .npy or .parquet.")
+
+
+def _render_series_plot(series, title, output_base, method, max_points, formats=("png", "svg")):
+    """
+    Load each series' columns from its file, downsample it and draw it with the Agg API.
+    Returns (paths, per-series stats).
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib import rc_context
+
+    # Each file is read once, for all the columns any series references
+    refs_by_file = {}
+    for s in series:
+        refs_by_file.setdefault(s["path"], set()).update([s["x_column"], s["y_column"]])
+    columns = {path: _load_columns(path, sorted(refs)) for path, refs in refs_by_file.items()}
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    stats = []
+    for s in series:
+        loaded = columns[s["path"]]
+        y = loaded[s["y_column"]]
+        x = loaded[s["x_column"]] if s["x_column"] else np.arange(len(y), dtype=float)
+        if len(x) != len(y):
+            raise ValueError(f"Series '{s['label']}': x has {len(x)} values but y has {len(y)}.")
+        x_drawn, y_drawn = _downsample(x, y, method, max_points)
+        if s["type"] == "line":
+            ax.plot(x_drawn, y_drawn, label=s["label"])
+        else:
+            ax.scatter(x_drawn, y_drawn, label=s["label"], s=6)
+        stats.append({"label": s["label"], "points_read": int(len(y)), "points_drawn": int(len(y_drawn))})
+
+    x_names = {s["x_column"] or "index" for s in series}
+    y_names = {s["y_column"] for s in series}
+    ax.set_xlabel(x_names.pop() if len(x_names) == 1 else 'X')
+    ax.set_ylabel(y_names.pop() if len(y_names) == 1 else 'Y')
+    if title:
+        ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+
+    paths = []
+    with rc_context({"svg.fonttype": "none", "path.simplify": True}):
+        for fmt in formats:
+            path = f"{output_base}.{fmt}"
+            fig.savefig(path, format=fmt, metadata={"Date": None} if fmt == "svg" else None)
+            paths.append(path)
+    return paths, stats
+
+
+# -----------------
+# Tools
+# -----------------
+
 class MultiXYPlotTool:
+    resource_tags = ("fs",)
     schema = {
         "type": "function",
         "name": "generate_multi_xy_plot",
@@ -10,7 +239,7 @@ class MultiXYPlotTool:
             "Each dataset must specify its type ('line' or 'dot'), label, and x/y as lists of objects with 'value' and 'label'. "
             "All datasets are drawn on the same plot, with a legend. "
             "Axis labels are combined from all datasets, so all values and labels are shown. "
-            "Saves the generated image in the 'images' folder and returns the filename. "
+            "Saves the generated image in the 'images' folder as PNG (filename) plus a lightweight SVG (svg_filename). "
             "Use this tool to visualize multiple series or collections of 2D data, with custom axis labels for each value."
         ),
         "strict": True,
@@ -57,49 +286,90 @@ class MultiXYPlotTool:
         },
     }
 
-    def __init__(self, images_folder="images"):
+    def __init__(self, images_folder="images", worker_pool=None, timeout=120):
         self.images_folder = images_folder
+        self.timeout = timeout
+        self.worker_pool = worker_pool or WorkerPool.shared(warm_modules=("numpy", "matplotlib.figure", "matplotlib.backends.backend_agg"))
         if not os.path.exists(images_folder):
             os.makedirs(images_folder)
 
     def run(self, datasets, title=None):
         try:
-            import matplotlib.pyplot as plt
-            fig = plt.figure()
-            ax = fig.add_subplot(111)
-            x_tick_map = {}
-            y_tick_map = {}
-            for dataset in datasets:
-                for obj in dataset["x"]:
-                    x_tick_map[obj["value"]] = obj["label"]
-                for obj in dataset["y"]:
-                    y_tick_map[obj["value"]] = obj["label"]
-            x_ticks = sorted(x_tick_map.keys())
-            x_labels = [x_tick_map[val] for val in x_ticks]
-            y_ticks = sorted(y_tick_map.keys())
-            y_labels = [y_tick_map[val] for val in y_ticks]
-            for dataset in datasets:
-                plot_type = dataset["type"]
-                label = dataset["label"]
-                x_vals = [obj["value"] for obj in dataset["x"]]
-                y_vals = [obj["value"] for obj in dataset["y"]]
-                if plot_type == "line":
-                    ax.plot(x_vals, y_vals, label=label)
-                elif plot_type == "dot":
-                    ax.scatter(x_vals, y_vals, label=label)
-            ax.set_xticks(x_ticks)
-            ax.set_xticklabels(x_labels)
-            ax.set_yticks(y_ticks)
-            ax.set_yticklabels(y_labels)
-            if title:
-                ax.set_title(title)
-            ax.set_xlabel('X')
-            ax.set_ylabel('Y')
-            ax.legend()
-            filename = f"{self.images_folder}/multi_xy_plot_{uuid.uuid4().hex[:8]}.png"
-            plt.tight_layout()
-            plt.savefig(filename)
-            plt.close(fig)
-            return {"status": "success", "filename": filename}
+            filename = f"{self.images_folder}/multi_xy_plot_{uuid.uuid4().hex[:8]}"
+            self.worker_pool.run(
+                _render_xy_plot, datasets, title, os.path.abspath(filename), ("png", "svg"), timeout=self.timeout
+            )
+            return {"status": "success", "filename": f"{filename}.png", "svg_filename": f"{filename}.svg"}
+        except Exception as e:
+            return {"status": "error", "message": str(e) or e.__class__.__name__}
+
+
+class PlotDataFilesTool:
+    resource_tags = ("fs",)
+    schema = {
+        "type": "function",
+        "name": "plot_data_files",
+        "description": (
+            "Plot series read directly from data files in the project (.csv, .tsv, .npy, .parquet) without passing the values inline. "
+            "Each series references a file and its x/y columns by header name or 0-based index (empty x_column = row index). "
+            "Large series are downsampled before drawing ('lttb' preserves shape, 'minmax' preserves peaks) to at most max_points per series. "
+            "Saves the plot in the 'images' folder as PNG (filename) plus SVG (svg_filename) and reports points read/drawn per series."
+        ),
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "series": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "relative_path": {"type": "string", "description": "Data file path relative to the project root."},
+                            "x_column": {"type": "string", "description": "X column name or index; empty string to use the row index."},
+                            "y_column": {"type": "string", "description": "Y column name or index."},
+                            "type": {"type": "string", "enum": ["line", "dot"], "description": "Draw as a line or dots."},
+                            "label": {"type": "string", "description": "Legend label for this series."},
+                        },
+                        "required": ["relative_path", "x_column", "y_column", "type", "label"],
+                        "additionalProperties": False,
+                    },
+                    "description": "Series to draw on the same axes.",
+                },
+                "title": {"type": "string", "description": "Plot title (empty for none)."},
+                "downsample": {"type": "string", "enum": ["lttb", "minmax", "none"], "default": "lttb", "description": "Downsampling method for long series."},
+                "max_points": {"type": "integer", "minimum": 10, "default": 2000, "description": "Maximum points drawn per series."},
+            },
+            "required": ["series", "title", "downsample", "max_points"],
+            "additionalProperties": False,
+        },
+    }
+
+    def __init__(self, root_path, images_folder="images", worker_pool=None, timeout=120):
+        self.root_path = root_path
+        self.images_folder = images_folder
+        self.timeout = timeout
+        self.worker_pool = worker_pool or WorkerPool.shared(warm_modules=("numpy", "matplotlib.figure", "matplotlib.backends.backend_agg"))
+        if not os.path.exists(images_folder):
+            os.makedirs(images_folder)
+
+    def run(self, series, title="", downsample="lttb", max_points=2000):
+        if not series:
+            return {"status": "error", "message": "No series provided."}
+        abs_root = os.path.abspath(self.root_path)
+        resolved = []
+        for s in series:
+            abs_path = os.path.abspath(os.path.join(abs_root, s["relative_path"]))
+            if not abs_path.startswith(abs_root):
+                return {"status": "error", "message": f"Access outside the root path is not allowed: {s['relative_path']}"}
+            if not os.path.isfile(abs_path):
+                return {"status": "error", "message": f"File not found: {s['relative_path']}"}
+            resolved.append({**s, "path": abs_path})
+        try:
+            filename = f"{self.images_folder}/data_plot_{uuid.uuid4().hex[:8]}"
+            _, stats = self.worker_pool.run(
+                _render_series_plot, resolved, title, os.path.abspath(filename), downsample, max(10, max_points), ("png", "svg"),
+                timeout=self.timeout,
+            )
+            return {"status": "success", "filename": f"{filename}.png", "svg_filename": f"{filename}.svg", "series": stats}
         except Exception as e:
-            return {"status": "error", "message": str(e)}
+            return {"status": "error", "message": str(e) or e.__class__.__name__}
@@ -6,6 +6,8 @@ class WebSearchTool:
         return {"status": "success"}
 
 class ImageGenerationTool:
+    resource_tags = ("fs",)
+
     def __init__(self, quality="medium"):
         self.schema = {
             "type": "image_generation",
@@ -0,0 +1,142 @@
+import os
+import atexit
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+def _warm_worker(modules):
+    """Process initializer: import heavy modules once so the first task in each worker is fast."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # Missing optional dependencies are reported by the task that needs them
+            pass
+
+
+def _noop():
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    A lazily started pool of warm worker processes for CPU-heavy rendering (plots, documents).
+
+    Work runs out of process, so it does not share global library state (e.g. matplotlib's) between
+    requests or with the agent; run() still waits for the result, so a tool call takes as long as
+    its render. Callers on different threads (e.g. several agents) render at once. Task functions must be
+    module-level (picklable). If worker processes cannot be created on this platform the pool falls
+    back to threads; a crashed worker pool is rebuilt and the task retried once.
+
+    Nothing starts until the first task: then all workers are started at once, importing the
+    warm_modules registered by every tool created so far. A task that exceeds its timeout gets the
+    executor it was submitted to recycled: its workers are terminated, so the task cannot finish
+    (and write its output) after the timeout was reported. Other run() tasks on that executor fail
+    with BrokenProcessPool and are retried once on a fresh one. A thread
+    cannot be stopped, so with the thread fallback a timed-out task only loses its worker slot.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, max_workers=None, warm_modules=()):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.warm_modules = tuple(warm_modules)
+        self.uses_processes = True
+        self._executor = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    @classmethod
+    def shared(cls, warm_modules=()):
+        """Process-wide pool; modules requested before the first task (or a recycle) are warmed in every worker."""
+        with cls._instances_lock:
+            pool = cls._instances.get("default")
+            if pool is None:
+                pool = cls._instances["default"] = cls(warm_modules=warm_modules)
+            else:
+                pool.warm_modules += tuple(m for m in warm_modules if m not in pool.warm_modules)
+            return pool
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                started = True
+                if self.uses_processes:
+                    try:
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            initializer=_warm_worker,
+                            initargs=(self.warm_modules,),
+                        )
+                    except (OSError, NotImplementedError, ImportError):
+                        self.uses_processes = False
+                if not self.uses_processes:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            else:
+                started = False
+            executor = self._executor
+        if started:
+            self._warm(executor)
+        return executor
+
+    def _reset(self, executor, terminate=False):
+        """Drop an executor; with terminate, also kill its worker processes (and the tasks they are running)."""
+        if executor is None:
+            return
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        processes = list((getattr(executor, "_processes", None) or {}).values()) if terminate else []
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _warm(self, executor):
+        """Start every worker of a new executor (without waiting), instead of one per task."""
+        for _ in range(self.max_workers):
+            try:
+                executor.submit(_noop)
+            except (BrokenProcessPool, RuntimeError):
+                break
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) and return a Future."""
+        return self._submit(fn, *args, **kwargs)[1]
+
+    def _submit(self, fn, *args, **kwargs):
+        """Like submit(), but returns (executor, future) so failures recycle the executor that ran the task."""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._reset(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(fn, *args, **kwargs)
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """Run fn in the pool and wait for its result; raises the task's exception or TimeoutError."""
+        executor, future = self._submit(fn, *args, **kwargs)
+        try:
+            return self._result(executor, future, timeout)
+        except BrokenProcessPool:
+            self._reset(executor)
+            return self._result(*self._submit(fn, *args, **kwargs), timeout)
+
+    def _result(self, executor, future, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The task keeps running otherwise: stop it, and its worker with it
+            if not future.cancel():
+                self._reset(executor, terminate=True)
+            raise TimeoutError(f"Task did not finish within {timeout} seconds.")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -476,6 +476,7 @@ class ChatWindow(QWidget):
         # Store chat history
         self.chat_history = []
         self.current_ai_widget = None
+        self.ai_checkpoint = None  # (layout count, AI widget, its text) to roll back to on a retried reply
         
         # Styling
         self.setStyleSheet("""
@@ -595,6 +596,25 @@ class ChatWindow(QWidget):
         self.current_ai_widget = None
         self.scroll_to_bottom()
     
+    def checkpoint_ai_response(self):
+        """Remember what is shown so far, so a regenerated reply can replace what follows."""
+        widget = self.current_ai_widget
+        self.ai_checkpoint = (self.chat_layout.count(), widget, widget.text() if widget is not None else None)
+    
+    def rollback_ai_response(self):
+        """Remove everything shown since the last checkpoint (the agent is generating it again)."""
+        if self.ai_checkpoint is None:
+            return
+        count, widget, text = self.ai_checkpoint
+        while self.chat_layout.count() > count:
+            item = self.chat_layout.takeAt(count)
+            if item.widget():
+                item.widget().deleteLater()
+        if widget is not None:
+            widget.setText(text)
+        self.current_ai_widget = widget
+        self.scroll_to_bottom()
+    
     def scroll_to_bottom(self):
         """Scroll to the bottom of the chat."""
         # Use QTimer to ensure scroll happens after layout updates
@@ -725,6 +745,7 @@ class ChatWindow(QWidget):
             if item.widget():
                 item.widget().deleteLater()
         self.current_ai_widget = None
+        self.ai_checkpoint = None
         self.chat_history = []
     
     def dragEnterEvent(self, event):
@@ -1677,6 +1698,15 @@ class Gadget(QWidget):
                         # Start a new widget for the next response
                         self.chat_window.start_ai_response()
             
+            elif event_type == "response.checkpoint":
+                self.chat_window.checkpoint_ai_response()
+            
+            elif event_type == "response.retry":
+                # The partial reply is streamed again from the last checkpoint
+                if event.get("discard_partial"):
+                    self.chat_window.rollback_ai_response()
+                print(f"Retrying model request (attempt {event.get('attempt')}): {event.get('error', '')}")
+            
             elif event_type == "response.image_generation_call.generating":
                 self.chat_window.append_to_ai_response("\n[Image Generation]...\n", '34')
             